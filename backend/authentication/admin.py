@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils import timezone
 from .models import (
     Doctor, DoctorSchedule, Specialty, Language,
-    Patient, MedicalHistory, Appointment
+    Patient, MedicalHistory, Appointment, SlotHold, ArchivedAppointment
 )
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
 
@@ -23,7 +23,7 @@ class DoctorAdmin(admin.ModelAdmin):
 @admin.register(DoctorSchedule)
 class DoctorScheduleAdmin(admin.ModelAdmin):
     list_display = ('doctor', 'date', 'start_time', 'end_time', 'available_slots', 'is_active', 'is_past')
-    list_filter = ('is_active', 'date', 'doctor')
+    list_filter = ('is_active', 'virtual_slots', 'date', 'doctor')
     
     def is_past(self, obj):
         today = timezone.now().date()
@@ -63,7 +63,8 @@ class MedicalHistoryAdmin(admin.ModelAdmin):
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     base_list_display = ('patient', 'doctor', 'schedule', 'status', 'is_past')
-    list_filter = ('status', 'doctor', 'schedule__date')
+    list_filter = ('status', 'doctor', 'start_datetime')
+    list_select_related = ('patient', 'doctor', 'schedule__doctor')
     search_fields = ('patient__first_name', 'patient__last_name', 'doctor__first_name', 'doctor__last_name')
     
     def get_list_display(self, request):
@@ -87,13 +88,39 @@ class AppointmentAdmin(admin.ModelAdmin):
         return qs.none()
 
     def is_past(self, obj):
-        today = timezone.now().date()
-        current_time = timezone.now().time()
-        if obj.schedule.date < today or (obj.schedule.date == today and obj.appointment_end_time < current_time):
+        if obj.end_datetime < timezone.now():
             return "Past"
         return "Future"
     is_past.short_description = 'Status'
 
+@admin.register(ArchivedAppointment)
+class ArchivedAppointmentAdmin(admin.ModelAdmin):
+    list_display = ('patient', 'doctor_name', 'schedule_date', 'appointment_start_time', 'status', 'archived_at')
+    list_filter = ('status', 'schedule_date')
+    list_select_related = ('patient',)
+    search_fields = ('patient__first_name', 'patient__last_name', 'doctor_name')
+
+    # The archive is append-only: written by cleanup_past_appointments, never edited
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.user.is_superuser or request.user.has_perm('authentication.view_archivedappointment'):
+            return qs
+        # Doctors see the history of their own appointments
+        if request.user.groups.filter(name='Doctor').exists():
+            return qs.filter(doctor__user=request.user)
+        return qs.none()
+
+@admin.register(SlotHold)
+class SlotHoldAdmin(admin.ModelAdmin):
+    list_display = ('schedule', 'user', 'start_time', 'end_time', 'expires_at')
+    list_filter = ('schedule__date',)
+
 # --- Superuser-Only Token Management ---
 # Using more robust permission checks to ensure these are only visible to superusers.
 
@@ -1,3 +1,4 @@
+import atexit
 import os
 import sys
 from django.apps import AppConfig
@@ -7,12 +8,19 @@ class AuthenticationConfig(AppConfig):
     name = 'authentication'
 
     def ready(self):
-        """Start the cleanup scheduler when Django starts"""
-        # Only start scheduler during runserver, not during migrations or other commands
-        if 'runserver' in sys.argv:
+        """Connect model signals and, under runserver, join the background job election"""
+        from . import signals  # noqa: F401
+
+        # Web workers (gunicorn) never run the jobs themselves: `manage.py run_jobs`
+        # does. For local development runserver competes for the same lease, so it
+        # runs them unless a run_jobs worker already is. The autoreloader's parent
+        # process only watches files, so skip it.
+        if 'runserver' in sys.argv and (os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv):
             try:
-                from .scheduler import start_scheduler
-                start_scheduler()
+                from .scheduler import leader_runner
+                runner = leader_runner()
+                runner.run_in_background()
+                atexit.register(runner.shutdown)
             except Exception as e:
-                print(f"⚠️  Could not start cleanup scheduler: {e}")
-                print("📝 This is normal during first setup or migrations")
\ No newline at end of file
+                print(f"⚠️  Could not start background jobs: {e}")
+                print("📝 This is normal during first setup or migrations")
@@ -0,0 +1,234 @@
+import logging
+
+from array import array
+from datetime import datetime, timedelta, time
+
+from django.conf import settings
+from django.db.models import F, Q, Count, Sum, Window, Prefetch
+from django.db.models.functions import ExtractHour, RowNumber
+from django.utils import timezone
+
+from .models import (
+    AvailabilityChange, Doctor, DoctorSchedule, ScheduleAvailability, Specialty, Language, TimeSlot
+)
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_stale_availability(now=None):
+    """
+    Rebuild today's index rows whose opening has slipped inside the
+    booking buffer. Only schedules of the current day can go stale this
+    way, so this touches a handful of rows, never the whole index.
+
+    Returns:
+        int: Number of schedules refreshed
+    """
+    now = timezone.localtime(now or timezone.now())
+    day_start = timezone.make_aware(datetime.combine(now.date(), time.min))
+    stale_ids = set(ScheduleAvailability.objects.filter(
+        start_datetime__gte=day_start,
+        start_datetime__lte=now + timedelta(minutes=30)
+    ).values_list('schedule_id', flat=True))
+    if stale_ids:
+        ScheduleAvailability.rebuild_for(
+            DoctorSchedule.objects.filter(pk__in=stale_ids), now=now, refresh_doctors=False
+        )
+    return len(stale_ids)
+
+
+def refresh_stale_doctor_availability(now=None):
+    """
+    Bring Doctor.next_available_at up to date for doctors whose next
+    opening has passed (or slipped inside the booking buffer) since it was
+    last maintained. Uses the next_available_at index, so only those
+    doctors are read.
+
+    Returns:
+        int: Number of doctors refreshed
+    """
+    now = timezone.localtime(now or timezone.now())
+    refresh_stale_availability(now)
+    stale_ids = list(Doctor.objects.filter(
+        next_available_at__lte=now + timedelta(minutes=30)
+    ).values_list('pk', flat=True))
+    Doctor.refresh_availability(stale_ids, now=now)
+    return len(stale_ids)
+
+
+def refresh_changed_doctor_availability(cursor=None, now=None):
+    """
+    Bring the summaries of doctors whose schedules changed since change-log
+    `cursor` up to date, together with those whose next opening has
+    passed. Bookings leave the summaries to this job, so a burst of them
+    costs one write per doctor and a single directory version bump. With
+    no `cursor` every entry still in the log is replayed.
+
+    Returns:
+        tuple: (change-log cursor to pass next time, number of doctors whose summary changed)
+    """
+    now = timezone.localtime(now or timezone.now())
+    changes, cursor = AvailabilityChange.replay(cursor)
+    doctor_ids = {doctor_id for _, _, doctor_id in changes}
+
+    refresh_stale_availability(now)
+    doctor_ids.update(Doctor.objects.filter(
+        next_available_at__lte=now + timedelta(minutes=30)
+    ).values_list('pk', flat=True))
+    return cursor, len(Doctor.refresh_availability(doctor_ids, now=now))
+
+
+def find_soonest_available(specialty_id=None, language_id=None, date_from=None, date_to=None,
+                           part_of_day=None, limit=20, now=None):
+    """
+    Doctors ranked by their next free opening, with that opening inline.
+
+    The ranking is a single query over the next-available index: a window
+    function keeps each doctor's earliest row within the filters.
+
+    Args:
+        specialty_id / language_id: Optional doctor filters
+        date_from / date_to: Inclusive date window (defaults to the next
+            SOONEST_AVAILABLE_DEFAULT_DAYS days)
+        part_of_day: 'morning', 'afternoon' or 'evening'
+        limit: Maximum number of doctors
+
+    Returns:
+        list[ScheduleAvailability]: One row per doctor, soonest first, with
+        doctor (specialty/language ids prefetched) and schedule loaded
+    """
+    now = timezone.localtime(now or timezone.now())
+    refresh_stale_availability(now)
+
+    if date_from is None:
+        date_from = now.date()
+    if date_to is None:
+        date_to = date_from + timedelta(days=getattr(settings, 'SOONEST_AVAILABLE_DEFAULT_DAYS', 7) - 1)
+    window_start = max(
+        timezone.make_aware(datetime.combine(date_from, time.min)),
+        now + timedelta(minutes=30)
+    )
+    window_end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+
+    rows = ScheduleAvailability.objects.filter(
+        start_datetime__gte=window_start,
+        start_datetime__lt=window_end
+    )
+    if part_of_day:
+        rows = rows.filter(part_of_day=part_of_day)
+    if specialty_id:
+        rows = rows.filter(doctor__specialties__id=specialty_id)
+    if language_id:
+        rows = rows.filter(doctor__languages__id=language_id)
+
+    rows = rows.annotate(
+        doctor_rank=Window(
+            RowNumber(),
+            partition_by=[F('doctor_id')],
+            order_by=[F('start_datetime').asc(), F('id').asc()]
+        )
+    ).filter(doctor_rank=1).select_related('doctor', 'schedule').prefetch_related(
+        Prefetch('doctor__specialties', queryset=Specialty.objects.only('id')),
+        Prefetch('doctor__languages', queryset=Language.objects.only('id')),
+    ).order_by('start_datetime', 'doctor_id')
+
+    return list(rows[:limit])
+
+
+def build_availability_heatmap(doctor_ids, date_from, days, by_hour=False, now=None):
+    """
+    Free slots per doctor per day (and optionally per hour of the day) for a
+    calendar month view, computed from grouped aggregates instead of
+    serializing every slot.
+
+    Day totals come from one SUM(available_slots) per (doctor, date). Slot
+    level counts (one COUNT per (doctor, date, hour) over unbooked stored
+    slots, plus the virtual schedules' bitmaps) are only needed for today,
+    where slots inside the booking buffer no longer count, and for the
+    hourly breakdown. Range-based schedules have no fixed slots, so they
+    count towards the day totals but not towards any hour.
+
+    Args:
+        doctor_ids: Doctors to include, in output order
+        date_from: First day (today or later)
+        days: Number of days
+        by_hour: Also return per-hour counts, summed over the doctors
+
+    Returns:
+        dict: date_from, date_to, doctors, free (one array of per-day counts
+        per doctor), total (per-day counts over all doctors) and, with
+        by_hour, hourly (24 counts per day)
+    """
+    now = timezone.localtime(now or timezone.now())
+    today = now.date()
+    buffer_time = (now + timedelta(minutes=30)).time()
+    date_to = date_from + timedelta(days=days - 1)
+    position = {doctor_id: index for index, doctor_id in enumerate(doctor_ids)}
+    free = [array('I', [0]) * days for _ in doctor_ids]
+    hourly = [array('I', [0]) * 24 for _ in range(days)] if by_hour else None
+
+    schedules = DoctorSchedule.objects.filter(
+        doctor_id__in=position,
+        date__gte=date_from,
+        date__lte=date_to,
+        is_active=True,
+        available_slots__gt=0
+    )
+
+    def add(doctor_id, day, count, hour=None):
+        offset = (day - date_from).days
+        if day == today:
+            free[position[doctor_id]][offset] += count
+        if hour is not None and hourly is not None:
+            hourly[offset][hour] += count
+
+    # Day totals, except today's which depend on the current time
+    for row in schedules.exclude(date=today).values('doctor_id', 'date').annotate(count=Sum('available_slots')):
+        free[position[row['doctor_id']]][(row['date'] - date_from).days] += row['count']
+
+    slot_schedules = schedules.filter(time_range='slot-based')
+    if not by_hour:
+        slot_schedules = slot_schedules.filter(date=today)
+
+    # Stored slots: one grouped count, today's restricted to the booking buffer
+    for row in TimeSlot.objects.filter(
+        schedule__in=slot_schedules.filter(virtual_slots=False),
+        is_booked=False
+    ).filter(
+        ~Q(schedule__date=today) | Q(start_time__gt=buffer_time)
+    ).annotate(hour=ExtractHour('start_time')).values(
+        'schedule__doctor_id', 'schedule__date', 'hour'
+    ).annotate(count=Count('id')).values_list('schedule__doctor_id', 'schedule__date', 'count', 'hour'):
+        add(*row)
+
+    # Virtual slots: decoded from the booked bitmap, no slot rows to count
+    for schedule in slot_schedules.filter(virtual_slots=True).only(
+        'doctor_id', 'date', 'start_time', 'end_time', 'slot_duration', 'booked_slots'
+    ):
+        bitmap = schedule.get_booked_bitmap()
+        start = schedule.start_time.hour * 60 + schedule.start_time.minute
+        for index in range(schedule.calculate_total_slots()):
+            byte, bit = divmod(index, 8)
+            if byte < len(bitmap) and bitmap[byte] & (1 << bit):
+                continue
+            minutes = start + index * schedule.slot_duration
+            if schedule.date == today and time(minutes // 60, minutes % 60) <= buffer_time:
+                continue
+            add(schedule.doctor_id, schedule.date, 1, minutes // 60)
+
+    # Range-based schedules still bookable today
+    for doctor_id, count in schedules.filter(
+        date=today, time_range='range-based', end_time__gt=buffer_time
+    ).values_list('doctor_id', 'available_slots'):
+        add(doctor_id, today, count)
+
+    result = {
+        'date_from': date_from,
+        'date_to': date_to,
+        'doctors': list(doctor_ids),
+        'free': [counts.tolist() for counts in free],
+        'total': [sum(column) for column in zip(*free)] if free else [0] * days,
+    }
+    if by_hour:
+        result['hourly'] = [counts.tolist() for counts in hourly]
+    return result
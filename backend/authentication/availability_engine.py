@@ -0,0 +1,434 @@
+import logging
+import sys
+import threading
+import time as monotonic_time
+
+from array import array
+from bisect import bisect_left
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+FLAG_RANGE = 1
+FLAG_ACTIVE = 2
+FLAG_VIRTUAL = 4
+FLAG_LIVE = 8
+
+# Slots per schedule that fit the 64-bit free mask; longer schedules spill
+# into a small overflow dict
+MASK_BITS = 64
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+class AvailabilityEngine:
+    """
+    In-process copy of the next AVAILABILITY_ENGINE_DAYS days of schedule
+    availability, answering the available-slots endpoints without the ORM.
+
+    Schedules are stored column-wise in typed arrays (one row per schedule)
+    with a per-row bitset of free slots, and indexed per doctor in
+    (date, start) order. Writers append to the AvailabilityChange log; each
+    worker replays the entries it has not seen yet, at most every
+    AVAILABILITY_ENGINE_POLL_SECONDS, and reloads only the schedules named.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.full_loads = 0
+        self.changes_applied = 0
+        self.reads = 0
+        self._window_start = None
+        self._checked_at = 0.0
+        self._change_cursor = None
+        self._clear()
+
+    def _clear(self):
+        self.ids = array('I')
+        self.doctors = array('I')
+        self.days = array('I')
+        self.starts = array('H')
+        self.ends = array('H')
+        self.durations = array('H')
+        self.available = array('H')
+        self.flags = array('B')
+        self.free = array('Q')
+        self.slot_base = array('I')
+        self.free_overflow = {}
+        self.slot_ids = {}
+        self.holds = {}
+        self.by_doctor = {}
+        self.doctor_names = {}
+        self._sorted_rows = 0
+        self._dead_rows = 0
+        self._tail_rows = {}
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def get_window(self):
+        start = timezone.localdate()
+        return start, start + timedelta(days=getattr(settings, 'AVAILABILITY_ENGINE_DAYS', 31) - 1)
+
+    def _load_rows(self, schedule_filter, slot_filter, hold_filter):
+        """Append rows for the schedules matching the filters; returns {doctor_id: [new rows]}"""
+        from .models import DoctorSchedule, TimeSlot, SlotHold
+
+        slots = {}
+        for schedule_id, slot_id, start_time, is_booked in TimeSlot.objects.filter(
+            **slot_filter
+        ).values_list('schedule_id', 'id', 'start_time', 'is_booked').order_by('schedule_id', 'start_time'):
+            slots.setdefault(schedule_id, []).append((slot_id, start_time, is_booked))
+
+        holds = {}
+        for schedule_id, slot_index, expires_at in SlotHold.objects.active().filter(
+            slot_index__isnull=False, **hold_filter
+        ).values_list('schedule_id', 'slot_index', 'expires_at'):
+            holds.setdefault(schedule_id, {})[slot_index] = expires_at.timestamp()
+
+        new_rows = {}
+        for values in DoctorSchedule.objects.filter(**schedule_filter).values_list(
+            'id', 'doctor_id', 'date', 'start_time', 'end_time', 'slot_duration',
+            'available_slots', 'is_active', 'time_range', 'virtual_slots', 'booked_slots'
+        ).order_by('id'):
+            row = self._append_row(values, slots.get(values[0], ()), holds.get(values[0]))
+            new_rows.setdefault(values[1], []).append(row)
+        return new_rows
+
+    def _append_row(self, values, slots, holds):
+        (schedule_id, doctor_id, day, start_time, end_time, duration,
+         available, is_active, time_range, virtual, booked) = values
+        row = len(self.ids)
+        start, end = _minutes(start_time), _minutes(end_time)
+        flags = FLAG_LIVE
+        if time_range == 'range-based':
+            flags |= FLAG_RANGE
+        if is_active:
+            flags |= FLAG_ACTIVE
+        if virtual:
+            flags |= FLAG_VIRTUAL
+
+        mask = 0
+        base = 0
+        if time_range == 'slot-based':
+            total = (end - start) // duration
+            if virtual:
+                booked = bytes(booked or b'')
+                for index in range(total):
+                    byte, bit = divmod(index, 8)
+                    if not (byte < len(booked) and booked[byte] & (1 << bit)):
+                        mask |= 1 << index
+            else:
+                ids = [0] * total
+                for slot_id, slot_start, is_booked in slots:
+                    index = (_minutes(slot_start) - start) // duration
+                    if 0 <= index < total:
+                        ids[index] = slot_id
+                        if not is_booked:
+                            mask |= 1 << index
+                base = ids[0] if ids else 0
+                if any(slot_id != base + index for index, slot_id in enumerate(ids)):
+                    self.slot_ids[row] = array('I', ids)
+
+        self.ids.append(schedule_id)
+        self.doctors.append(doctor_id)
+        self.days.append(day.toordinal())
+        self.starts.append(start)
+        self.ends.append(end)
+        self.durations.append(duration)
+        self.available.append(min(available, 0xFFFF))
+        self.flags.append(flags)
+        self.slot_base.append(base)
+        if mask >> MASK_BITS:
+            self.free.append(0)
+            self.free_overflow[row] = mask
+        else:
+            self.free.append(mask)
+        if holds:
+            self.holds[row] = holds
+        if self._sorted_rows:
+            # Appended after the last full load, outside the sorted block
+            self._tail_rows[schedule_id] = row
+        return row
+
+    def _index_doctors(self, doctor_ids, new_rows):
+        """Rebuild the (date, start)-ordered row lists of the given doctors"""
+        for doctor_id in doctor_ids:
+            doctor_rows = [row for row in self.by_doctor.pop(doctor_id, ()) if self.flags[row] & FLAG_LIVE]
+            doctor_rows.extend(new_rows.get(doctor_id, ()))
+            if doctor_rows:
+                doctor_rows.sort(key=lambda r: (self.days[r], self.starts[r], self.ids[r]))
+                self.by_doctor[doctor_id] = array('I', doctor_rows)
+
+    def _load_doctor_names(self, doctor_ids=None):
+        from .models import Doctor
+        queryset = Doctor.objects.all() if doctor_ids is None else Doctor.objects.filter(pk__in=doctor_ids)
+        found = set()
+        for pk, first_name, last_name in queryset.values_list('id', 'first_name', 'last_name'):
+            self.doctor_names[pk] = f"Dr. {first_name} {last_name}"
+            found.add(pk)
+        for pk in set(doctor_ids or ()) - found:
+            self.doctor_names.pop(pk, None)
+
+    def full_load(self):
+        from .models import AvailabilityChange
+        started = monotonic_time.perf_counter()
+        window_start, window_end = self.get_window()
+        # Take the log position first: changes racing with the load are replayed
+        change_cursor = AvailabilityChange.current_cursor()
+
+        self._clear()
+        self._load_doctor_names()
+        new_rows = self._load_rows(
+            {'date__gte': window_start, 'date__lte': window_end},
+            {'schedule__date__gte': window_start, 'schedule__date__lte': window_end},
+            {'schedule__date__gte': window_start, 'schedule__date__lte': window_end},
+        )
+        self._sorted_rows = len(self.ids)
+        self._index_doctors(new_rows.keys(), new_rows)
+        self._window_start = window_start
+        self._change_cursor = change_cursor
+        self.full_loads += 1
+        logger.info(
+            f"🧠 Availability engine loaded {len(self.ids)} schedules for {len(self.by_doctor)} doctors "
+            f"({self.memory_bytes() / 1024:.0f} KiB) in {monotonic_time.perf_counter() - started:.2f}s"
+        )
+
+    # ------------------------------------------------------------------
+    # Incremental sync
+    # ------------------------------------------------------------------
+
+    def _find_row(self, schedule_id):
+        """Live row of a schedule: appended rows first, then binary search over the loaded block"""
+        row = self._tail_rows.get(schedule_id)
+        if row is not None:
+            return row if self.flags[row] & FLAG_LIVE else None
+        position = bisect_left(self.ids, schedule_id, 0, self._sorted_rows)
+        if position < self._sorted_rows and self.ids[position] == schedule_id and self.flags[position] & FLAG_LIVE:
+            return position
+        return None
+
+    def _drop_row(self, row):
+        self.flags[row] = 0
+        self.free_overflow.pop(row, None)
+        self.slot_ids.pop(row, None)
+        self.holds.pop(row, None)
+        self._tail_rows.pop(self.ids[row], None)
+        self._dead_rows += 1
+        return self.doctors[row]
+
+    def apply_changes(self, changes):
+        """Reload the schedules (and doctors) named by change-log entries"""
+        schedule_ids = {schedule_id for _, schedule_id, _ in changes if schedule_id is not None}
+        doctor_only = {doctor_id for _, schedule_id, doctor_id in changes if schedule_id is None}
+
+        touched = set()
+        for schedule_id in schedule_ids:
+            row = self._find_row(schedule_id)
+            if row is not None:
+                touched.add(self._drop_row(row))
+
+        new_rows = {}
+        if schedule_ids:
+            window_start, window_end = self.get_window()
+            new_rows = self._load_rows(
+                {'pk__in': schedule_ids, 'date__gte': window_start, 'date__lte': window_end},
+                {'schedule_id__in': schedule_ids},
+                {'schedule_id__in': schedule_ids},
+            )
+            touched |= set(new_rows)
+        if doctor_only:
+            self._load_doctor_names(doctor_only)
+        self._index_doctors(touched, new_rows)
+        self.changes_applied += len(changes)
+
+    def sync(self, force=False):
+        from .models import AvailabilityChange
+        now = monotonic_time.monotonic()
+        interval = getattr(settings, 'AVAILABILITY_ENGINE_POLL_SECONDS', 1)
+        if not force and self._window_start is not None and now - self._checked_at < interval:
+            return
+        self._checked_at = now
+
+        window_start, _ = self.get_window()
+        if self._window_start != window_start or self._dead_rows > max(1000, len(self.ids) // 4):
+            # New day (the window moved) or too many replaced rows: start over
+            self.full_load()
+            return
+
+        limit = getattr(settings, 'AVAILABILITY_ENGINE_MAX_CHANGES', 5000)
+        changes, change_cursor = AvailabilityChange.replay(self._change_cursor, limit=limit)
+        if len(changes) > limit:
+            self.full_load()
+            return
+        if changes:
+            self.apply_changes(changes)
+        self._change_cursor = change_cursor
+
+    def expire(self):
+        """Make the next read check the change log (used after local writes)"""
+        self._checked_at = 0.0
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def covers(self, day):
+        window_start, window_end = self.get_window()
+        return window_start <= day <= window_end
+
+    def _free_slots(self, row, buffer_time, now_ts):
+        from .models import DoctorSchedule
+        mask = self.free_overflow.get(row, self.free[row])
+        start, duration = self.starts[row], self.durations[row]
+        holds = self.holds.get(row, {})
+        explicit_ids = self.slot_ids.get(row)
+        virtual = self.flags[row] & FLAG_VIRTUAL
+        schedule_id = self.ids[row]
+
+        slots = []
+        index = 0
+        while mask:
+            if mask & 1:
+                slot_start = start + index * duration
+                starts_at = _time(slot_start)
+                held = holds.get(index, 0) > now_ts
+                if not held and (buffer_time is None or starts_at > buffer_time):
+                    if virtual:
+                        slot_id = DoctorSchedule.virtual_slot_id(index)
+                    elif explicit_ids is not None:
+                        slot_id = explicit_ids[index]
+                    else:
+                        slot_id = self.slot_base[row] + index
+                    ends_at = _time(slot_start + duration)
+                    slots.append({
+                        'id': slot_id,
+                        'formatted_time': f"{starts_at.strftime('%I:%M %p')} - {ends_at.strftime('%I:%M %p')}",
+                        'start_time': starts_at.isoformat(),
+                        'end_time': ends_at.isoformat(),
+                        'is_booked': False,
+                        'schedule': schedule_id,
+                    })
+            mask >>= 1
+            index += 1
+        return slots
+
+    def render(self, row, now=None):
+        """The DoctorScheduleSerializer representation of a row"""
+        from .models import DoctorSchedule
+        from .serializers import DoctorScheduleSerializer
+
+        day = date.fromordinal(self.days[row])
+        start_time, end_time = _time(self.starts[row]), _time(self.ends[row])
+        time_range = 'range-based' if self.flags[row] & FLAG_RANGE else 'slot-based'
+        duration = self.durations[row]
+
+        if time_range == 'slot-based':
+            now_ts = (now or timezone.now()).timestamp()
+            available_time_slots = self._free_slots(row, DoctorScheduleSerializer.get_slot_buffer_time(day), now_ts)
+        else:
+            available_time_slots = {
+                'type': 'range-based',
+                'start_time': start_time.strftime('%H:%M'),
+                'end_time': end_time.strftime('%H:%M'),
+                'message': 'Flexible appointment timing within the given range'
+            }
+
+        return {
+            'id': self.ids[row],
+            'doctor_name': self.doctor_names.get(self.doctors[row], ''),
+            'time_range_display': dict(DoctorSchedule.TIME_RANGE_CHOICES)[time_range],
+            'slot_duration_display': str(dict(DoctorSchedule.SLOT_DURATION_CHOICES).get(duration, duration)),
+            'available_time_slots': available_time_slots,
+            'date': day.isoformat(),
+            'time_range': time_range,
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat(),
+            'slot_duration': duration,
+            'available_slots': self.available[row],
+            'is_active': bool(self.flags[row] & FLAG_ACTIVE),
+            'virtual_slots': bool(self.flags[row] & FLAG_VIRTUAL),
+            'doctor': self.doctors[row],
+        }
+
+    def has_doctor(self, doctor_id):
+        with self._lock:
+            self.sync()
+            return doctor_id in self.doctor_names
+
+    def get_doctor_schedules(self, doctor_id, date_from, date_to, min_start_today=None):
+        """
+        Active schedules with openings for a doctor, rendered like
+        DoctorScheduleSerializer, in (date, start_time) order.
+
+        Args:
+            min_start_today: Schedules on date_from must start after this time
+        """
+        with self._lock:
+            self.sync()
+            self.reads += 1
+            first, last = date_from.toordinal(), date_to.toordinal()
+            results = []
+            for row in self.by_doctor.get(doctor_id, ()):
+                day = self.days[row]
+                if day < first or day > last:
+                    continue
+                if not self.flags[row] & FLAG_ACTIVE or self.available[row] <= 0:
+                    continue
+                if day == first and min_start_today is not None and _time(self.starts[row]) <= min_start_today:
+                    continue
+                results.append(self.render(row))
+            return results
+
+    def get_schedule(self, doctor_id, schedule_id):
+        """One active schedule rendered like DoctorScheduleSerializer, or None"""
+        with self._lock:
+            self.sync()
+            self.reads += 1
+            row = self._find_row(schedule_id)
+            if row is None or self.doctors[row] != doctor_id or not self.flags[row] & FLAG_ACTIVE:
+                return None
+            return self.render(row)
+
+    def memory_bytes(self):
+        columns = (
+            self.ids, self.doctors, self.days, self.starts, self.ends, self.durations,
+            self.available, self.flags, self.free, self.slot_base
+        )
+        total = sum(column.buffer_info()[1] * column.itemsize for column in columns)
+        total += sum(sys.getsizeof(rows) for rows in self.by_doctor.values()) + sys.getsizeof(self.by_doctor)
+        total += sum(sys.getsizeof(ids) for ids in self.slot_ids.values()) + sys.getsizeof(self.slot_ids)
+        total += sys.getsizeof(self.holds) + sum(sys.getsizeof(h) for h in self.holds.values())
+        total += sys.getsizeof(self.doctor_names) + sum(sys.getsizeof(n) for n in self.doctor_names.values())
+        total += sys.getsizeof(self.free_overflow)
+        return total
+
+    def stats(self):
+        return {
+            'enabled': getattr(settings, 'AVAILABILITY_ENGINE_ENABLED', False),
+            'window_start': self._window_start,
+            'schedules': len(self.ids) - self._dead_rows,
+            'doctors': len(self.by_doctor),
+            'last_change_id': self._change_cursor[0] if self._change_cursor else 0,
+            'memory_bytes': self.memory_bytes(),
+            'full_loads': self.full_loads,
+            'changes_applied': self.changes_applied,
+            'reads': self.reads,
+        }
+
+
+availability_engine = AvailabilityEngine()
+
+
+def engine_enabled():
+    return getattr(settings, 'AVAILABILITY_ENGINE_ENABLED', False)
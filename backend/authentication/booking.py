@@ -0,0 +1,446 @@
+import logging
+import random
+import time
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction, IntegrityError, OperationalError
+from django.db.models import F
+from django.utils import timezone
+
+from .intervals import IntervalSet
+from .models import DoctorSchedule, TimeSlot, Appointment, SlotHold, ScheduleAvailability, AvailabilityChange
+
+logger = logging.getLogger(__name__)
+
+
+class SlotTakenError(Exception):
+    """Raised inside the booking transaction when the slot is no longer free"""
+
+    def __init__(self, message='This time slot has just been booked by someone else', error_code='SLOT_TAKEN'):
+        super().__init__(message)
+        self.error_code = error_code
+
+
+class BookingConflictError(Exception):
+    """Raised when a concurrent write changed the row being updated; safe to retry"""
+
+
+def _set_virtual_slot(schedule, index, booked):
+    """
+    Flip one bit of a virtual schedule's booked-slot bitmap with a
+    compare-and-swap update, so concurrent bookings of other slots on the
+    same schedule are never lost.
+    """
+    current = DoctorSchedule.objects.filter(pk=schedule.pk).values_list('booked_slots', flat=True).get()
+    current = bytes(current or b'')
+    schedule.booked_slots = current
+    if booked and schedule.is_slot_booked(index):
+        raise SlotTakenError()
+    schedule.set_slot_booked(index, booked=booked)
+    updated = DoctorSchedule.objects.filter(
+        pk=schedule.pk,
+        booked_slots=current
+    ).update(booked_slots=schedule.booked_slots)
+    if not updated:
+        raise BookingConflictError(f'Booked-slot bitmap of schedule {schedule.pk} changed concurrently')
+
+
+def _claim_time_slot(schedule, time_slot):
+    """Mark the slot as booked with a conditional update and return the TimeSlot row"""
+    if schedule.virtual_slots:
+        _set_virtual_slot(schedule, schedule.get_slot_index(time_slot.start_time), booked=True)
+        # Virtual slots only get a TimeSlot row once they are booked. The row is
+        # written directly: the booking path has already applied its own
+        # lead-time rule, which TimeSlot.full_clean's 30-minute buffer would contradict.
+        slot_row = TimeSlot.objects.filter(
+            schedule=schedule,
+            start_time=time_slot.start_time,
+            end_time=time_slot.end_time
+        ).first()
+        if slot_row is None:
+            slot_row, = TimeSlot.objects.bulk_create([TimeSlot(
+                schedule=schedule,
+                start_time=time_slot.start_time,
+                end_time=time_slot.end_time,
+                is_booked=True
+            )])
+        else:
+            TimeSlot.objects.filter(pk=slot_row.pk).update(is_booked=True)
+            slot_row.is_booked = True
+        return slot_row
+
+    updated = TimeSlot.objects.filter(
+        pk=time_slot.pk,
+        schedule=schedule,
+        is_booked=False
+    ).update(is_booked=True)
+    if not updated:
+        raise SlotTakenError()
+    time_slot.is_booked = True
+    return time_slot
+
+
+def _foreign_holds(schedule, hold=None, user_id=None):
+    """Live holds on the schedule, except `hold` and those of the booking user"""
+    holds = SlotHold.objects.active().filter(schedule=schedule)
+    if hold:
+        holds = holds.exclude(pk=hold.pk)
+    if user_id:
+        holds = holds.exclude(user_id=user_id)
+    return holds
+
+
+def _count_foreign_holds(schedule, time_slot, hold, user_id=None):
+    """
+    Check other patients' live holds. A held slot cannot be booked; for
+    range-based schedules every live hold reserves one opening.
+
+    Returns:
+        int: Openings reserved by other holds (range-based only)
+    """
+    others = _foreign_holds(schedule, hold, user_id)
+    if time_slot:
+        if others.filter(slot_index=schedule.get_slot_index(time_slot.start_time)).exists():
+            raise SlotTakenError('This time slot is being held by another patient', error_code='SLOT_HELD')
+        return 0
+    return others.count()
+
+
+def _lock_schedule(schedule):
+    """
+    Take the schedule row's write lock with a no-op UPDATE, so holds and
+    bookings on it queue behind this transaction before they count holds.
+
+    Returns:
+        int: The schedule's current available_slots
+    """
+    DoctorSchedule.objects.filter(pk=schedule.pk).update(available_slots=F('available_slots'))
+    return DoctorSchedule.objects.filter(pk=schedule.pk).values_list('available_slots', flat=True).get()
+
+
+def _take_schedule_capacity(schedule, reserved=0):
+    """Decrement available_slots in the database, never below the reserved openings"""
+    updated = DoctorSchedule.objects.filter(
+        pk=schedule.pk,
+        available_slots__gt=reserved
+    ).update(available_slots=F('available_slots') - 1)
+    if not updated:
+        raise SlotTakenError('No available slots for this schedule', error_code='NO_SLOTS_AVAILABLE')
+
+
+def _schedule_intervals(schedule):
+    """Booked and held windows on a range-based schedule"""
+    return [
+        *Appointment.objects.filter(schedule=schedule, status='scheduled').values_list(
+            'appointment_start_time', 'appointment_end_time'
+        ),
+        *_foreign_holds(schedule).values_list('start_time', 'end_time'),
+    ]
+
+
+def _schedule_overlaps(schedule, start_time, end_time, exclude_hold=None, exclude_user_id=None):
+    """
+    Whether a scheduled appointment or another patient's live hold on a
+    range-based schedule overlaps [start_time, end_time). Each is one
+    EXISTS seeking on the (schedule, start) indexes, so the check reads
+    only the rows that start before the window ends.
+    """
+    if Appointment.objects.filter(
+        schedule=schedule,
+        status='scheduled',
+        appointment_start_time__lt=end_time,
+        appointment_end_time__gt=start_time
+    ).exists():
+        return True
+    return _foreign_holds(schedule, exclude_hold, exclude_user_id).filter(
+        start_time__lt=end_time,
+        end_time__gt=start_time
+    ).exists()
+
+
+def _check_conflicts(patient, schedule, time_slot, start_time, end_time, hold=None):
+    """
+    Reject a window that overlaps another patient's booking or hold on a
+    range-based schedule, or any of the patient's own appointments that day.
+    Slot-based schedules are already exclusive per slot.
+    """
+    if time_slot is None and _schedule_overlaps(
+        schedule, start_time, end_time, exclude_hold=hold, exclude_user_id=patient.user_id
+    ):
+        raise SlotTakenError('This time overlaps another booking on this schedule', error_code='TIME_CONFLICT')
+
+    tz = timezone.get_default_timezone()
+    day_start = timezone.make_aware(datetime.combine(schedule.date, datetime.min.time()), tz)
+    # Appointments never span midnight, so the day bounds the patient index range
+    if Appointment.objects.filter(
+        patient=patient,
+        start_datetime__gte=day_start,
+        start_datetime__lt=timezone.make_aware(datetime.combine(schedule.date, end_time), tz),
+        end_datetime__gt=timezone.make_aware(datetime.combine(schedule.date, start_time), tz),
+        status='scheduled'
+    ).exists():
+        raise SlotTakenError('You already have an appointment at this time', error_code='OVERLAPPING_APPOINTMENT')
+
+
+def find_free_windows(schedule, duration, limit=5, now=None):
+    """
+    The next free windows of `duration` minutes on a range-based schedule,
+    from one sweep over its booked and held intervals. Windows start on
+    5-minute boundaries and, on the current day, at least 15 minutes from
+    now (the booking lead time); each gap yields back-to-back windows.
+
+    Returns:
+        list[dict]: Up to `limit` {'start_time', 'end_time'} (HH:MM)
+    """
+    if not schedule.is_active or schedule.available_slots <= 0:
+        return []
+    now = timezone.localtime(now or timezone.now())
+    lower = schedule.start_time.hour * 60 + schedule.start_time.minute
+    upper = schedule.end_time.hour * 60 + schedule.end_time.minute
+    if schedule.date < now.date():
+        return []
+    if schedule.date == now.date():
+        earliest = now + timedelta(minutes=15)
+        # Booking requires a start strictly after the lead time
+        lower = max(lower, earliest.hour * 60 + earliest.minute + 1)
+    lower += -lower % 5
+
+    booked = IntervalSet(
+        (start.hour * 60 + start.minute, end.hour * 60 + end.minute)
+        for start, end in _schedule_intervals(schedule)
+    )
+    windows = []
+    for gap_start, gap_end in booked.gaps(lower, upper):
+        start = gap_start + -gap_start % 5
+        while start + duration <= gap_end and len(windows) < limit:
+            windows.append({
+                'start_time': f'{start // 60:02d}:{start % 60:02d}',
+                'end_time': f'{(start + duration) // 60:02d}:{(start + duration) % 60:02d}',
+            })
+            start += duration
+        if len(windows) >= limit:
+            break
+    return windows
+
+
+def _refresh_availability(schedule):
+    """
+    Rebuild the schedule's next-available index rows once the booking
+    transaction has committed, so the rebuild doesn't extend how long the
+    booking holds the write lock. The doctor's summary and the directory
+    version are left to the job worker, so concurrent bookings don't all
+    write the same rows.
+    """
+    def rebuild():
+        try:
+            with transaction.atomic():
+                # Lock before reading, so a slower rebuild can't overwrite a newer one
+                _lock_schedule(schedule)
+                ScheduleAvailability.rebuild_for(DoctorSchedule.objects.filter(pk=schedule.pk), refresh_doctors=False)
+        except OperationalError as e:
+            # The booking itself is committed; reconcile_availability repairs the row
+            logger.warning(f"⚠️ Could not refresh availability of schedule {schedule.pk}: {e}")
+
+    transaction.on_commit(rebuild)
+
+
+def book_appointment(patient, schedule, time_slot, start_time, end_time, notes='', hold=None, max_retries=None):
+    """
+    Claim a slot and create the appointment in a single transaction.
+
+    The slot is claimed and the schedule counter decremented with conditional
+    UPDATEs, so two concurrent requests can never both win the same slot.
+    Range-based windows and the patient's own day are then checked for
+    overlaps in the same transaction.
+    Transient conflicts (database lock timeouts, concurrent bitmap writes)
+    are retried with jittered exponential backoff.
+
+    Args:
+        patient: Patient making the booking
+        schedule: DoctorSchedule being booked
+        time_slot: TimeSlot for slot-based schedules (virtual or stored), else None
+        start_time: Appointment start time
+        end_time: Appointment end time
+        notes: Optional appointment notes
+        hold: The patient's own SlotHold, converted into the appointment
+        max_retries: Overrides settings.BOOKING_MAX_RETRIES
+
+    Returns:
+        dict: {'success': bool, 'appointment': Appointment, 'attempts': int}
+              or {'success': False, 'error_code': str, 'message': str}
+
+    Raises:
+        ValidationError: If the appointment itself fails model validation
+    """
+    if max_retries is None:
+        max_retries = getattr(settings, 'BOOKING_MAX_RETRIES', 3)
+    backoff = getattr(settings, 'BOOKING_RETRY_BACKOFF_SECONDS', 0.05)
+
+    for attempt in range(max_retries + 1):
+        try:
+            with transaction.atomic():
+                if time_slot is None:
+                    # Count holds only once concurrent holds on this schedule have committed
+                    _lock_schedule(schedule)
+                reserved = _count_foreign_holds(schedule, time_slot, hold, patient.user_id)
+                slot_row = _claim_time_slot(schedule, time_slot) if time_slot else None
+                _take_schedule_capacity(schedule, reserved=reserved)
+                # After the first write, so concurrent bookings are serialized before the check
+                _check_conflicts(patient, schedule, time_slot, start_time, end_time, hold=hold)
+                if hold:
+                    SlotHold.objects.filter(pk=hold.pk).delete()
+                if patient.user_id:
+                    # Booking without the hold token uses up the patient's own hold all the same
+                    SlotHold.objects.filter(schedule=schedule, user_id=patient.user_id).delete()
+                appointment = Appointment(
+                    patient=patient,
+                    doctor=schedule.doctor,
+                    schedule=schedule,
+                    time_slot=slot_row,
+                    appointment_start_time=start_time,
+                    appointment_end_time=end_time,
+                    notes=notes
+                )
+                # Every related row was loaded or claimed in this transaction
+                appointment.save(force_insert=True, validate_relations=False)
+                _refresh_availability(schedule)
+            return {
+                'success': True,
+                'appointment': appointment,
+                'attempts': attempt + 1
+            }
+        except SlotTakenError as e:
+            logger.info(f"⚠️ Booking lost race on schedule {schedule.pk}: {e}")
+            return {
+                'success': False,
+                'error_code': e.error_code,
+                'message': str(e)
+            }
+        except (BookingConflictError, OperationalError) as e:
+            if attempt == max_retries:
+                logger.warning(f"⚠️ Booking on schedule {schedule.pk} gave up after {attempt + 1} attempts: {e}")
+                break
+            time.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    return {
+        'success': False,
+        'error_code': 'BOOKING_BUSY',
+        'message': 'The schedule is busy right now. Please try again.'
+    }
+
+
+def cancel_appointment(appointment, max_retries=None):
+    """
+    Cancel a scheduled appointment and release its slot in one transaction.
+
+    Returns:
+        bool: False if the appointment was no longer in 'scheduled' state
+    """
+    if max_retries is None:
+        max_retries = getattr(settings, 'BOOKING_MAX_RETRIES', 3)
+    schedule = appointment.schedule
+
+    for attempt in range(max_retries + 1):
+        try:
+            with transaction.atomic():
+                updated = Appointment.objects.filter(
+                    pk=appointment.pk,
+                    status='scheduled'
+                ).update(status='canceled')
+                if not updated:
+                    return False
+
+                if appointment.time_slot_id:
+                    TimeSlot.objects.filter(pk=appointment.time_slot_id).update(is_booked=False)
+                    if schedule.virtual_slots:
+                        index = schedule.get_slot_index(appointment.appointment_start_time)
+                        _set_virtual_slot(schedule, index, booked=False)
+
+                DoctorSchedule.objects.filter(pk=schedule.pk).update(
+                    available_slots=F('available_slots') + 1
+                )
+                _refresh_availability(schedule)
+            appointment.status = 'canceled'
+            return True
+        except (BookingConflictError, OperationalError):
+            if attempt == max_retries:
+                raise
+            time.sleep(getattr(settings, 'BOOKING_RETRY_BACKOFF_SECONDS', 0.05) * (2 ** attempt))
+
+
+def create_slot_hold(user, schedule, time_slot=None, start_time=None, end_time=None, minutes=None):
+    """
+    Reserve a slot (or a window on a range-based schedule) for a few minutes.
+
+    Expired holds are never swept: they stop counting as soon as expires_at
+    passes and are overwritten the next time someone holds the same slot.
+    Each user keeps at most one hold per schedule.
+
+    Returns:
+        dict: {'success': True, 'hold': SlotHold}
+              or {'success': False, 'error_code': str, 'message': str}
+    """
+    if minutes is None:
+        minutes = getattr(settings, 'SLOT_HOLD_MINUTES', 5)
+    minutes = min(minutes, getattr(settings, 'SLOT_HOLD_MAX_MINUTES', 15))
+    now = timezone.now()
+
+    try:
+        with transaction.atomic():
+            if not time_slot:
+                # Serialize with other holds and bookings before counting, as bookings do
+                available_slots = _lock_schedule(schedule)
+            SlotHold.objects.filter(user=user, schedule=schedule).delete()
+            if time_slot:
+                slot_index = schedule.get_slot_index(time_slot.start_time)
+                start_time, end_time = time_slot.start_time, time_slot.end_time
+                SlotHold.objects.filter(
+                    schedule=schedule,
+                    slot_index=slot_index,
+                    expires_at__lte=now
+                ).delete()
+            else:
+                slot_index = None
+                active_holds = SlotHold.objects.active(now).filter(schedule=schedule).count()
+                if active_holds >= available_slots:
+                    raise SlotTakenError('All openings on this schedule are currently held', error_code='SLOT_HELD')
+                if _schedule_overlaps(schedule, start_time, end_time):
+                    raise SlotTakenError('This time overlaps another booking on this schedule', error_code='TIME_CONFLICT')
+
+            hold = SlotHold.objects.create(
+                user=user,
+                schedule=schedule,
+                slot_index=slot_index,
+                start_time=start_time,
+                end_time=end_time,
+                expires_at=now + timedelta(minutes=minutes)
+            )
+            AvailabilityChange.record([(schedule.pk, schedule.doctor_id)])
+    except IntegrityError:
+        return {
+            'success': False,
+            'error_code': 'SLOT_HELD',
+            'message': 'This time slot is being held by another patient'
+        }
+    except SlotTakenError as e:
+        return {
+            'success': False,
+            'error_code': e.error_code,
+            'message': str(e)
+        }
+
+    return {'success': True, 'hold': hold}
+
+
+def release_slot_hold(user, token):
+    """Drop a hold early; returns False if it did not exist"""
+    hold = SlotHold.objects.filter(user=user, token=token).select_related('schedule').first()
+    if hold is None:
+        return False
+    with transaction.atomic():
+        deleted, _ = SlotHold.objects.filter(pk=hold.pk).delete()
+        if deleted:
+            AvailabilityChange.record([(hold.schedule_id, hold.schedule.doctor_id)])
+    return deleted > 0
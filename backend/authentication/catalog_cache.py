@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def get_version(key):
+    """Current (version, updated_at) of a cache key; (0, None) if never bumped"""
+    from authentication.models import CacheVersion
+    row = CacheVersion.objects.filter(key=key).values_list('version', 'updated_at').first()
+    return row or (0, None)
+
+
+def bump_version(key):
+    """Invalidate every worker's in-memory copy of `key`"""
+    from authentication.models import CacheVersion
+    now = timezone.now()
+    updated = CacheVersion.objects.filter(key=key).update(version=F('version') + 1, updated_at=now)
+    if not updated:
+        try:
+            # Savepoint: a lost race must not break the caller's transaction
+            with transaction.atomic():
+                CacheVersion.objects.create(key=key, version=1, updated_at=now)
+        except IntegrityError:
+            CacheVersion.objects.filter(key=key).update(version=F('version') + 1, updated_at=now)
+
+
+class CatalogCache:
+    """
+    In-process cache of a small, rarely changing catalog.
+
+    The shared version counter is checked at most once every
+    CATALOG_CACHE_CHECK_SECONDS, so all gunicorn workers converge within
+    that interval after a change; the worker that made the change drops
+    its copy immediately.
+    """
+
+    def __init__(self, key, loader):
+        self.key = key
+        self.loader = loader
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._items = None
+        self._by_id = None
+
+    def _refresh(self):
+        now = time.monotonic()
+        interval = getattr(settings, 'CATALOG_CACHE_CHECK_SECONDS', 5)
+        if self._items is not None and now - self._checked_at < interval:
+            self.hits += 1
+            return
+        version, _ = get_version(self.key)
+        self._checked_at = now
+        if self._items is not None and version == self._version:
+            self.hits += 1
+            return
+        self.misses += 1
+        self._items = self.loader()
+        self._by_id = {item['id']: item for item in self._items}
+        self._version = version
+        logger.info(f"📚 Loaded {len(self._items)} {self.key} into the catalog cache (v{version})")
+
+    def all(self):
+        with self._lock:
+            self._refresh()
+            return self._items
+
+    def resolve(self, ids):
+        """Map ids to cached items, keeping the order of the ids"""
+        with self._lock:
+            self._refresh()
+            return [self._by_id[pk] for pk in ids if pk in self._by_id]
+
+    def invalidate(self):
+        with self._lock:
+            self._items = None
+            self._by_id = None
+
+    def stats(self):
+        return {
+            'key': self.key,
+            'version': self._version,
+            'size': len(self._items) if self._items is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def _load_specialties():
+    from authentication.models import Specialty
+    return list(Specialty.objects.order_by('pk').values('id', 'name'))
+
+
+def _load_languages():
+    from authentication.models import Language
+    return list(Language.objects.order_by('pk').values('id', 'name'))
+
+
+specialty_catalog = CatalogCache('specialties', _load_specialties)
+language_catalog = CatalogCache('languages', _load_languages)
+CATALOGS = {catalog.key: catalog for catalog in (specialty_catalog, language_catalog)}
+
+
+def invalidate_catalog(catalog):
+    bump_version(catalog.key)
+    catalog.invalidate()
+
+
+def get_catalog_cache_stats():
+    return [catalog.stats() for catalog in CATALOGS.values()]
@@ -0,0 +1,77 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import CacheVersion
+
+
+def get_change_marker(keys):
+    """
+    Combine the shared CacheVersion counters of `keys` into one marker.
+
+    Returns:
+        tuple: (etag, last_modified) where last_modified is a datetime or None
+    """
+    rows = dict(
+        (key, (version, updated_at))
+        for key, version, updated_at in CacheVersion.objects.filter(
+            key__in=keys
+        ).values_list('key', 'version', 'updated_at')
+    )
+    parts = []
+    last_modified = None
+    for key in keys:
+        version, updated_at = rows.get(key, (0, None))
+        parts.append(f'{key}:{version}')
+        if updated_at and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+    etag = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return etag, last_modified
+
+
+class ConditionalGetMixin:
+    """
+    ETag/Last-Modified support for the read actions of a view whose
+    response only depends on the URL and on the tables named in
+    `condition_keys`. The marker is checked before the queryset is touched,
+    so a matching If-None-Match/If-Modified-Since costs a single query.
+    """
+    condition_keys = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.change_marker = None
+        self.not_modified_response = None
+        if request.method in ('GET', 'HEAD'):
+            etag, last_modified = get_change_marker(self.condition_keys)
+            self.change_marker = (
+                quote_etag(etag),
+                last_modified.timestamp() if last_modified else None
+            )
+            self.not_modified_response = get_conditional_response(
+                request,
+                etag=self.change_marker[0],
+                last_modified=self.change_marker[1]
+            )
+
+    def list(self, request, *args, **kwargs):
+        if self.not_modified_response is not None:
+            return self.not_modified_response
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.not_modified_response is not None:
+            return self.not_modified_response
+        return super().retrieve(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        marker = getattr(self, 'change_marker', None)
+        if marker and response.status_code in (200, 304):
+            etag, last_modified = marker
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            # Clients may keep the copy but must revalidate it every time
+            patch_cache_control(response, no_cache=True)
+        return super().finalize_response(request, response, *args, **kwargs)
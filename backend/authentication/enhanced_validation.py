@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 import pytz
 import logging
 
+from .intervals import IntervalSet
+
 logger = logging.getLogger(__name__)
 
 # Get IST timezone
@@ -107,7 +109,64 @@ def validate_schedule_time(schedule_date, start_time, end_time=None):
     
     return result
 
-def validate_appointment_booking(doctor_id, schedule_id, date, start_time, end_time=None, user=None):
+class BookingContext:
+    """
+    Rows needed to validate and perform one booking, loaded once and shared
+    by BookAppointmentSerializer, validate_appointment_booking and
+    BookAppointmentView instead of each re-fetching them.
+    """
+    
+    def __init__(self, schedule, time_slot=None, user=None):
+        self.schedule = schedule
+        self.time_slot = time_slot
+        self.user = user
+        self._patient = None
+        self._patient_loaded = False
+        self._same_day_appointments = None
+    
+    @classmethod
+    def load(cls, schedule_id, time_slot_id=None, user=None):
+        """
+        Load the schedule with its doctor in one query, plus the requested
+        time slot (no query for virtual slots).
+        """
+        from authentication.models import DoctorSchedule
+        
+        schedule = DoctorSchedule.objects.select_related('doctor').filter(id=schedule_id).first()
+        time_slot = None
+        if schedule and schedule.time_range == 'slot-based' and time_slot_id is not None:
+            time_slot = schedule.get_free_time_slot(time_slot_id)
+        return cls(schedule, time_slot=time_slot, user=user)
+    
+    @property
+    def patient(self):
+        if not self._patient_loaded:
+            from authentication.models import Patient
+            if self.user is not None:
+                self._patient = Patient.objects.filter(user=self.user).first()
+            self._patient_loaded = True
+        return self._patient
+    
+    @property
+    def same_day_appointments(self):
+        """The patient's scheduled appointments on the schedule date, with doctors joined"""
+        if self._same_day_appointments is None:
+            from authentication.models import Appointment
+            if self.patient is None:
+                self._same_day_appointments = []
+            else:
+                day_start = timezone.make_aware(datetime.combine(self.schedule.date, datetime.min.time()))
+                self._same_day_appointments = list(
+                    Appointment.objects.filter(
+                        patient=self.patient,
+                        start_datetime__gte=day_start,
+                        start_datetime__lt=day_start + timedelta(days=1),
+                        status='scheduled'
+                    ).select_related('doctor')
+                )
+        return self._same_day_appointments
+
+def validate_appointment_booking(doctor_id, schedule_id, date, start_time, end_time=None, user=None, context=None):
     """
     Comprehensive validation for appointment booking
     
@@ -118,12 +177,13 @@ def validate_appointment_booking(doctor_id, schedule_id, date, start_time, end_t
         start_time: Appointment start time
         end_time: Appointment end time (optional)
         user: User object (optional)
+        context: BookingContext already loaded by the caller (optional)
     
     Returns:
         dict: Validation result with detailed info
     """
     try:
-        from authentication.models import DoctorSchedule, Appointment, Doctor
+        from authentication.models import Doctor
         
         now_ist = get_current_ist_time()
         
@@ -137,31 +197,30 @@ def validate_appointment_booking(doctor_id, schedule_id, date, start_time, end_t
                 'current_ist': now_ist
             }
         
-        # 2. Check if doctor exists
-        try:
-            doctor = Doctor.objects.get(id=doctor_id)
-        except Doctor.DoesNotExist:
-            return {
-                'valid': False,
-                'error_code': 'DOCTOR_NOT_FOUND',
-                'message': f'Doctor with ID {doctor_id} not found',
-                'current_ist': now_ist
-            }
+        if context is None:
+            context = BookingContext.load(schedule_id, user=user)
+        schedule = context.schedule
+        
+        # 2. Check if doctor exists (only costs a query when the schedule lookup failed)
+        if schedule is None or schedule.doctor_id != int(doctor_id):
+            if not Doctor.objects.filter(id=doctor_id).exists():
+                return {
+                    'valid': False,
+                    'error_code': 'DOCTOR_NOT_FOUND',
+                    'message': f'Doctor with ID {doctor_id} not found',
+                    'current_ist': now_ist
+                }
+            schedule = None
         
         # 3. Check if schedule exists and is active
-        try:
-            schedule = DoctorSchedule.objects.get(
-                id=schedule_id, 
-                doctor_id=doctor_id, 
-                is_active=True
-            )
-        except DoctorSchedule.DoesNotExist:
+        if schedule is None or not schedule.is_active:
             return {
                 'valid': False,
                 'error_code': 'SCHEDULE_NOT_FOUND',
                 'message': f'Schedule with ID {schedule_id} not found or inactive',
                 'current_ist': now_ist
             }
+        doctor = schedule.doctor
         
         # 4. Validate schedule date matches appointment date
         if isinstance(date, str):
@@ -186,15 +245,16 @@ def validate_appointment_booking(doctor_id, schedule_id, date, start_time, end_t
         
         # 6. If user is provided, check for duplicate/conflicting appointments
         if user:
-            existing_appointments = Appointment.objects.filter(
-                patient__user=user,
-                schedule__date=date,
-                status='scheduled'
-            )
+            if context.user is None:
+                context.user = user
+            existing_appointments = context.same_day_appointments
             
             # Check for same doctor on same date
-            same_doctor_appointments = existing_appointments.filter(doctor_id=doctor_id)
-            if same_doctor_appointments.count() >= 2:  # Limit to 2 appointments per doctor per day
+            same_doctor_appointments = [
+                appointment for appointment in existing_appointments
+                if appointment.doctor_id == schedule.doctor_id
+            ]
+            if len(same_doctor_appointments) >= 2:  # Limit to 2 appointments per doctor per day
                 return {
                     'valid': False,
                     'error_code': 'MAX_APPOINTMENTS_REACHED',
@@ -208,32 +268,35 @@ def validate_appointment_booking(doctor_id, schedule_id, date, start_time, end_t
             if end_time and isinstance(end_time, str):
                 end_time = datetime.strptime(end_time, '%H:%M:%S').time()
             
-            for appointment in existing_appointments:
-                existing_start = appointment.appointment_start_time
-                existing_end = appointment.appointment_end_time
-                
-                # Check for time overlap
-                if end_time:
-                    if start_time < existing_end and end_time > existing_start:
-                        return {
-                            'valid': False,
-                            'error_code': 'OVERLAPPING_APPOINTMENT',
-                            'message': f'Appointment time overlaps with existing appointment at {existing_start}-{existing_end}',
-                            'current_ist': now_ist,
-                            'conflicting_appointment': {
-                                'doctor': appointment.doctor.first_name + ' ' + appointment.doctor.last_name,
-                                'time': f'{existing_start}-{existing_end}'
-                            }
-                        }
-                else:
-                    # For single time slot, check if exact time already booked
-                    if start_time == existing_start:
-                        return {
-                            'valid': False,
-                            'error_code': 'DUPLICATE_BOOKING',
-                            'message': f'You already have an appointment at this exact time',
-                            'current_ist': now_ist
+            existing_intervals = IntervalSet(
+                (appointment.appointment_start_time, appointment.appointment_end_time, appointment)
+                for appointment in existing_appointments
+            )
+            
+            # Check for time overlap
+            if end_time:
+                conflict = existing_intervals.find_overlap(start_time, end_time)
+                if conflict:
+                    existing_start, existing_end, appointment = conflict
+                    return {
+                        'valid': False,
+                        'error_code': 'OVERLAPPING_APPOINTMENT',
+                        'message': f'Appointment time overlaps with existing appointment at {existing_start}-{existing_end}',
+                        'current_ist': now_ist,
+                        'conflicting_appointment': {
+                            'doctor': appointment.doctor.first_name + ' ' + appointment.doctor.last_name,
+                            'time': f'{existing_start}-{existing_end}'
                         }
+                    }
+            else:
+                # For single time slot, check if exact time already booked
+                if any(existing_start == start_time for existing_start, _, _ in existing_intervals):
+                    return {
+                        'valid': False,
+                        'error_code': 'DUPLICATE_BOOKING',
+                        'message': f'You already have an appointment at this exact time',
+                        'current_ist': now_ist
+                    }
         
         # 7. Validate time is within schedule bounds
         schedule_start = schedule.start_time
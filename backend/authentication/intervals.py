@@ -0,0 +1,62 @@
+from bisect import bisect_left
+
+
+class IntervalSet:
+    """
+    Half-open [start, end) intervals sorted by start, for sweeping the free
+    gaps of rows already loaded (a schedule's bookings, a patient's day).
+    Booking conflict checks don't use it; they ask the database directly.
+
+    Alongside the sorted starts, max_ends[i] holds the largest end among
+    the first i + 1 intervals: an interval overlapping [start, end) must
+    begin before `end`, and one of those reaches past `start` exactly when
+    their running maximum end does. This stays correct even if the stored
+    intervals overlap each other (e.g. bookings made before overlaps were
+    enforced).
+
+    Building the set sorts the intervals, O(n log n); each overlap query
+    after that is a binary search.
+
+    Values only need to be comparable: times, datetimes or minutes.
+    """
+
+    def __init__(self, intervals=()):
+        self.intervals = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.starts = [interval[0] for interval in self.intervals]
+        self.max_ends = []
+        running = None
+        for start, end, *_ in self.intervals:
+            running = end if running is None or end > running else running
+            self.max_ends.append(running)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __iter__(self):
+        return iter(self.intervals)
+
+    def overlaps(self, start, end):
+        position = bisect_left(self.starts, end)
+        return position > 0 and self.max_ends[position - 1] > start
+
+    def find_overlap(self, start, end):
+        """The latest-starting stored interval overlapping [start, end), or None"""
+        position = bisect_left(self.starts, end)
+        if not (position > 0 and self.max_ends[position - 1] > start):
+            return None
+        for index in range(position - 1, -1, -1):
+            if self.intervals[index][1] > start:
+                return self.intervals[index]
+
+    def gaps(self, lower, upper):
+        """Free [start, end) windows between lower and upper, in order, in one pass"""
+        cursor = lower
+        for start, end, *_ in self.intervals:
+            if start >= upper:
+                break
+            if start > cursor:
+                yield cursor, start
+            if end > cursor:
+                cursor = end
+        if cursor < upper:
+            yield cursor, upper
@@ -0,0 +1,93 @@
+import logging
+import math
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import DatabaseError
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 99)
+
+
+class JobRunTimer:
+    """Handed to the body of `record_job_run`; set rows_affected before it returns"""
+
+    def __init__(self):
+        self.rows_affected = 0
+
+
+@contextmanager
+def record_job_run(job, skip_empty=False):
+    """
+    Time the enclosed block and store it as a JobRun, failed if it raises
+    (the exception still propagates). With skip_empty, successful runs that
+    touched no rows are not stored, for jobs that wake up often.
+    """
+    from .models import JobRun
+    run = JobRunTimer()
+    started_at = timezone.now()
+    started = time.perf_counter()
+    outcome, error = 'success', ''
+    try:
+        yield run
+    except Exception as e:
+        outcome, error = 'failed', str(e)[:200]
+        raise
+    finally:
+        if outcome == 'failed' or run.rows_affected or not skip_empty:
+            try:
+                JobRun.objects.create(
+                    job=job,
+                    started_at=started_at,
+                    duration_ms=round((time.perf_counter() - started) * 1000),
+                    rows_affected=run.rows_affected,
+                    outcome=outcome,
+                    error=error,
+                )
+            except DatabaseError as e:
+                logger.error(f"❌ Could not record {job} run: {e}")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)]
+
+
+def job_run_summary(days=7, now=None):
+    """Per-job run counts, failures, rows and duration percentiles over the last `days`"""
+    from .models import JobRun
+    since = (now or timezone.now()) - timedelta(days=days)
+    runs = {}
+    for job, started_at, duration_ms, rows_affected, outcome in (
+        JobRun.objects.filter(started_at__gte=since)
+        .order_by('job', 'started_at')
+        .values_list('job', 'started_at', 'duration_ms', 'rows_affected', 'outcome')
+        .iterator()
+    ):
+        runs.setdefault(job, []).append((started_at, duration_ms, rows_affected, outcome))
+
+    summary = {}
+    for job, job_runs in runs.items():
+        durations = sorted(run[1] for run in job_runs)
+        last_started_at, last_duration, last_rows, last_outcome = job_runs[-1]
+        summary[job] = {
+            'runs': len(job_runs),
+            'failures': sum(1 for run in job_runs if run[3] == 'failed'),
+            'rows_affected': sum(run[2] for run in job_runs),
+            'duration_ms': {
+                **{f'p{pct}': percentile(durations, pct) for pct in PERCENTILES},
+                'max': durations[-1],
+            },
+            'last_run': {
+                'started_at': last_started_at,
+                'duration_ms': last_duration,
+                'rows_affected': last_rows,
+                'outcome': last_outcome,
+            },
+        }
+    return summary
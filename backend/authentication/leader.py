@@ -0,0 +1,173 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _heartbeat_seconds():
+    return getattr(settings, 'JOB_LEADER_HEARTBEAT_SECONDS', 2)
+
+
+def _timeout_seconds():
+    return getattr(settings, 'JOB_LEADER_TIMEOUT_SECONDS', 10)
+
+
+class LeaderLease:
+    """
+    Leader election on one JobLease row, shared by every process and
+    container that uses the same database.
+
+    The leader renews by bumping `beat` where `holder` is itself; a renewal
+    that matches no row means the lease was taken over. A standby records
+    the `beat` it sees and when (monotonic clock); once that value has not
+    moved for JOB_LEADER_TIMEOUT_SECONDS it claims the lease with an UPDATE
+    conditioned on the same `beat`, so only one standby can win. A released
+    lease (empty holder) is claimed on the next poll.
+    """
+
+    def __init__(self, name, identity=None):
+        self.name = name
+        self.identity = identity or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._observed_beat = None
+        self._observed_at = None
+
+    def _queryset(self):
+        from .models import JobLease
+        return JobLease.objects.filter(name=self.name)
+
+    def _row(self):
+        from .models import JobLease
+        try:
+            return JobLease.objects.get_or_create(name=self.name)[0]
+        except IntegrityError:
+            # Another process created it first
+            return JobLease.objects.get(name=self.name)
+
+    def try_acquire(self):
+        """Claim the lease if it is free or its holder went quiet; True when held"""
+        lease = self._row()
+        if lease.holder == self.identity:
+            return self.renew()
+        if lease.holder:
+            now = time.monotonic()
+            if lease.beat != self._observed_beat:
+                self._observed_beat, self._observed_at = lease.beat, now
+                return False
+            if now - self._observed_at < _timeout_seconds():
+                return False
+        claimed_at = timezone.now()
+        claimed = self._queryset().filter(beat=lease.beat).update(
+            holder=self.identity,
+            beat=F('beat') + 1,
+            acquired_at=claimed_at,
+            heartbeat_at=claimed_at,
+        )
+        if claimed and lease.holder:
+            logger.warning(f"👑 Took over '{self.name}' from {lease.holder} (no heartbeat for {_timeout_seconds()}s)")
+        self._observed_beat = None
+        return bool(claimed)
+
+    def renew(self):
+        """Heartbeat; False when another process has taken the lease over"""
+        return bool(self._queryset().filter(holder=self.identity).update(
+            beat=F('beat') + 1,
+            heartbeat_at=timezone.now(),
+        ))
+
+    def release(self):
+        """Give the lease up so a standby takes over on its next poll"""
+        return bool(self._queryset().filter(holder=self.identity).update(
+            holder='',
+            beat=F('beat') + 1,
+        ))
+
+
+class LeaderElectedRunner:
+    """
+    Runs `start` while this process holds the lease and `stop` when it
+    loses or gives it up.
+
+    The leader steps down by itself when it has not managed to renew for
+    JOB_LEADER_TIMEOUT_SECONDS minus two heartbeats (e.g. the database is
+    unreachable), which is before any standby may claim the lease, so two
+    processes never run the jobs at once.
+    """
+
+    def __init__(self, name, start, stop):
+        self.lease = LeaderLease(name)
+        self.start = start
+        self.stop = stop
+        self.leading = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _step_down(self, reason):
+        logger.warning(f"🔻 {self.lease.identity} stepping down from '{self.lease.name}': {reason}")
+        self.leading = False
+        self.stop()
+
+    def run(self):
+        heartbeat = _heartbeat_seconds()
+        step_down_after = _timeout_seconds() - 2 * heartbeat
+        renewed_at = None
+        logger.info(f"🗳️ {self.lease.identity} competing for '{self.lease.name}'")
+        try:
+            while not self._stop_event.is_set():
+                close_old_connections()
+                try:
+                    if self.leading:
+                        if self.lease.renew():
+                            renewed_at = time.monotonic()
+                        else:
+                            self._step_down("lease taken over")
+                    elif self.lease.try_acquire():
+                        renewed_at = time.monotonic()
+                        self.leading = True
+                        logger.info(f"👑 {self.lease.identity} is now running '{self.lease.name}'")
+                        self.start()
+                except DatabaseError as e:
+                    logger.error(f"❌ Lease heartbeat failed: {e}")
+                if self.leading and time.monotonic() - renewed_at > step_down_after:
+                    self._step_down("could not renew the lease")
+                self._stop_event.wait(heartbeat)
+        finally:
+            if self.leading:
+                self.leading = False
+                self.stop()
+                try:
+                    self.lease.release()
+                except DatabaseError as e:
+                    logger.error(f"❌ Could not release the lease: {e}")
+            close_old_connections()
+
+    def shutdown(self, timeout=10):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_in_background(self):
+        self._thread = threading.Thread(target=self.run, name=f'leader-{self.lease.name}', daemon=True)
+        self._thread.start()
+
+
+def lease_status(name):
+    """Current holder and last heartbeat of a lease, as stored in the database"""
+    from .models import JobLease
+    lease = JobLease.objects.filter(name=name).first()
+    if not lease or not lease.holder:
+        return {'holder': None, 'acquired_at': None, 'heartbeat_at': None}
+    return {
+        'holder': lease.holder,
+        'acquired_at': lease.acquired_at,
+        'heartbeat_at': lease.heartbeat_at,
+    }
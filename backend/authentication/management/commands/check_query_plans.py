@@ -0,0 +1,131 @@
+from datetime import time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from authentication.models import (
+    Appointment, Doctor, DoctorSchedule, TimeSlot, Patient, SlotHold, ScheduleAvailability, MedicalHistory,
+    ArchivedAppointment
+)
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN QUERY PLAN on the booking hot paths and fail if any of them scans a whole table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print the full plan for every query',
+        )
+
+    def get_hot_queries(self):
+        """Representative querysets for the hot access paths"""
+        now = timezone.now()
+        today = now.date()
+        schedule_ids = [1, 2, 3]
+        return {
+            'scheduler: due appointments': Appointment.objects.filter(
+                status='scheduled',
+                end_datetime__lt=now
+            ),
+            'appointments: patient listing': Appointment.objects.filter(
+                patient_id=1
+            ),
+            'booking: patient same-day appointments': Appointment.objects.filter(
+                patient_id=1,
+                start_datetime__gte=now,
+                start_datetime__lt=now + timedelta(days=1),
+                status='scheduled'
+            ),
+            'booking: range overlap on schedule': Appointment.objects.filter(
+                schedule_id=1,
+                status='scheduled',
+                appointment_start_time__lt=time(10, 30),
+                appointment_end_time__gt=time(10, 0)
+            ),
+            'available slots: doctor schedules': DoctorSchedule.objects.filter(
+                doctor_id=1,
+                date__gte=today,
+                date__lte=today + timedelta(days=30),
+                is_active=True,
+                available_slots__gt=0
+            ).order_by('date', 'start_time'),
+            'schedule listing: upcoming window': DoctorSchedule.objects.filter(
+                date__gte=today,
+                date__lte=today + timedelta(days=30)
+            ).order_by('date', 'start_time', 'id'),
+            'schedule serializer: unbooked slots': TimeSlot.objects.filter(
+                is_booked=False,
+                schedule_id__in=schedule_ids
+            ).order_by('start_time'),
+            'slot holds: live holds': SlotHold.objects.active().filter(
+                schedule_id__in=schedule_ids,
+                slot_index__isnull=False
+            ),
+            'soonest available: next-available index': ScheduleAvailability.objects.filter(
+                start_datetime__gte=now,
+                start_datetime__lt=now + timedelta(days=7),
+                part_of_day='morning',
+                doctor__specialties__id=1
+            ).order_by('start_datetime'),
+            'doctor directory: keyset page by name': Doctor.objects.filter(
+                Q(first_name__gt='M') | Q(first_name='M', id__gt=10),
+                first_name__gte='M'
+            ).order_by('first_name', 'id')[:11],
+            'appointments: patient keyset page': Appointment.objects.filter(
+                Q(start_datetime__gt=now) | Q(start_datetime=now, id__gt=10),
+                patient_id=1,
+                start_datetime__gte=now
+            ).order_by('start_datetime', 'id')[:21],
+            'medical history: patient keyset page': MedicalHistory.objects.filter(
+                Q(diagnosis_date__lt=today) | Q(diagnosis_date=today, id__lt=10),
+                patient_id=1,
+                diagnosis_date__lte=today
+            ).order_by('-diagnosis_date', '-id')[:21],
+            'archived appointments: patient keyset page': ArchivedAppointment.objects.filter(
+                Q(start_datetime__lt=now) | Q(start_datetime=now, id__lt=10),
+                patient__user_id=1,
+                start_datetime__lte=now
+            ).order_by('-start_datetime', '-id')[:21],
+            'otp: patient by phone': Patient.objects.filter(phone_number='9876543210'),
+        }
+
+    def find_full_scans(self, plan):
+        """Return plan lines that read a whole table instead of using an index"""
+        scans = []
+        for line in plan.splitlines():
+            if connection.vendor == 'sqlite':
+                # SQLite reports 'SCAN <table>' for a full scan and
+                # 'SCAN <table> USING [COVERING] INDEX' for an index walk
+                if 'SCAN ' in line and 'USING' not in line and 'CONSTANT ROW' not in line:
+                    scans.append(line.strip())
+            elif 'Seq Scan' in line:
+                scans.append(line.strip())
+        return scans
+
+    def handle(self, *args, **options):
+        failures = []
+
+        for name, queryset in self.get_hot_queries().items():
+            plan = queryset.explain()
+            scans = self.find_full_scans(plan)
+
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"❌ {name}"))
+                for scan in scans:
+                    self.stdout.write(f"     {scan}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"✅ {name}"))
+
+            if options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f"     {line}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries fall back to a full table scan: {', '.join(failures)}")
+
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index'))
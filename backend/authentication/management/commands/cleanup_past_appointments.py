@@ -1,8 +1,17 @@
+import time
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
 from django.utils import timezone
-from django.db.models import Q
 from datetime import timedelta
-from authentication.models import Appointment, DoctorSchedule, TimeSlot
+from authentication.models import (
+    Appointment, DoctorSchedule, TimeSlot, AvailabilityChange, JobRun,
+    SlotHold, ScheduleAvailability, PurgeCheckpoint, ArchivedAppointment
+)
+from authentication.availability import refresh_stale_doctor_availability
+from authentication.job_runs import record_job_run
+
+CHECKPOINT_JOB = 'cleanup_past_appointments'
 
 class Command(BaseCommand):
     help = 'Clean up past appointments and schedules'
@@ -24,8 +33,34 @@ class Command(BaseCommand):
             action='store_true',
             help='Update appointment statuses (scheduled -> completed for past appointments)',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=getattr(settings, 'CLEANUP_PURGE_CHUNK_SIZE', 200),
+            help='Schedules (or log rows) deleted per transaction',
+        )
+        parser.add_argument(
+            '--throttle',
+            type=float,
+            default=getattr(settings, 'CLEANUP_PURGE_THROTTLE_SECONDS', 0.05),
+            help='Seconds to pause between chunks so bookings get the write lock',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the checkpoint left by an interrupted run',
+        )
 
     def handle(self, *args, **options):
+        if options['dry_run']:
+            self.cleanup(options)
+            return
+        # Timed and stored in the job-run history (see `cleanup_scheduler status`)
+        with record_job_run('cleanup_past_appointments') as run:
+            run.rows_affected = self.cleanup(options)
+
+    def cleanup(self, options):
+        """Run the cleanup; returns the number of rows updated or deleted"""
         days = options['days']
         dry_run = options['dry_run']
         update_status = options['update_status']
@@ -37,63 +72,175 @@ class Command(BaseCommand):
         self.stdout.write(f"Cleaning up data older than {cutoff_date}")
         
         # NEW: Update appointment statuses first
+        status_count = 0
         if update_status:
-            self.update_appointment_statuses(current_datetime, dry_run)
+            status_count = self.update_appointment_statuses(current_datetime, dry_run)
         
-        # Find past appointments
-        past_appointments = Appointment.objects.filter(
-            schedule__date__lt=cutoff_date,
-            status='scheduled'  # Only clean up scheduled appointments
+        if dry_run:
+            self.stdout.write(f"DRY RUN - Would delete:")
+            self.stdout.write(f"  - {Appointment.objects.filter(schedule__date__lt=cutoff_date).count()} past appointments")
+            finished = Appointment.objects.filter(
+                schedule__date__lt=cutoff_date, status__in=ArchivedAppointment.ARCHIVED_STATUSES
+            ).count()
+            unfinished = Appointment.objects.filter(schedule__date__lt=cutoff_date, status='scheduled').count()
+            self.stdout.write(f"    ({finished} finished ones archived first, plus {unfinished} still scheduled marked completed)")
+            self.stdout.write(f"  - {DoctorSchedule.objects.filter(date__lt=cutoff_date).count()} past schedules")
+            self.stdout.write(f"  - {TimeSlot.objects.filter(schedule__date__lt=cutoff_date).count()} past time slots")
+            return 0
+
+        # Past schedules go with everything attached to them; their
+        # appointments are archived first
+        purged, archived, completed = self.purge_schedules(cutoff_date, options['chunk_size'], options['throttle'], options['restart'])
+
+        # Doctors whose next opening was on a day that is now over
+        refreshed = refresh_stale_doctor_availability()
+
+        # Workers replay the change log within seconds; old entries are never read again
+        retention = getattr(settings, 'AVAILABILITY_CHANGE_RETENTION_DAYS', 2)
+        change_count = self.purge_log(
+            AvailabilityChange, 'created_at', current_datetime - timedelta(days=retention),
+            options['chunk_size'], options['throttle']
         )
         
-        # Find past schedules
-        past_schedules = DoctorSchedule.objects.filter(
-            date__lt=cutoff_date
+        run_retention = getattr(settings, 'JOB_RUN_RETENTION_DAYS', 90)
+        job_run_count = self.purge_log(
+            JobRun, 'started_at', current_datetime - timedelta(days=run_retention),
+            options['chunk_size'], options['throttle']
         )
         
-        # Find past time slots
-        past_time_slots = TimeSlot.objects.filter(
-            schedule__date__lt=cutoff_date,
-            is_booked=False  # Only clean up unbooked slots
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully cleaned up:\n"
+                f"  - {purged['appointments']} past appointments ({archived} archived, "
+                f"{completed} still scheduled marked completed)\n"
+                f"  - {purged['schedules']} past schedules\n"
+                f"  - {purged['time_slots']} past time slots\n"
+                f"  - {purged['holds'] + purged['availability']} slot holds and availability index rows\n"
+                f"  - {refreshed} doctor availability summaries refreshed\n"
+                f"  - {change_count} availability change-log entries pruned\n"
+                f"  - {job_run_count} job-run history entries pruned"
+            )
         )
+        return status_count + completed + archived + sum(purged.values()) + change_count + job_run_count
         
-        if dry_run:
-            self.stdout.write(f"DRY RUN - Would delete:")
-            self.stdout.write(f"  - {past_appointments.count()} past appointments")
-            self.stdout.write(f"  - {past_schedules.count()} past schedules")
-            self.stdout.write(f"  - {past_time_slots.count()} past unbooked time slots")
-        else:
-            # Delete past data
-            appointment_count = past_appointments.count()
-            past_appointments.delete()
-            
-            time_slot_count = past_time_slots.count()
-            past_time_slots.delete()
+    def purge_statements(self, id_count):
+        """
+        (label, sql, params-per-id-list) for one chunk of schedule ids, children
+        first. Plain DELETEs: Django's collector would load every related row
+        (and fire per-object signals) before deleting anything.
+        """
+        qn = connection.ops.quote_name
+        ids = ', '.join(['%s'] * id_count)
+        schedule_table = qn(DoctorSchedule._meta.db_table)
+        appointment_table = qn(Appointment._meta.db_table)
+        slot_table = qn(TimeSlot._meta.db_table)
+        return [
+            ('appointments',
+             f"DELETE FROM {appointment_table} WHERE schedule_id IN ({ids}) "
+             f"OR time_slot_id IN (SELECT id FROM {slot_table} WHERE schedule_id IN ({ids}))", 2),
+            ('holds', f"DELETE FROM {qn(SlotHold._meta.db_table)} WHERE schedule_id IN ({ids})", 1),
+            ('availability', f"DELETE FROM {qn(ScheduleAvailability._meta.db_table)} WHERE schedule_id IN ({ids})", 1),
+            ('time_slots', f"DELETE FROM {slot_table} WHERE schedule_id IN ({ids})", 1),
+            ('schedules', f"DELETE FROM {schedule_table} WHERE id IN ({ids})", 1),
+        ]
             
-            schedule_count = past_schedules.count()
-            past_schedules.delete()
+    def purge_schedules(self, cutoff_date, chunk_size, throttle, restart):
+        """
+        Delete schedules before the cutoff, with their appointments, slots, holds
+        and index rows, in primary-key order, one transaction per chunk. In the
+        same transaction, appointments still 'scheduled' on those past days are
+        marked completed (as the status sweep would have) and every appointment
+        is copied to the archive. The checkpoint is committed with each chunk,
+        so an interrupted purge picks up where it stopped without losing or
+        duplicating history.
+
+        Returns the rows deleted per table, the number of appointments archived
+        and the number marked completed.
+        """
+        checkpoint = PurgeCheckpoint.objects.filter(job=CHECKPOINT_JOB).first()
+        if checkpoint and (restart or checkpoint.cutoff != cutoff_date):
+            # A later cutoff also covers schedules behind the old position
+            checkpoint.delete()
+            checkpoint = None
+        last_id = checkpoint.last_id if checkpoint else 0
+        previously_deleted = checkpoint.rows_deleted if checkpoint else 0
+        if checkpoint:
+            self.stdout.write(f"↩️  Resuming after schedule #{last_id} ({previously_deleted} rows purged before)")
             
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"Successfully cleaned up:\n"
-                    f"  - {appointment_count} past appointments\n"
-                    f"  - {schedule_count} past schedules\n"
-                    f"  - {time_slot_count} past unbooked time slots"
+        totals = dict.fromkeys(['appointments', 'holds', 'availability', 'time_slots', 'schedules'], 0)
+        archived = 0
+        completed = 0
+        started = time.perf_counter()
+        while True:
+            schedules = list(
+                DoctorSchedule.objects.filter(date__lt=cutoff_date, pk__gt=last_id)
+                .order_by('pk').values_list('pk', 'doctor_id')[:chunk_size]
+            )
+            if not schedules:
+                break
+            ids = [schedule_id for schedule_id, _ in schedules]
+            chunk_started = time.perf_counter()
+            chunk_rows = 0
+            with transaction.atomic():
+                # The day is over, so these would otherwise be deleted without a trace
+                completed += Appointment.objects.filter(
+                    schedule_id__in=ids, status='scheduled'
+                ).update(status='completed')
+                archived += ArchivedAppointment.archive_schedules(ids)
+                with connection.cursor() as cursor:
+                    for label, sql, repeat in self.purge_statements(len(ids)):
+                        cursor.execute(sql, ids * repeat)
+                        totals[label] += cursor.rowcount
+                        chunk_rows += cursor.rowcount
+                # What the post_delete signal would have logged for availability engines
+                AvailabilityChange.record(schedules)
+                last_id = ids[-1]
+                PurgeCheckpoint.objects.update_or_create(
+                    job=CHECKPOINT_JOB,
+                    defaults={
+                        'cutoff': cutoff_date,
+                        'last_id': last_id,
+                        'rows_deleted': previously_deleted + sum(totals.values()),
+                    }
                 )
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  🧹 {len(ids)} schedules, {chunk_rows} rows up to #{last_id} "
+                f"({chunk_rows / max(time.perf_counter() - chunk_started, 1e-6):.0f} rows/s, "
+                f"{sum(totals.values()) / max(elapsed, 1e-6):.0f} rows/s overall)"
             )
+            if len(ids) < chunk_size:
+                break
+            time.sleep(throttle)
+            
+        PurgeCheckpoint.objects.filter(job=CHECKPOINT_JOB).delete()
+        return totals, archived, completed
+            
+    def purge_log(self, model, date_field, older_than, chunk_size, throttle):
+        """Delete log rows older than a moment, oldest ids first, one transaction per chunk"""
+        deleted = 0
+        while True:
+            ids = list(
+                model.objects.filter(**{f'{date_field}__lt': older_than})
+                .order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            # No relations or signals, so this is a single DELETE ... WHERE id IN
+            count, _ = model.objects.filter(pk__in=ids).delete()
+            deleted += count
+            if len(ids) < chunk_size:
+                break
+            time.sleep(throttle)
+        return deleted
     
     def update_appointment_statuses(self, current_datetime, dry_run):
         """Update appointment statuses from scheduled to completed for past appointments"""
         
-        # FIXED: Use Q objects instead of union to avoid ORDER BY issues
+        # Single-table filter on the denormalized end datetime
         past_scheduled_appointments = Appointment.objects.filter(
-            status='scheduled'
-        ).filter(
-            Q(schedule__date__lt=current_datetime.date()) |  # Past dates
-            Q(  # Today but past end time
-                schedule__date=current_datetime.date(),
-                appointment_end_time__lt=current_datetime.time()
-            )
+            status='scheduled',
+            end_datetime__lt=current_datetime
         )
         
         count = past_scheduled_appointments.count()
@@ -102,9 +249,9 @@ class Command(BaseCommand):
             self.stdout.write(f"DRY RUN - Would update {count} appointments from 'scheduled' to 'completed'")
             if count > 0:
                 # Show first 5 examples
-                examples = past_scheduled_appointments[:5]
+                examples = past_scheduled_appointments.select_related('patient', 'doctor')[:5]
                 for apt in examples:
-                    self.stdout.write(f"  - {apt.patient} with {apt.doctor} on {apt.schedule.date} at {apt.appointment_start_time}")
+                    self.stdout.write(f"  - {apt.patient} with {apt.doctor} on {timezone.localtime(apt.start_datetime):%Y-%m-%d} at {apt.appointment_start_time}")
                 if count > 5:
                     self.stdout.write(f"  ... and {count - 5} more")
             else:
@@ -116,5 +263,7 @@ class Command(BaseCommand):
                 self.stdout.write(
                     self.style.SUCCESS(f"✅ Updated {updated} appointments from 'scheduled' to 'completed'")
                 )
+                return updated
             else:
                 self.stdout.write("ℹ️  No appointments needed status updates")
+        return 0
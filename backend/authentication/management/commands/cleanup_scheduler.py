@@ -36,7 +36,27 @@ class Command(BaseCommand):
                 )
                 for job in status['jobs']:
                     self.stdout.write(f"  📅 {job['name']} - Next run: {job['next_run']}")
+                transitions = status['status_transitions']
+                self.stdout.write(
+                    f"  ⏱️ Status transitions - next due: {transitions['next_due'] or 'none queued'}, "
+                    f"{transitions['transitions']} completed so far"
+                )
+            else:
+                self.stdout.write(
+                    self.style.ERROR('❌ Cleanup scheduler is not running in this process')
+                )
+            leader = status['leader']
+            if leader['holder']:
+                self.stdout.write(
+                    f"  👑 Jobs leader: {leader['holder']} - last heartbeat: {leader['heartbeat_at']}"
+                )
             else:
+                self.stdout.write('  👑 Jobs leader: none (is `manage.py run_jobs` running?)')
+            for job, runs in status['job_runs'].items():
+                durations = runs['duration_ms']
                 self.stdout.write(
-                    self.style.ERROR('❌ Cleanup scheduler is not running')
+                    f"  📈 {job} (7 days) - {runs['runs']} runs, {runs['failures']} failed, "
+                    f"{runs['rows_affected']} rows; "
+                    f"p50 {durations['p50']} ms, p90 {durations['p90']} ms, "
+                    f"p99 {durations['p99']} ms, max {durations['max']} ms"
                 )
\ No newline at end of file
@@ -1,6 +1,5 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.db.models import Q
 import pytz
 
 class Command(BaseCommand):
@@ -15,22 +14,14 @@ class Command(BaseCommand):
             # Get current IST time
             ist = pytz.timezone('Asia/Kolkata')
             now_ist = timezone.now().astimezone(ist)
-            current_date = now_ist.date()
-            current_time = now_ist.time()
             
             self.stdout.write(f"📅 Current IST: {now_ist.strftime('%Y-%m-%d %H:%M:%S')}")
             
             # Find all scheduled appointments that are in the past
             past_appointments = Appointment.objects.filter(
-                status='scheduled'
-            ).filter(
-                # Either past date OR (today but past end time)
-                Q(schedule__date__lt=current_date) | 
-                Q(
-                    schedule__date=current_date,
-                    appointment_end_time__lt=current_time
-                )
-            )
+                status='scheduled',
+                end_datetime__lt=now_ist
+            ).select_related('patient', 'doctor')
             
             count = past_appointments.count()
             
@@ -39,7 +30,7 @@ class Command(BaseCommand):
                 
                 # Show details before updating
                 for apt in past_appointments:
-                    self.stdout.write(f"   👤 {apt.patient.first_name} with Dr. {apt.doctor.first_name} on {apt.schedule.date} at {apt.appointment_start_time}-{apt.appointment_end_time}")
+                    self.stdout.write(f"   👤 {apt.patient.first_name} with Dr. {apt.doctor.first_name} on {apt.start_datetime.astimezone(ist):%Y-%m-%d} at {apt.appointment_start_time}-{apt.appointment_end_time}")
                 
                 # Update them
                 updated = past_appointments.update(status='completed')
@@ -6,9 +6,11 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User, Group
 from authentication.models import (
     Specialty, Language, Doctor, DoctorSchedule, 
-    Patient, MedicalHistory, Appointment
+    Patient, MedicalHistory, Appointment, ScheduleAvailability
 )
 from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.db import transaction
 
 class Command(BaseCommand):
     help = 'Populate database with sample data including both slot-based and range-based schedules'
@@ -24,6 +26,11 @@ class Command(BaseCommand):
             action='store_true',
             help='Do not clear existing data, just add more',
         )
+        parser.add_argument(
+            '--virtual-slots',
+            action='store_true',
+            help='Create slot-based schedules in virtual slot mode (no TimeSlot rows until booked)',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Starting database population...'))
@@ -54,7 +61,7 @@ class Command(BaseCommand):
         self.create_specialties()
         self.create_languages()
         self.create_doctors()
-        self.create_mixed_schedules()
+        self.create_mixed_schedules(virtual_slots=options['virtual_slots'])
         self.create_sample_patients()
 
         # --- CORRECTED SUPERUSER CREATION SECTION ---
@@ -530,11 +537,11 @@ class Command(BaseCommand):
             
         self.stdout.write(f'Created {created_count} new doctors (Total: {Doctor.objects.count()})')
 
-    def create_mixed_schedules(self):
+    def create_mixed_schedules(self, virtual_slots=False):
         """Create schedules with both slot-based and range-based types"""
         self.stdout.write('Creating mixed-type doctor schedules...')
         
-        doctors = Doctor.objects.all()
+        doctors = Doctor.objects.prefetch_related('specialties')
         
         # Create schedules for next 30 days
         start_date = datetime.now().date()
@@ -563,6 +570,15 @@ class Command(BaseCommand):
             'Anesthesiologist'
         ]
         
+        # Existing schedules are loaded once so duplicates are skipped in memory
+        pending_schedules = []
+        seen_keys = set(
+            DoctorSchedule.objects.filter(
+                date__gte=start_date,
+                date__lt=start_date + timedelta(days=30)
+            ).values_list('doctor_id', 'date', 'start_time', 'end_time')
+        )
+        
         for doctor in doctors:
             # Determine preference based on specialty
             doctor_specialties = [s.name for s in doctor.specialties.all()]
@@ -585,49 +601,51 @@ class Command(BaseCommand):
                     templates = random.sample(slot_based_templates, min(sessions_per_day, len(slot_based_templates)))
                     
                     for template in templates:
-                        try:
-                            schedule = DoctorSchedule.objects.create(
-                                doctor=doctor,
-                                date=current_date,
-                                time_range='slot-based',
-                                start_time=template['start'],
-                                end_time=template['end'],
-                                slot_duration=template['duration'],
-                                available_slots=0,  # Will be auto-calculated
-                                is_active=True
-                            )
+                        schedule = DoctorSchedule(
+                            doctor=doctor,
+                            date=current_date,
+                            time_range='slot-based',
+                            start_time=template['start'],
+                            end_time=template['end'],
+                            slot_duration=template['duration'],
+                            available_slots=0,  # Will be auto-calculated
+                            is_active=True,
+                            virtual_slots=virtual_slots
+                        )
+                        if self.queue_schedule(schedule, pending_schedules, seen_keys):
                             schedule_count += 1
                             slot_based_count += 1
-                        except Exception as e:
-                            # Skip if duplicate or validation error
-                            continue
                 
                 else:  # range-based
                     # Create range-based schedules
                     templates = random.sample(range_based_templates, min(sessions_per_day, len(range_based_templates)))
                     
                     for template in templates:
-                        try:
-                            # For range-based, available_slots represents max concurrent appointments
-                            max_concurrent = random.randint(2, 4)
-                            
-                            schedule = DoctorSchedule.objects.create(
-                                doctor=doctor,
-                                date=current_date,
-                                time_range='range-based',
-                                start_time=template['start'],
-                                end_time=template['end'],
-                                slot_duration=60,  # Not used for range-based, but required field
-                                available_slots=max_concurrent,
-                                is_active=True
-                            )
+                        # For range-based, available_slots represents max concurrent appointments
+                        max_concurrent = random.randint(2, 4)
+                        
+                        schedule = DoctorSchedule(
+                            doctor=doctor,
+                            date=current_date,
+                            time_range='range-based',
+                            start_time=template['start'],
+                            end_time=template['end'],
+                            slot_duration=60,  # Not used for range-based, but required field
+                            available_slots=max_concurrent,
+                            is_active=True
+                        )
+                        if self.queue_schedule(schedule, pending_schedules, seen_keys):
                             schedule_count += 1
                             range_based_count += 1
-                        except Exception as e:
-                            # Skip if duplicate or validation error
-                            continue
+        
+        # Write all schedules and their time slots in one transaction
+        with transaction.atomic():
+            DoctorSchedule.objects.bulk_create(pending_schedules, batch_size=500)
+            slots_created = DoctorSchedule.bulk_generate_time_slots(pending_schedules)
+            ScheduleAvailability.rebuild_for(pending_schedules)
         
         self.stdout.write(f'Created {schedule_count} mixed-type schedules')
+        self.stdout.write(f'  - Time slots: {sum(slots_created.values())}')
         self.stdout.write(f'  - Slot-based schedules: {slot_based_count}')
         self.stdout.write(f'  - Range-based schedules: {range_based_count}')
         
@@ -640,6 +658,22 @@ class Command(BaseCommand):
         self.stdout.write(f'  - Range-based schedules: {actual_range_based}')
         self.stdout.write(f'  - Total schedules: {actual_slot_based + actual_range_based}')
 
+    def queue_schedule(self, schedule, pending_schedules, seen_keys):
+        """Validate a schedule in memory and queue it for bulk creation"""
+        key = (schedule.doctor_id, schedule.date, schedule.start_time, schedule.end_time)
+        if key in seen_keys:
+            return False
+        try:
+            schedule.clean()
+        except ValidationError:
+            # Skip schedules that are already in the past
+            return False
+        if schedule.time_range == 'slot-based':
+            schedule.available_slots = schedule.calculate_total_slots()
+        seen_keys.add(key)
+        pending_schedules.append(schedule)
+        return True
+
     def create_sample_patients(self):
         """Create a few sample patients and appointments"""
         self.stdout.write('Creating sample patients...')
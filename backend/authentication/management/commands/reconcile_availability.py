@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from authentication.models import Doctor, DoctorSchedule, TimeSlot, ScheduleAvailability
+
+
+class Command(BaseCommand):
+    help = (
+        'Detect and fix drift in the next-available index and in the doctors\' '
+        'next_available_at / free_slots_7d summaries'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without fixing it',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Schedules checked per batch (default: 500)',
+        )
+
+    def row_key(self, row):
+        return (row.part_of_day, row.start_datetime, row.end_datetime, row.time_slot_id)
+
+    def check_schedules(self, schedules, now):
+        """Return the schedules whose stored index rows differ from freshly computed ones"""
+        stored = {}
+        for row in ScheduleAvailability.objects.filter(schedule__in=schedules):
+            stored.setdefault(row.schedule_id, set()).add(self.row_key(row))
+
+        free_slots = {}
+        for slot in TimeSlot.objects.filter(
+            schedule__in=schedules,
+            is_booked=False
+        ).order_by('schedule_id', 'start_time'):
+            free_slots.setdefault(slot.schedule_id, []).append(slot)
+
+        booked = ScheduleAvailability.booked_windows(schedules)
+
+        drifted = []
+        for schedule in schedules:
+            expected = {
+                self.row_key(row)
+                for row in ScheduleAvailability.build_for(
+                    schedule, free_slots.get(schedule.pk, []), now=now, booked=booked.get(schedule.pk)
+                )
+            }
+            if expected != stored.get(schedule.pk, set()):
+                drifted.append(schedule)
+        return drifted
+
+    def handle(self, *args, **options):
+        now = timezone.localtime()
+        queryset = DoctorSchedule.objects.filter(
+            date__gte=now.date() - timedelta(days=1)
+        ).order_by('pk')
+
+        checked = 0
+        drifted_total = 0
+        batch = []
+        for schedule in queryset.iterator(chunk_size=options['batch_size']):
+            batch.append(schedule)
+            if len(batch) >= options['batch_size']:
+                drifted_total += self.reconcile_batch(batch, now, options['dry_run'])
+                checked += len(batch)
+                batch = []
+        if batch:
+            drifted_total += self.reconcile_batch(batch, now, options['dry_run'])
+            checked += len(batch)
+
+        verb = 'would be rebuilt' if options['dry_run'] else 'rebuilt'
+        style = self.style.WARNING if drifted_total else self.style.SUCCESS
+        self.stdout.write(style(f'✅ Checked {checked} schedules, {drifted_total} drifted and {verb}'))
+
+        changed = self.reconcile_doctors(now, options['batch_size'], options['dry_run'])
+        verb = 'would be corrected' if options['dry_run'] else 'corrected'
+        style = self.style.WARNING if changed else self.style.SUCCESS
+        self.stdout.write(style(f'✅ {changed} doctor availability summaries {verb}'))
+
+    def reconcile_doctors(self, now, batch_size, dry_run):
+        """
+        Recompute every doctor's summary. This is also what rolls
+        free_slots_7d forward as days pass.
+        """
+        doctor_ids = list(Doctor.objects.order_by('pk').values_list('pk', flat=True))
+        changed = 0
+        for start in range(0, len(doctor_ids), batch_size):
+            batch = doctor_ids[start:start + batch_size]
+            with transaction.atomic():
+                changed_ids = Doctor.refresh_availability(batch, now=now)
+                if dry_run:
+                    transaction.set_rollback(True)
+            changed += len(changed_ids)
+        return changed
+
+    def reconcile_batch(self, schedules, now, dry_run):
+        drifted = self.check_schedules(schedules, now)
+        for schedule in drifted:
+            self.stdout.write(f'  ⚠️ Drift on schedule {schedule.pk} ({schedule})')
+        if drifted and not dry_run:
+            ScheduleAvailability.rebuild_for(drifted, now=now)
+        return len(drifted)
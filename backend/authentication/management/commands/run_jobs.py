@@ -0,0 +1,32 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from authentication.scheduler import leader_runner
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the background jobs (appointment status updates, nightly cleanup and '
+        'reconciliation). Start one or more of these next to the web server: they '
+        'elect a leader through the database, and only the leader runs the jobs.'
+    )
+
+    def handle(self, *args, **options):
+        runner = leader_runner()
+
+        def shutdown(signum, frame):
+            self.stdout.write('🛑 Shutting down, handing the jobs over...')
+            runner.shutdown(timeout=0)
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        self.stdout.write(
+            f"🚀 Job worker {runner.lease.identity} started "
+            f"(heartbeat {getattr(settings, 'JOB_LEADER_HEARTBEAT_SECONDS', 2)}s, "
+            f"takeover after {getattr(settings, 'JOB_LEADER_TIMEOUT_SECONDS', 10)}s)"
+        )
+        runner.run()
+        self.stdout.write(self.style.SUCCESS('✅ Job worker stopped'))
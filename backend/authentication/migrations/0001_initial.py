@@ -0,0 +1,144 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:01
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Language',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Specialty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'verbose_name_plural': 'Specialties',
+            },
+        ),
+        migrations.CreateModel(
+            name='Doctor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('degree', models.CharField(default='MBBS', help_text="Doctor's degree(s) e.g., MBBS, MD, PhD", max_length=200)),
+                ('years_of_experience', models.PositiveIntegerField(default=0, help_text='Number of years of medical experience')),
+                ('bio', models.TextField()),
+                ('profile_picture', models.ImageField(blank=True, null=True, upload_to='doctors/')),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='doctor_profile', to=settings.AUTH_USER_MODEL)),
+                ('languages', models.ManyToManyField(related_name='doctors', to='authentication.language')),
+                ('specialties', models.ManyToManyField(related_name='doctors', to='authentication.specialty')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DoctorSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time_range', models.CharField(choices=[('slot-based', 'Slot Based - Specific time slots'), ('range-based', 'Range Based - Flexible within time range')], default='slot-based', help_text='Choose how patients can book appointments', max_length=20)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('slot_duration', models.PositiveIntegerField(choices=[(15, '15 minutes'), (30, '30 minutes'), (45, '45 minutes'), (60, '1 hour'), (90, '1.5 hours'), (120, '2 hours')], default=30, help_text='Duration of each appointment (only for slot-based)')),
+                ('available_slots', models.PositiveIntegerField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('virtual_slots', models.BooleanField(default=False, help_text='Derive slots from the schedule instead of storing a TimeSlot row per interval (only for slot-based)')),
+                ('booked_slots', models.BinaryField(default=b'', help_text='Bitmap of booked slot indexes for virtual slot schedules')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='authentication.doctor')),
+            ],
+            options={
+                'ordering': ['date', 'start_time'],
+                'unique_together': {('doctor', 'date', 'start_time', 'end_time')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Patient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('date_of_birth', models.DateField()),
+                ('phone_number', models.CharField(blank=True, max_length=15, null=True, unique=True)),
+                ('address', models.TextField()),
+                ('emergency_contact_name', models.CharField(blank=True, max_length=100)),
+                ('emergency_contact_number', models.CharField(blank=True, max_length=15)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='patient_profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MedicalHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('diagnosis', models.CharField(max_length=200)),
+                ('diagnosis_date', models.DateField()),
+                ('treatment', models.TextField()),
+                ('notes', models.TextField(blank=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='medical_histories', to='authentication.patient')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TimeSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('is_booked', models.BooleanField(default=False)),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_slots', to='authentication.doctorschedule')),
+            ],
+            options={
+                'ordering': ['start_time'],
+                'unique_together': {('schedule', 'start_time', 'end_time')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Appointment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('appointment_start_time', models.TimeField(help_text='Specific appointment start time')),
+                ('appointment_end_time', models.TimeField(help_text='Specific appointment end time')),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('completed', 'Completed'), ('canceled', 'Canceled'), ('no_show', 'No Show')], default='scheduled', max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='authentication.doctor')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='authentication.doctorschedule')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='authentication.patient')),
+                ('time_slot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='authentication.timeslot')),
+            ],
+            options={
+                'ordering': ['schedule__date', 'appointment_start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('slot_index', models.PositiveIntegerField(blank=True, help_text='Slot index within the schedule (slot-based only)', null=True)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='authentication.doctorschedule')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('schedule', 'slot_index'), name='unique_slot_hold')],
+            },
+        ),
+    ]
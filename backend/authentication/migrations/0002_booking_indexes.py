@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'scheduled')), fields=['schedule', 'appointment_end_time'], name='appointment_scheduled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'status'], name='appointment_patient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorschedule',
+            index=models.Index(condition=models.Q(('available_slots__gt', 0), ('is_active', True)), fields=['doctor', 'date', 'start_time'], name='schedule_doctor_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorschedule',
+            index=models.Index(fields=['date', 'start_time', 'id'], name='schedule_date_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slothold',
+            index=models.Index(fields=['schedule', 'expires_at'], name='slothold_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(condition=models.Q(('is_booked', False)), fields=['schedule', 'start_time'], name='timeslot_free_idx'),
+        ),
+    ]
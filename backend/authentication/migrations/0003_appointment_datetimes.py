@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_appointment_datetimes(apps, schema_editor):
+    Appointment = apps.get_model('authentication', 'Appointment')
+    tz = timezone.get_default_timezone()
+    batch = []
+    queryset = Appointment.objects.select_related('schedule').order_by('pk')
+    for appointment in queryset.iterator(chunk_size=1000):
+        date = appointment.schedule.date
+        appointment.start_datetime = timezone.make_aware(datetime.combine(date, appointment.appointment_start_time), tz)
+        appointment.end_datetime = timezone.make_aware(datetime.combine(date, appointment.appointment_end_time), tz)
+        batch.append(appointment)
+        if len(batch) >= 1000:
+            Appointment.objects.bulk_update(batch, ['start_datetime', 'end_datetime'])
+            batch = []
+    if batch:
+        Appointment.objects.bulk_update(batch, ['start_datetime', 'end_datetime'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_booking_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='appointment',
+            options={'ordering': ['start_datetime']},
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appointment_scheduled_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appointment_patient_idx',
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='start_datetime',
+            field=models.DateTimeField(editable=False, null=True, help_text='Appointment start (schedule date + start time)'),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='end_datetime',
+            field=models.DateTimeField(editable=False, null=True, help_text='Appointment end (schedule date + end time)'),
+        ),
+        migrations.RunPython(backfill_appointment_datetimes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='start_datetime',
+            field=models.DateTimeField(editable=False, help_text='Appointment start (schedule date + start time)'),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='end_datetime',
+            field=models.DateTimeField(editable=False, help_text='Appointment end (schedule date + end time)'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['start_datetime'], name='appointment_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'scheduled')), fields=['end_datetime'], name='appointment_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'start_datetime'], name='appointment_patient_idx'),
+        ),
+    ]
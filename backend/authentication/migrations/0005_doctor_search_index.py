@@ -0,0 +1,60 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# The DDL and the initial fill are spelled out here (not imported from
+# authentication.search) so later changes to the search module can't alter
+# what this migration does.
+FTS_TABLE = 'authentication_doctor_fts'
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"name, degree, bio, specialties, languages, "
+    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+POPULATE_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, name, degree, bio, specialties, languages)
+    SELECT d.id,
+           d.first_name || ' ' || d.last_name,
+           d.degree,
+           d.bio,
+           COALESCE((SELECT group_concat(s.name, ' ')
+                       FROM authentication_doctor_specialties ds
+                       JOIN authentication_specialty s ON s.id = ds.specialty_id
+                      WHERE ds.doctor_id = d.id), ''),
+           COALESCE((SELECT group_concat(l.name, ' ')
+                       FROM authentication_doctor_languages dl
+                       JOIN authentication_language l ON l.id = dl.language_id
+                      WHERE dl.doctor_id = d.id), '')
+      FROM authentication_doctor d
+"""
+
+
+def create_doctor_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_SQL)
+        except OperationalError:
+            # No FTS5 in this SQLite build: search falls back to substring matching
+            return
+        cursor.execute(POPULATE_SQL)
+
+
+def drop_doctor_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_cache_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_doctor_search_index, drop_doctor_search_index),
+    ]
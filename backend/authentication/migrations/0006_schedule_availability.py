@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_doctor_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('part_of_day', models.CharField(choices=[('morning', 'Morning (before 12:00)'), ('afternoon', 'Afternoon (12:00 - 17:00)'), ('evening', 'Evening (from 17:00)')], max_length=10)),
+                ('start_datetime', models.DateTimeField()),
+                ('end_datetime', models.DateTimeField()),
+                ('time_slot_id', models.IntegerField(blank=True, help_text='TimeSlot id (slot index on virtual schedules); empty for range-based', null=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='authentication.doctor')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='authentication.doctorschedule')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start_datetime', 'doctor'], name='availability_start_idx'), models.Index(fields=['part_of_day', 'start_datetime'], name='availability_part_idx')],
+                'constraints': [models.UniqueConstraint(fields=('schedule', 'part_of_day'), name='unique_schedule_part_of_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_schedule_availability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='free_slots_7d',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Free openings in the next 7 days (maintained)'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='next_available_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, help_text='Start of the earliest bookable opening (maintained)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleavailability',
+            index=models.Index(fields=['doctor', 'start_datetime'], name='availability_doctor_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0010_job_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=50)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('rows_affected', models.PositiveIntegerField(default=0)),
+                ('outcome', models.CharField(choices=[('success', 'Success'), ('failed', 'Failed')], default='success', max_length=10)),
+                ('error', models.CharField(blank=True, default='', max_length=200)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', 'started_at'], name='jobrun_job_started_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0012_purge_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAppointment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('doctor_name', models.CharField(max_length=210)),
+                ('schedule_id', models.IntegerField()),
+                ('schedule_date', models.DateField()),
+                ('time_range', models.CharField(max_length=20)),
+                ('schedule_start_time', models.TimeField()),
+                ('schedule_end_time', models.TimeField()),
+                ('appointment_start_time', models.TimeField()),
+                ('appointment_end_time', models.TimeField()),
+                ('start_datetime', models.DateTimeField()),
+                ('end_datetime', models.DateTimeField()),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('completed', 'Completed'), ('canceled', 'Canceled'), ('no_show', 'No Show')], max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_appointments', to='authentication.doctor')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='authentication.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient', 'start_datetime', 'id'], name='archive_patient_start_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:07
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def encode_virtual_slot_ids(apps, schema_editor):
+    """Index rows of virtual schedules stored the bare slot index"""
+    ScheduleAvailability = apps.get_model('authentication', 'ScheduleAvailability')
+    ScheduleAvailability.objects.filter(
+        schedule__virtual_slots=True, time_slot_id__gte=0
+    ).update(time_slot_id=-F('time_slot_id') - 1)
+
+
+def decode_virtual_slot_ids(apps, schema_editor):
+    ScheduleAvailability = apps.get_model('authentication', 'ScheduleAvailability')
+    ScheduleAvailability.objects.filter(
+        schedule__virtual_slots=True, time_slot_id__lt=0
+    ).update(time_slot_id=-F('time_slot_id') - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0013_appointment_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scheduleavailability',
+            name='time_slot_id',
+            field=models.IntegerField(blank=True, help_text='TimeSlot id (negative virtual slot id on virtual schedules); empty for range-based', null=True),
+        ),
+        migrations.RunPython(encode_virtual_slot_ids, decode_virtual_slot_ids),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0014_virtual_slot_ids'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['schedule', 'appointment_start_time'], name='appointment_schedule_idx'),
+        ),
+    ]
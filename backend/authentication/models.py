@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import connection, models, transaction
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import datetime, timedelta, time
+import uuid
+
+from .intervals import IntervalSet
 
 # Doctor related models
 class Specialty(models.Model):
@@ -20,6 +23,19 @@ class Language(models.Model):
     def __str__(self):
         return self.name
 
+class CacheVersion(models.Model):
+    """
+    Change counter for data cached in process memory. Writers bump the
+    version; every worker compares it with the version it cached and
+    reloads when they differ.
+    """
+    key = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
 class Doctor(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
@@ -43,10 +59,79 @@ class Doctor(models.Model):
     languages = models.ManyToManyField(Language, related_name='doctors')
     bio = models.TextField()
     profile_picture = models.ImageField(upload_to='doctors/', blank=True, null=True)
+    next_available_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Start of the earliest bookable opening (maintained)"
+    )
+    free_slots_7d = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Free openings in the next 7 days (maintained)"
+    )
+
+    class Meta:
+        indexes = [
+            # Keyset pages of the doctor directory for each ?ordering=
+            models.Index(fields=['first_name', 'id'], name='doctor_name_idx'),
+            models.Index(fields=['years_of_experience', 'id'], name='doctor_experience_idx'),
+            models.Index(fields=['free_slots_7d', 'id'], name='doctor_free_slots_idx'),
+        ]
 
     def __str__(self):
         return f"Dr. {self.first_name} {self.last_name}"
 
+    @classmethod
+    def refresh_availability(cls, doctor_ids, now=None):
+        """
+        Recompute next_available_at and free_slots_7d for the given doctors
+        from their next-available index rows and upcoming schedules. Both
+        reads are indexed aggregates scoped to these doctors.
+
+        Returns:
+            list: Ids of the doctors whose values changed
+        """
+        doctor_ids = set(doctor_ids)
+        if not doctor_ids:
+            return []
+        now = timezone.localtime(now or timezone.now())
+        today = now.date()
+
+        next_available = dict(
+            ScheduleAvailability.objects.filter(
+                doctor_id__in=doctor_ids,
+                start_datetime__gt=now + timedelta(minutes=30)
+            ).values('doctor_id').annotate(
+                first=models.Min('start_datetime')
+            ).values_list('doctor_id', 'first')
+        )
+        free_counts = dict(
+            DoctorSchedule.objects.filter(
+                doctor_id__in=doctor_ids,
+                is_active=True,
+                date__gte=today,
+                date__lt=today + timedelta(days=7),
+                available_slots__gt=0
+            ).values('doctor_id').annotate(
+                free=models.Sum('available_slots')
+            ).values_list('doctor_id', 'free')
+        )
+
+        changed = []
+        for doctor in cls.objects.filter(pk__in=doctor_ids).only('id', 'next_available_at', 'free_slots_7d'):
+            values = (next_available.get(doctor.pk), free_counts.get(doctor.pk, 0))
+            if values != (doctor.next_available_at, doctor.free_slots_7d):
+                doctor.next_available_at, doctor.free_slots_7d = values
+                changed.append(doctor)
+        if changed:
+            from .catalog_cache import bump_version
+            cls.objects.bulk_update(changed, ['next_available_at', 'free_slots_7d'])
+            # The directory serializes these fields, so its ETag must move too
+            bump_version('doctors')
+        return [doctor.pk for doctor in changed]
+
 class DoctorSchedule(models.Model):
     TIME_RANGE_CHOICES = [
         ('slot-based', 'Slot Based - Specific time slots'),
@@ -79,10 +164,29 @@ class DoctorSchedule(models.Model):
     )
     available_slots = models.PositiveIntegerField()
     is_active = models.BooleanField(default=True)
+    virtual_slots = models.BooleanField(
+        default=False,
+        help_text="Derive slots from the schedule instead of storing a TimeSlot row per interval (only for slot-based)"
+    )
+    booked_slots = models.BinaryField(
+        default=b'',
+        editable=False,
+        help_text="Bitmap of booked slot indexes for virtual slot schedules"
+    )
 
     class Meta:
         unique_together = ['doctor', 'date', 'start_time', 'end_time']
         ordering = ['date', 'start_time']
+        indexes = [
+            # AvailableSlotsView: a doctor's bookable schedules in a date window
+            models.Index(
+                fields=['doctor', 'date', 'start_time'],
+                condition=models.Q(is_active=True, available_slots__gt=0),
+                name='schedule_doctor_open_idx'
+            ),
+            # Schedule listing keyset and date-based sweeps
+            models.Index(fields=['date', 'start_time', 'id'], name='schedule_date_start_idx'),
+        ]
 
     def clean(self):
         """Validate that schedule is not in the past"""
@@ -114,38 +218,180 @@ class DoctorSchedule(models.Model):
     def save(self, *args, **kwargs):
         self.full_clean()
         if self.time_range == 'slot-based':
-            self.available_slots = self.calculate_total_slots()
+            self.available_slots = self.calculate_total_slots() - self.get_booked_slot_total()
         is_new = not self.pk
-        super().save(*args, **kwargs)
-        if is_new and self.time_range == 'slot-based':
-            self.generate_time_slots()
+        date_changed = not is_new and DoctorSchedule.objects.filter(pk=self.pk).exclude(date=self.date).exists()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new and self.time_range == 'slot-based' and not self.virtual_slots:
+                self.generate_time_slots()
+            if date_changed:
+                # Keep the appointments' denormalized datetimes in step with the schedule
+                appointments = list(self.appointments.all())
+                for appointment in appointments:
+                    appointment.sync_datetimes(self.date)
+                Appointment.objects.bulk_update(appointments, ['start_datetime', 'end_datetime'])
+            ScheduleAvailability.rebuild_for([self])
 
     def __str__(self):
         return f"{self.doctor} - {self.date} ({self.get_time_range_display()})"
 
+    def get_booked_slot_total(self):
+        if self.virtual_slots:
+            return self.booked_slot_count()
+        if not self.pk:
+            return 0
+        return self.time_slots.filter(is_booked=True).count()
+
     def calculate_total_slots(self):
         start_datetime = datetime.combine(self.date, self.start_time)
         end_datetime = datetime.combine(self.date, self.end_time)
         total_minutes = (end_datetime - start_datetime).total_seconds() / 60
         return int(total_minutes // self.slot_duration)
 
-    def generate_time_slots(self):
+    def build_time_slots(self):
+        """Return the unsaved TimeSlot rows that cover this schedule"""
+        slots = []
         if self.time_range != 'slot-based':
-            return
+            return slots
         current_time = datetime.combine(self.date, self.start_time)
         end_time = datetime.combine(self.date, self.end_time)
         slot_duration = timedelta(minutes=self.slot_duration)
         while current_time + slot_duration <= end_time:
             slot_end = current_time + slot_duration
-            TimeSlot.objects.create(
+            slots.append(TimeSlot(
                 schedule=self,
                 start_time=current_time.time(),
                 end_time=slot_end.time()
-            )
+            ))
             current_time = slot_end
+        return slots
+
+    def generate_time_slots(self):
+        if self.time_range != 'slot-based' or self.virtual_slots:
+            return 0
+        return DoctorSchedule.bulk_generate_time_slots([self])[self.pk]
+
+    @classmethod
+    def bulk_generate_time_slots(cls, schedules, batch_size=500):
+        """
+        Materialize the time slots of one or many saved schedules.
+
+        The whole slot set is validated once in memory (past/buffer rules and
+        unique_together against existing rows), then written with batched
+        inserts inside a single transaction.
+
+        Returns:
+            dict: {schedule_id: number of slots created}
+        """
+        schedules = [
+            s for s in schedules
+            if s.time_range == 'slot-based' and not s.virtual_slots
+        ]
+        created = {schedule.pk: 0 for schedule in schedules}
+        if not schedules:
+            return created
+
+        existing = set(
+            TimeSlot.objects.filter(schedule_id__in=created.keys())
+            .values_list('schedule_id', 'start_time', 'end_time')
+        )
+
+        now = timezone.now()
+        buffer_time = (now + timedelta(minutes=30)).time()
+        slots = []
+        for schedule in schedules:
+            for slot in schedule.build_time_slots():
+                key = (schedule.pk, slot.start_time, slot.end_time)
+                if key in existing:
+                    continue
+                if schedule.date == now.date() and slot.start_time <= buffer_time:
+                    raise ValidationError({
+                        'start_time': 'Time slot cannot be in the past or too close to current time.'
+                    })
+                existing.add(key)
+                slots.append(slot)
+                created[schedule.pk] += 1
+
+        with transaction.atomic():
+            TimeSlot.objects.bulk_create(slots, batch_size=batch_size)
+        return created
+
+    # Virtual slots: slot N covers start_time + N * slot_duration and is booked
+    # when bit N of booked_slots is set. A TimeSlot row only exists once booked.
+    # Clients see slot N as id -(N + 1), so a virtual id can never be mistaken
+    # for a TimeSlot primary key.
+    @staticmethod
+    def virtual_slot_id(index):
+        return -(index + 1)
+
+    @staticmethod
+    def virtual_slot_index(slot_id):
+        """Slot index of a virtual slot id, or None for anything else"""
+        if slot_id is None or slot_id >= 0:
+            return None
+        return -slot_id - 1
+
+    def get_booked_bitmap(self):
+        return bytearray(bytes(self.booked_slots or b''))
+
+    def is_slot_booked(self, index):
+        bitmap = self.get_booked_bitmap()
+        byte, bit = divmod(index, 8)
+        return byte < len(bitmap) and bool(bitmap[byte] & (1 << bit))
+
+    def set_slot_booked(self, index, booked=True):
+        """Flip a slot bit in memory; the caller is responsible for saving"""
+        bitmap = self.get_booked_bitmap()
+        byte, bit = divmod(index, 8)
+        if byte >= len(bitmap):
+            bitmap.extend(b'\x00' * (byte + 1 - len(bitmap)))
+        if booked:
+            bitmap[byte] |= 1 << bit
+        else:
+            bitmap[byte] &= ~(1 << bit)
+        self.booked_slots = bytes(bitmap)
+
+    def booked_slot_count(self):
+        return sum(bin(byte).count('1') for byte in self.get_booked_bitmap())
+
+    def get_slot_index(self, start_time):
+        offset = datetime.combine(self.date, start_time) - datetime.combine(self.date, self.start_time)
+        return int(offset.total_seconds() // 60) // self.slot_duration
+
+    def get_virtual_slot(self, index):
+        """Return an unsaved TimeSlot for a slot index, or None if out of range"""
+        if index is None or index < 0 or index >= self.calculate_total_slots():
+            return None
+        slot_start = datetime.combine(self.date, self.start_time) + timedelta(minutes=index * self.slot_duration)
+        slot_end = slot_start + timedelta(minutes=self.slot_duration)
+        return TimeSlot(
+            id=self.virtual_slot_id(index),
+            schedule=self,
+            start_time=slot_start.time(),
+            end_time=slot_end.time(),
+            is_booked=self.is_slot_booked(index)
+        )
+
+    def get_virtual_time_slots(self, include_booked=False):
+        slots = [self.get_virtual_slot(index) for index in range(self.calculate_total_slots())]
+        if include_booked:
+            return slots
+        return [slot for slot in slots if not slot.is_booked]
+
+    def get_free_time_slot(self, time_slot_id):
+        """Return the unbooked TimeSlot (stored or virtual) with this id, or None"""
+        if self.virtual_slots:
+            time_slot = self.get_virtual_slot(self.virtual_slot_index(time_slot_id))
+            if time_slot is None or time_slot.is_booked:
+                return None
+            return time_slot
+        return self.time_slots.filter(id=time_slot_id, is_booked=False).first()
 
     def get_available_time_slots(self):
         if self.time_range == 'slot-based':
+            if self.virtual_slots:
+                return self.get_virtual_time_slots()
             return self.time_slots.filter(is_booked=False).order_by('start_time')
         else:
             return {
@@ -163,6 +409,14 @@ class TimeSlot(models.Model):
     class Meta:
         unique_together = ['schedule', 'start_time', 'end_time']
         ordering = ['start_time']
+        indexes = [
+            # Unbooked slots of a schedule in start order (slot listings)
+            models.Index(
+                fields=['schedule', 'start_time'],
+                condition=models.Q(is_booked=False),
+                name='timeslot_free_idx'
+            ),
+        ]
 
     def clean(self):
         super().clean()
@@ -210,6 +464,12 @@ class MedicalHistory(models.Model):
     treatment = models.TextField()
     notes = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            # A patient's history, most recent first (keyset-paginated listing)
+            models.Index(fields=['patient', 'diagnosis_date'], name='history_patient_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.diagnosis} - {self.patient}"
 
@@ -229,9 +489,26 @@ class Appointment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='scheduled')
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized from schedule.date + appointment times so ordering and
+    # status sweeps never need to join DoctorSchedule
+    start_datetime = models.DateTimeField(editable=False, help_text="Appointment start (schedule date + start time)")
+    end_datetime = models.DateTimeField(editable=False, help_text="Appointment end (schedule date + end time)")
 
     class Meta:
-        ordering = ['schedule__date', 'appointment_start_time']
+        ordering = ['start_datetime']
+        indexes = [
+            models.Index(fields=['start_datetime'], name='appointment_start_idx'),
+            # Status sweeps only ever look at appointments still 'scheduled'
+            models.Index(
+                fields=['end_datetime'],
+                condition=models.Q(status='scheduled'),
+                name='appointment_due_idx'
+            ),
+            # A patient's appointments in time order (booking validation, listings)
+            models.Index(fields=['patient', 'start_datetime'], name='appointment_patient_idx'),
+            # Overlap checks on a range-based schedule seek on start time
+            models.Index(fields=['schedule', 'appointment_start_time'], name='appointment_schedule_idx'),
+        ]
 
     def clean(self):
         super().clean()
@@ -250,12 +527,433 @@ class Appointment(models.Model):
                         'appointment_start_time': 'Appointment time must be at least 15 minutes in the future.'
                     })
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
+    def sync_datetimes(self, date=None):
+        """Recompute start_datetime/end_datetime from the schedule date and appointment times"""
+        date = date or self.schedule.date
+        self.start_datetime = timezone.make_aware(datetime.combine(date, self.appointment_start_time))
+        self.end_datetime = timezone.make_aware(datetime.combine(date, self.appointment_end_time))
+
+    RELATION_FIELDS = ['patient', 'doctor', 'schedule', 'time_slot']
+
+    def save(self, *args, validate_relations=True, **kwargs):
+        """
+        validate_relations=False skips full_clean's existence query per foreign
+        key, for callers that loaded (and locked) the related rows themselves.
+        """
         if self.schedule.time_range == 'slot-based' and self.time_slot:
             self.appointment_start_time = self.time_slot.start_time
             self.appointment_end_time = self.time_slot.end_time
+        if self.appointment_start_time and self.appointment_end_time:
+            self.sync_datetimes()
+        self.full_clean(exclude=None if validate_relations else self.RELATION_FIELDS)
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.patient} with {self.doctor} on {self.schedule.date} at {self.appointment_start_time}"
\ No newline at end of file
+        return f"{self.patient} with {self.doctor} on {self.schedule.date} at {self.appointment_start_time}"
+
+class SlotHoldQuerySet(models.QuerySet):
+    def active(self, now=None):
+        """Holds that have not expired yet; expired rows are simply ignored"""
+        return self.filter(expires_at__gt=now or timezone.now())
+
+class SlotHold(models.Model):
+    """
+    Short-lived soft reservation of a slot (or a range-based window) while a
+    patient completes the booking form. Holds expire lazily: every read
+    filters on expires_at, so no sweeper is needed.
+    """
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='slot_holds')
+    schedule = models.ForeignKey(DoctorSchedule, on_delete=models.CASCADE, related_name='holds')
+    slot_index = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Slot index within the schedule (slot-based only)"
+    )
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SlotHoldQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['schedule', 'slot_index'], name='unique_slot_hold'),
+        ]
+        indexes = [
+            models.Index(fields=['schedule', 'expires_at'], name='slothold_schedule_idx'),
+        ]
+
+    @property
+    def is_active(self):
+        return self.expires_at > timezone.now()
+
+    def __str__(self):
+        return f"Hold on {self.schedule} ({self.start_time} to {self.end_time}) until {self.expires_at}"
+
+class ScheduleAvailability(models.Model):
+    """
+    Next-available index: the earliest bookable opening of a schedule in
+    each part of the day. Rows are rebuilt for a schedule whenever its
+    availability changes (create/edit, booking, cancellation), so "who is
+    free soonest" is one indexed query instead of walking every slot.
+    """
+    PART_OF_DAY_CHOICES = [
+        ('morning', 'Morning (before 12:00)'),
+        ('afternoon', 'Afternoon (12:00 - 17:00)'),
+        ('evening', 'Evening (from 17:00)'),
+    ]
+    PART_OF_DAY_STARTS = [
+        (time(17, 0), 'evening'),
+        (time(12, 0), 'afternoon'),
+        (time(0, 0), 'morning'),
+    ]
+
+    schedule = models.ForeignKey(DoctorSchedule, on_delete=models.CASCADE, related_name='availability')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='availability')
+    part_of_day = models.CharField(max_length=10, choices=PART_OF_DAY_CHOICES)
+    start_datetime = models.DateTimeField()
+    end_datetime = models.DateTimeField()
+    time_slot_id = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="TimeSlot id (negative virtual slot id on virtual schedules); empty for range-based"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['schedule', 'part_of_day'], name='unique_schedule_part_of_day'),
+        ]
+        indexes = [
+            models.Index(fields=['start_datetime', 'doctor'], name='availability_start_idx'),
+            models.Index(fields=['part_of_day', 'start_datetime'], name='availability_part_idx'),
+            models.Index(fields=['doctor', 'start_datetime'], name='availability_doctor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor} next free {self.get_part_of_day_display()} at {self.start_datetime}"
+
+    @classmethod
+    def get_part_of_day(cls, value):
+        for starts_at, part in cls.PART_OF_DAY_STARTS:
+            if value >= starts_at:
+                return part
+
+    @classmethod
+    def booked_windows(cls, schedules):
+        """(start_time, end_time) of the scheduled appointments on each range-based schedule, in one query"""
+        booked = {s.pk: [] for s in schedules if s.time_range == 'range-based'}
+        if booked:
+            for schedule_id, start, end in Appointment.objects.filter(
+                schedule_id__in=booked,
+                status='scheduled'
+            ).values_list('schedule_id', 'appointment_start_time', 'appointment_end_time'):
+                booked[schedule_id].append((start, end))
+        return booked
+
+    @classmethod
+    def build_for(cls, schedule, free_slots=None, now=None, booked=None):
+        """
+        Return the unsaved index rows for one schedule.
+
+        Args:
+            schedule: DoctorSchedule
+            free_slots: Unbooked stored TimeSlots ordered by start_time (loaded if None)
+            now: Current time, for the 30-minute booking buffer
+            booked: (start_time, end_time) of a range-based schedule's
+                scheduled appointments (loaded if None)
+        """
+        if not schedule.is_active or schedule.available_slots <= 0:
+            return []
+        tz = timezone.get_default_timezone()
+        cutoff = timezone.localtime(now or timezone.now(), tz) + timedelta(minutes=30)
+
+        def aware(value):
+            return timezone.make_aware(datetime.combine(schedule.date, value), tz)
+
+        openings = []
+        if schedule.time_range == 'slot-based':
+            if schedule.virtual_slots:
+                free_slots = schedule.get_virtual_time_slots()
+            elif free_slots is None:
+                free_slots = schedule.time_slots.filter(is_booked=False).order_by('start_time')
+            for slot in free_slots:
+                start = aware(slot.start_time)
+                if start > cutoff:
+                    openings.append((start, aware(slot.end_time), slot.id))
+        else:
+            # A range-based schedule can be booked from any free minute of each part it covers
+            if booked is None:
+                booked = schedule.appointments.filter(status='scheduled').values_list(
+                    'appointment_start_time', 'appointment_end_time'
+                )
+            bounds = sorted(starts_at for starts_at, _ in cls.PART_OF_DAY_STARTS)
+            for gap_start, gap_end in IntervalSet(booked).gaps(schedule.start_time, schedule.end_time):
+                gap_end = aware(gap_end)
+                for index, starts_at in enumerate(bounds):
+                    start = aware(max(gap_start, starts_at))
+                    end = aware(bounds[index + 1]) if index + 1 < len(bounds) else gap_end
+                    end = min(end, gap_end)
+                    if start < cutoff:
+                        # First bookable minute, rounded up to a multiple of 5
+                        start = cutoff.replace(second=0, microsecond=0)
+                        if start < cutoff:
+                            start += timedelta(minutes=1)
+                        start += timedelta(minutes=-start.minute % 5)
+                    if start < end:
+                        openings.append((start, gap_end, None))
+
+        rows = {}
+        for start, end, slot_id in openings:
+            part = cls.get_part_of_day(timezone.localtime(start, tz).time())
+            if part not in rows:
+                rows[part] = cls(
+                    schedule=schedule,
+                    doctor_id=schedule.doctor_id,
+                    part_of_day=part,
+                    start_datetime=start,
+                    end_datetime=end,
+                    time_slot_id=slot_id
+                )
+        return list(rows.values())
+
+    @classmethod
+    def rebuild_for(cls, schedules, now=None, refresh_doctors=True):
+        """
+        Replace the index rows of the given schedules in a fixed number of
+        queries, however many schedules there are. With refresh_doctors
+        off, the doctors' summaries are left to the job worker, which picks
+        them up from the change log (see refresh_changed_doctor_availability).
+
+        Returns:
+            int: Number of index rows written
+        """
+        schedules = list(schedules)
+        if not schedules:
+            return 0
+        stored = [
+            s.pk for s in schedules
+            if s.time_range == 'slot-based' and not s.virtual_slots
+        ]
+        free_slots = {pk: [] for pk in stored}
+        if stored:
+            for slot in TimeSlot.objects.filter(
+                schedule_id__in=stored,
+                is_booked=False
+            ).order_by('schedule_id', 'start_time'):
+                free_slots[slot.schedule_id].append(slot)
+
+        booked = cls.booked_windows(schedules)
+
+        rows = []
+        for schedule in schedules:
+            rows.extend(cls.build_for(
+                schedule, free_slots.get(schedule.pk, []), now=now, booked=booked.get(schedule.pk)
+            ))
+        with transaction.atomic():
+            cls.objects.filter(schedule_id__in=[s.pk for s in schedules]).delete()
+            cls.objects.bulk_create(rows)
+            if refresh_doctors:
+                Doctor.refresh_availability({s.doctor_id for s in schedules}, now=now)
+            AvailabilityChange.record((s.pk, s.doctor_id) for s in schedules)
+        return len(rows)
+
+class AvailabilityChange(models.Model):
+    """
+    Append-only log of schedules whose availability changed. In-process
+    availability engines and the doctor summary job replay the entries
+    they have not seen yet (see replay()), so every worker catches up
+    incrementally instead of reloading. A row without a schedule means the
+    doctor's own details changed.
+    """
+    id = models.BigAutoField(primary_key=True)
+    schedule_id = models.IntegerField(null=True, blank=True)
+    doctor_id = models.IntegerField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Change #{self.id}: schedule {self.schedule_id} of doctor {self.doctor_id}"
+
+    @classmethod
+    def record(cls, pairs):
+        """Log (schedule_id, doctor_id) pairs; this worker's engine syncs after commit"""
+        entries = [cls(schedule_id=schedule_id, doctor_id=doctor_id) for schedule_id, doctor_id in pairs]
+        if not entries:
+            return
+        cls.objects.bulk_create(entries)
+        from .availability_engine import availability_engine
+        transaction.on_commit(availability_engine.expire)
+
+    @classmethod
+    def replay(cls, cursor=None, limit=None):
+        """
+        Entries not seen through `cursor`, oldest first, and the cursor to
+        pass next time.
+
+        Ids are handed out when a writer inserts, not when it commits, so an
+        entry can become visible below an id that was already replayed. Each
+        read therefore goes back AVAILABILITY_CHANGE_REPLAY_OVERLAP ids under
+        the highest id seen and skips the ones the cursor remembers.
+
+        Args:
+            cursor: (highest id seen, ids seen within the overlap below it),
+                or None to replay the whole log
+            limit: Read at most this many unseen entries past the limit, for
+                callers that reload everything instead of replaying that many
+
+        Returns:
+            tuple: ([(id, schedule_id, doctor_id), ...], cursor)
+        """
+        last_id, seen = cursor or (0, frozenset())
+        overlap = getattr(settings, 'AVAILABILITY_CHANGE_REPLAY_OVERLAP', 200)
+        rows = cls.objects.filter(id__gt=max(last_id - overlap, 0)).order_by('id').values_list(
+            'id', 'schedule_id', 'doctor_id'
+        )
+        if limit is not None:
+            rows = rows[:limit + len(seen) + 1]
+        entries = [row for row in rows if row[0] not in seen]
+        if entries:
+            last_id = max(last_id, entries[-1][0])
+        floor = last_id - overlap
+        seen = frozenset(pk for pk in [*seen, *(entry[0] for entry in entries)] if pk > floor)
+        return entries, (last_id, seen)
+
+    @classmethod
+    def current_cursor(cls):
+        """Cursor at the end of the log, taken before a full reload"""
+        overlap = getattr(settings, 'AVAILABILITY_CHANGE_REPLAY_OVERLAP', 200)
+        ids = list(cls.objects.order_by('-id').values_list('id', flat=True)[:overlap])
+        last_id = ids[0] if ids else 0
+        return last_id, frozenset(pk for pk in ids if pk > last_id - overlap)
+
+
+class JobLease(models.Model):
+    """
+    Leadership of a background job runner. Only the holder runs the jobs;
+    it bumps `beat` every few seconds, and a standby that sees `beat`
+    unchanged for JOB_LEADER_TIMEOUT_SECONDS takes the lease over with a
+    compare-and-set on it. Standbys time the silence on their own clock,
+    so nodes with skewed clocks still agree.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    holder = models.CharField(max_length=200, blank=True, default='')
+    beat = models.PositiveBigIntegerField(default=0)
+    acquired_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.holder or 'no leader'} (beat {self.beat})"
+
+
+class JobRun(models.Model):
+    """One run of a background job: when, how long, how many rows and how it ended"""
+    OUTCOME_CHOICES = [
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+    ]
+
+    job = models.CharField(max_length=50)
+    started_at = models.DateTimeField(default=timezone.now)
+    duration_ms = models.PositiveIntegerField(default=0)
+    rows_affected = models.PositiveIntegerField(default=0)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES, default='success')
+    error = models.CharField(max_length=200, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # Per-job summaries over a recent window
+            models.Index(fields=['job', 'started_at'], name='jobrun_job_started_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job} at {self.started_at:%Y-%m-%d %H:%M}: {self.outcome} in {self.duration_ms} ms"
+
+
+class PurgeCheckpoint(models.Model):
+    """
+    Progress of a chunked purge, committed with every chunk. A run that
+    finds a checkpoint for the same cutoff resumes after `last_id`; the
+    row is removed once the purge completes.
+    """
+    job = models.CharField(max_length=50, unique=True)
+    cutoff = models.DateField()
+    last_id = models.PositiveBigIntegerField(default=0)
+    rows_deleted = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.job} before {self.cutoff}: after #{self.last_id} ({self.rows_deleted} rows)"
+
+
+class ArchivedAppointment(models.Model):
+    """
+    Append-only copy of a finished (completed, canceled or no-show)
+    appointment together with its schedule context, written by
+    cleanup_past_appointments in the same transaction that purges the live
+    rows. Keeps visit history readable without the live tables growing.
+    """
+    # The live appointment's id
+    id = models.BigIntegerField(primary_key=True)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='archived_appointments')
+    doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_appointments'
+    )
+    # Snapshot, so history still reads right if the doctor is removed
+    doctor_name = models.CharField(max_length=210)
+    schedule_id = models.IntegerField()
+    schedule_date = models.DateField()
+    time_range = models.CharField(max_length=20)
+    schedule_start_time = models.TimeField()
+    schedule_end_time = models.TimeField()
+    appointment_start_time = models.TimeField()
+    appointment_end_time = models.TimeField()
+    start_datetime = models.DateTimeField()
+    end_datetime = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    ARCHIVED_STATUSES = ('completed', 'canceled', 'no_show')
+
+    class Meta:
+        indexes = [
+            # A patient's past visits, newest first (keyset pages)
+            models.Index(fields=['patient', 'start_datetime', 'id'], name='archive_patient_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived #{self.id}: {self.doctor_name} on {self.schedule_date} ({self.status})"
+
+    @classmethod
+    def archive_schedules(cls, schedule_ids):
+        """
+        Copy the finished appointments of these schedules with one
+        INSERT ... SELECT (no rows pass through Python); returns how many
+        were archived
+        """
+        qn = connection.ops.quote_name
+        ids = ', '.join(['%s'] * len(schedule_ids))
+        statuses = ', '.join(['%s'] * len(cls.ARCHIVED_STATUSES))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {qn(cls._meta.db_table)} ("
+                f"id, patient_id, doctor_id, doctor_name, schedule_id, schedule_date, time_range, "
+                f"schedule_start_time, schedule_end_time, appointment_start_time, appointment_end_time, "
+                f"start_datetime, end_datetime, status, notes, created_at, archived_at) "
+                f"SELECT a.id, a.patient_id, a.doctor_id, 'Dr. ' || d.first_name || ' ' || d.last_name, "
+                f"a.schedule_id, s.date, s.time_range, s.start_time, s.end_time, "
+                f"a.appointment_start_time, a.appointment_end_time, a.start_datetime, a.end_datetime, "
+                f"a.status, a.notes, a.created_at, %s "
+                f"FROM {qn(Appointment._meta.db_table)} a "
+                f"JOIN {qn(DoctorSchedule._meta.db_table)} s ON s.id = a.schedule_id "
+                f"JOIN {qn(Doctor._meta.db_table)} d ON d.id = a.doctor_id "
+                f"WHERE a.schedule_id IN ({ids}) AND a.status IN ({statuses})",
+                [connection.ops.adapt_datetimefield_value(timezone.now()), *schedule_ids, *cls.ARCHIVED_STATUSES]
+            )
+            return cursor.rowcount
@@ -0,0 +1,170 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a stable, unique ordering.
+
+    Instead of OFFSET, each page continues from the ordering values of the
+    last row of the previous page, so page N costs the same as page 1 as
+    long as the ordering is backed by an index. The cursor handed to the
+    client is an opaque base64 token.
+
+    The view may set `keyset_ordering` (or define get_keyset_ordering(request, queryset))
+    to override `ordering`; the last field must be unique (normally 'id') so
+    ties are broken deterministically. Nullable fields sort nulls last in
+    both directions, and annotations (e.g. a search rank) can be used too.
+    """
+    ordering = ('id',)
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, view, queryset):
+        if hasattr(view, 'get_keyset_ordering'):
+            return tuple(view.get_keyset_ordering(self.request, queryset))
+        return tuple(getattr(view, 'keyset_ordering', self.ordering))
+
+    def get_model_field(self, model, name):
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # An annotation: cursor values are used as they are
+            return None
+
+    def get_order_by(self, model):
+        order_by = []
+        for field_name in self.ordering_fields:
+            name = field_name.lstrip('-')
+            field = self.get_model_field(model, name)
+            if field is not None and field.null:
+                expression = F(name)
+                order_by.append(expression.desc(nulls_last=True) if field_name.startswith('-') else expression.asc(nulls_last=True))
+            else:
+                order_by.append(field_name)
+        return order_by
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def encode_cursor(self, values):
+        payload = json.dumps(values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        except (ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering_fields):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_seek_filter(self, queryset, values):
+        """
+        Build (a > x) | (a = x AND b > y) | ... for the ordering tuple,
+        flipping the comparison for descending fields. Nulls sort last, so
+        a non-null value is also followed by every null, and a null value
+        only by the nulls after it.
+
+        A redundant bound on the first field (a >= x) is ANDed in so the
+        database can start an index range scan at the cursor instead of
+        walking the index from the beginning.
+        """
+        model = queryset.model
+        seek = Q()
+        equal = Q()
+        bound = Q()
+        for position, (field_name, value) in enumerate(zip(self.ordering_fields, values)):
+            descending = field_name.startswith('-')
+            name = field_name.lstrip('-')
+            field = self.get_model_field(model, name)
+            if value is None:
+                if field is None or not field.null:
+                    raise NotFound(self.invalid_cursor_message)
+                equal &= Q(**{f'{name}__isnull': True})
+                continue
+            if field is not None:
+                try:
+                    value = field.to_python(value)
+                except Exception:
+                    raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if descending else 'gt'
+            after = Q(**{f'{name}__{lookup}': value})
+            if field is not None and field.null:
+                after |= Q(**{f'{name}__isnull': True})
+            elif position == 0:
+                bound = Q(**{f'{name}__{lookup[0]}te': value})
+            seek |= equal & after
+            equal &= Q(**{name: value})
+        return bound & seek
+
+    def get_cursor_values(self, obj):
+        values = []
+        for field_name in self.ordering_fields:
+            value = getattr(obj, field_name.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering_fields = self.get_ordering(view, queryset)
+        self.page_size_value = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.get_order_by(queryset.model))
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            queryset = queryset.filter(self.get_seek_filter(queryset, self.decode_cursor(token)))
+
+        # One extra row tells us whether there is a next page without a COUNT
+        rows = list(queryset[:self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        page = rows[:self.page_size_value]
+        self.next_cursor = self.encode_cursor(self.get_cursor_values(page[-1])) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_first_link(self):
+        url = self.request.build_absolute_uri()
+        return remove_query_param(url, self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('first', self.get_first_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -2,11 +2,16 @@ import logging
 from django.core.management import call_command
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Q
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime, timedelta
 
+from .availability import refresh_changed_doctor_availability
+from .job_runs import job_run_summary, record_job_run
+from .leader import LeaderElectedRunner, lease_status
+from .status_transitions import status_engine
+
 logger = logging.getLogger(__name__)
 
 def get_current_ist_time():
@@ -21,49 +26,16 @@ def get_current_ist_time():
         return timezone.now() + timedelta(hours=5, minutes=30)
 
 def update_appointment_statuses():
-    """Update appointment statuses automatically with IST support"""
+    """Complete every appointment that has ended (the status engine does this as they end)"""
     try:
-        # Get current IST time
-        if settings.TIME_ZONE == 'Asia/Kolkata':
-            now_ist = timezone.now()  # Already in IST
-        else:
-            now_ist = get_current_ist_time()
-        
-        current_date_ist = now_ist.date()
-        current_time_ist = now_ist.time()
+        now_ist = get_current_ist_time()
         
         logger.info(f"🔄 Updating appointment statuses at {now_ist.strftime('%Y-%m-%d %H:%M:%S')} IST")
         
-        from authentication.models import Appointment
-        
-        # Find scheduled appointments that have ended
-        # Past dates
-        past_date_appointments = Appointment.objects.filter(
-            status='scheduled',
-            schedule__date__lt=current_date_ist
-        )
-        
-        # Today but past end time
-        past_time_appointments = Appointment.objects.filter(
-            status='scheduled',
-            schedule__date=current_date_ist,
-            appointment_end_time__lt=current_time_ist
-        )
-        
-        past_date_count = past_date_appointments.count()
-        past_time_count = past_time_appointments.count()
-        
-        total_updated = 0
-        
-        if past_date_count > 0:
-            updated = past_date_appointments.update(status='completed')
-            total_updated += updated
-            logger.info(f"✅ Updated {updated} appointments from past dates")
-        
-        if past_time_count > 0:
-            updated = past_time_appointments.update(status='completed')
-            total_updated += updated
-            logger.info(f"✅ Updated {updated} appointments from past times today")
+        # Scheduled appointments that have ended: one set-based UPDATE on the
+        # appointment table alone (partial index on end_datetime)
+        with record_job_run('update_appointment_statuses') as run:
+            total_updated = run.rows_affected = status_engine.complete_due(now_ist)
         
         if total_updated == 0:
             logger.info("ℹ️ No appointments needed status updates")
@@ -83,9 +55,35 @@ def cleanup_past_appointments():
     except Exception as e:
         logger.error(f"❌ Error during cleanup: {str(e)}")
 
+def reconcile_availability():
+    """Nightly repair of the next-available index and doctor availability summaries"""
+    try:
+        logger.info("🔁 Reconciling doctor availability")
+        call_command('reconcile_availability')
+        logger.info("✅ Availability reconciled")
+    except Exception as e:
+        logger.error(f"❌ Error reconciling availability: {str(e)}")
+
+# Change-log position replayed into the doctor summaries (None replays the whole log)
+doctor_summary_cursor = None
+
+def refresh_doctor_availability():
+    """Catch the doctor summaries (and the directory ETag) up with recent bookings"""
+    global doctor_summary_cursor
+    try:
+        with record_job_run('refresh_doctor_availability', skip_empty=True) as run:
+            doctor_summary_cursor, run.rows_affected = refresh_changed_doctor_availability(doctor_summary_cursor)
+        if run.rows_affected:
+            logger.info(f"🩺 Refreshed availability of {run.rows_affected} doctors")
+    except Exception as e:
+        logger.error(f"❌ Error refreshing doctor availability: {str(e)}")
+
 # Global scheduler instance
 scheduler = None
 
+# Lease held by the one process allowed to run the jobs below
+JOBS_LEASE_NAME = 'background-jobs'
+
 def start_scheduler():
     """Start the background scheduler with IST timezone support"""
     global scheduler
@@ -98,15 +96,6 @@ def start_scheduler():
         # Create scheduler
         scheduler = BackgroundScheduler()
         
-        # Update appointment statuses every 15 minutes
-        scheduler.add_job(
-            update_appointment_statuses,
-            trigger=CronTrigger(minute='*/15'),  # Every 15 minutes
-            id='update_appointment_statuses',
-            name='Update Appointment Statuses (Every 15 min)',
-            replace_existing=True
-        )
-        
         # Daily cleanup at 2:00 AM
         scheduler.add_job(
             cleanup_past_appointments,
@@ -116,18 +105,37 @@ def start_scheduler():
             replace_existing=True
         )
         
+        # Nightly availability reconciliation at 2:30 AM (also rolls the 7-day counts)
+        scheduler.add_job(
+            reconcile_availability,
+            trigger=CronTrigger(hour=2, minute=30),
+            id='reconcile_availability',
+            name='Availability Reconciliation (2:30 AM)',
+            replace_existing=True
+        )
+        
+        # Doctor summaries, coalesced over every booking since the last run
+        scheduler.add_job(
+            refresh_doctor_availability,
+            trigger=IntervalTrigger(seconds=getattr(settings, 'DOCTOR_SUMMARY_REFRESH_SECONDS', 15)),
+            id='refresh_doctor_availability',
+            name='Doctor Availability Summaries',
+            replace_existing=True
+        )
+        
         scheduler.start()
         
         # Log current time and jobs
         current_time = get_current_ist_time()
         logger.info(f"🚀 Scheduler started at {current_time.strftime('%Y-%m-%d %H:%M:%S')} IST")
         logger.info("📋 Scheduled Jobs:")
-        logger.info("  📊 Status updates: Every 15 minutes")
+        logger.info("  📊 Status updates: as each appointment ends")
         logger.info("  🧹 Database cleanup: Daily at 2:00 AM")
+        logger.info("  🔁 Availability reconciliation: Daily at 2:30 AM")
+        logger.info(f"  🩺 Doctor availability summaries: every {getattr(settings, 'DOCTOR_SUMMARY_REFRESH_SECONDS', 15)}s")
         
-        # Run immediate status update
-        logger.info("🔄 Running initial status update...")
-        update_appointment_statuses()
+        # Catches up on anything that ended while stopped, then waits for the next end time
+        status_engine.start()
         
     except Exception as e:
         logger.error(f"❌ Failed to start scheduler: {str(e)}")
@@ -135,11 +143,16 @@ def start_scheduler():
 def stop_scheduler():
     """Stop the scheduler"""
     global scheduler
+    status_engine.stop()
     if scheduler and scheduler.running:
         scheduler.shutdown()
         current_time = get_current_ist_time()
         logger.info(f"🛑 Scheduler stopped at {current_time.strftime('%Y-%m-%d %H:%M:%S')} IST")
 
+def leader_runner():
+    """Runner that starts the scheduler only while this process is the elected leader"""
+    return LeaderElectedRunner(JOBS_LEASE_NAME, start_scheduler, stop_scheduler)
+
 def get_scheduler_status():
     """Get scheduler status"""
     global scheduler
@@ -166,10 +179,16 @@ def get_scheduler_status():
         return {
             'running': True,
             'current_time_ist': current_time.strftime('%Y-%m-%d %H:%M:%S IST'),
-            'jobs': job_info
+            'jobs': job_info,
+            'status_transitions': status_engine.status(),
+            'leader': lease_status(JOBS_LEASE_NAME),
+            'job_runs': job_run_summary()
         }
     return {
         'running': False,
         'current_time_ist': get_current_ist_time().strftime('%Y-%m-%d %H:%M:%S IST'),
-        'jobs': []
+        'jobs': [],
+        'status_transitions': status_engine.status(),
+        'leader': lease_status(JOBS_LEASE_NAME),
+        'job_runs': job_run_summary()
     }
\ No newline at end of file
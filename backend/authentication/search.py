@@ -0,0 +1,231 @@
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection, OperationalError
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'authentication_doctor_fts'
+
+# Column order matters: bm25() takes one weight per column, in this order
+FTS_COLUMNS = ('name', 'degree', 'bio', 'specialties', 'languages')
+FTS_WEIGHTS = (10.0, 2.0, 1.0, 5.0, 3.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_QUERY_TOKENS = 8
+
+_fts_available = None
+
+
+def fts_available():
+    """True if the database is SQLite with the FTS5 extension compiled in"""
+    global _fts_available
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            _fts_available = any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+    return _fts_available
+
+
+_index_ready = False
+
+
+def search_index_ready():
+    """FTS5 is available and the index table exists (migrations applied)"""
+    global _index_ready
+    if not _index_ready and fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _index_ready = cursor.fetchone() is not None
+    return _index_ready
+
+
+# One statement builds index rows straight from the doctor tables, so the
+# migration, the rebuild command and the signals share the same document
+POPULATE_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)})
+    SELECT d.id,
+           d.first_name || ' ' || d.last_name,
+           d.degree,
+           d.bio,
+           COALESCE((SELECT group_concat(s.name, ' ')
+                       FROM authentication_doctor_specialties ds
+                       JOIN authentication_specialty s ON s.id = ds.specialty_id
+                      WHERE ds.doctor_id = d.id), ''),
+           COALESCE((SELECT group_concat(l.name, ' ')
+                       FROM authentication_doctor_languages dl
+                       JOIN authentication_language l ON l.id = dl.language_id
+                      WHERE dl.doctor_id = d.id), '')
+      FROM authentication_doctor d
+"""
+
+
+def create_search_table(conn=None):
+    """Create the FTS5 index table; returns False if the backend can't"""
+    conn = conn or connection
+    if conn.vendor != 'sqlite':
+        return False
+    columns = ', '.join(FTS_COLUMNS)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+    except OperationalError as e:
+        logger.warning(f"⚠️ FTS5 unavailable, doctor search will use substring matching: {e}")
+        return False
+    return True
+
+
+def drop_search_table(conn=None):
+    conn = conn or connection
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def populate_search_table(conn=None, doctor_ids=None):
+    """Insert index rows for `doctor_ids` (all doctors if None)"""
+    conn = conn or connection
+    sql, params = POPULATE_SQL, []
+    if doctor_ids is not None:
+        sql += f" WHERE d.id IN ({', '.join(['%s'] * len(doctor_ids))})"
+        params = list(doctor_ids)
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def index_doctors(doctor_ids, batch_size=500):
+    """(Re)index the given doctors; ids that no longer exist are just removed"""
+    doctor_ids = list(doctor_ids)
+    if not doctor_ids or not fts_available():
+        return 0
+    indexed = 0
+    try:
+        for start in range(0, len(doctor_ids), batch_size):
+            batch = doctor_ids[start:start + batch_size]
+            remove_doctors(batch, raise_errors=True)
+            indexed += populate_search_table(doctor_ids=batch)
+        return indexed
+    except OperationalError as e:
+        # Index table missing (migrations not applied yet): search falls back
+        logger.warning(f"⚠️ Could not update doctor search index: {e}")
+        return 0
+
+
+def remove_doctors(doctor_ids, raise_errors=False):
+    if not fts_available():
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in doctor_ids])
+    except OperationalError as e:
+        if raise_errors:
+            raise
+        logger.warning(f"⚠️ Could not update doctor search index: {e}")
+
+
+def rebuild_index():
+    """Drop and repopulate the whole index. Returns the number of doctors indexed."""
+    if not fts_available():
+        return 0
+    drop_search_table()
+    create_search_table()
+    total = populate_search_table()
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, the last
+    one as a prefix for type-ahead. Words are quoted, so FTS5 operators
+    typed by the user are treated as plain text.
+    """
+    tokens = TOKEN_RE.findall(text or '')[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens[:-1]]
+    terms.append(f'"{tokens[-1]}"*')
+    return ' '.join(terms)
+
+
+# bm25 of the current index row (lower is better); only valid in a statement
+# that joins FTS_TABLE with a MATCH, see join_search_index()
+RANK_SQL = f"bm25({FTS_TABLE}, {', '.join(str(weight) for weight in FTS_WEIGHTS)})"
+
+
+def join_search_index(queryset, match):
+    """
+    Join the index rows matching an FTS5 query onto a Doctor queryset.
+
+    The MATCH runs once per statement and drives the join: SQLite walks the
+    matching index rows and looks each doctor up by primary key, so RANK_SQL
+    is computed once per match instead of re-running the MATCH per doctor.
+    """
+    doctor_table = connection.ops.quote_name(queryset.model._meta.db_table)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {doctor_table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+    )
+
+
+def fallback_search(queryset, text):
+    """Substring search for backends without FTS5: every word must match some field"""
+    tokens = TOKEN_RE.findall(text or '')[:MAX_QUERY_TOKENS]
+    for token in tokens:
+        queryset = queryset.filter(
+            Q(first_name__icontains=token) |
+            Q(last_name__icontains=token) |
+            Q(degree__icontains=token) |
+            Q(specialties__name__icontains=token) |
+            Q(languages__name__icontains=token)
+        )
+    return queryset.distinct() if tokens else queryset
+
+
+def search_doctors(queryset, text, ranked=True):
+    """
+    Filter a Doctor queryset by free text.
+
+    On SQLite with FTS5 the match runs against the doctor_fts index
+    (name, degree, bio, specialty and language names) and, if `ranked`,
+    results are ordered by bm25 relevance. Other backends fall back to
+    substring matching on names, degree, specialties and languages.
+    """
+    if not TOKEN_RE.search(text or ''):
+        return queryset
+    if not search_index_ready():
+        return fallback_search(queryset, text)
+    queryset = join_search_index(queryset, build_match_query(text))
+    if ranked:
+        # The MATCH joins the view's other filters in one statement, so ranking
+        # and the page LIMIT apply to the intersected set (SQLite keeps only the
+        # top rows while sorting). Exposed as an annotation so keyset
+        # pagination can seek on it.
+        queryset = queryset.annotate(search_rank=RawSQL(RANK_SQL, [], output_field=FloatField())).order_by('search_rank')
+    return queryset
+
+
+class DoctorSearchFilter(filters.SearchFilter):
+    """
+    ?search= backed by the doctor full-text index. Results are ranked by
+    relevance unless the client also asked for an explicit ?ordering=.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        ranked = not request.query_params.get(api_settings.ORDERING_PARAM)
+        return search_doctors(queryset, text, ranked=ranked)
@@ -2,11 +2,16 @@ from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.conf import settings
 from django.utils import timezone
+from django.db.models import Prefetch
+from django.db.models.constants import LOOKUP_SEP
 from datetime import timedelta
+from .catalog_cache import CATALOGS
+from .enhanced_validation import BookingContext
 from .models import (
     Doctor, DoctorSchedule, Specialty, Language, TimeSlot,
-    Patient, MedicalHistory, Appointment
+    Patient, MedicalHistory, Appointment, SlotHold, ScheduleAvailability, ArchivedAppointment
 )
 
 # User serializers with proper password handling and email validation
@@ -63,6 +68,87 @@ class LoginSerializer(serializers.Serializer):
 
         return data
 
+class SparseFieldsetMixin:
+    """
+    ?fields=a,b keeps only the listed fields of a read response and ?omit=c
+    drops some; unknown names are ignored. Pair with sparse_queryset() so
+    the columns (and joins/prefetches) behind dropped fields are never
+    loaded. Computed fields name the model fields they read in
+    Meta.field_sources; a computed field without one disables deferring.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    @classmethod
+    def get_sparse_field_names(cls, request, available):
+        """The field names to render for this request, or None for all of them"""
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        requested = request.query_params.get(cls.fields_query_param)
+        omitted = request.query_params.get(cls.omit_query_param)
+        if not requested and not omitted:
+            return None
+        names = [name for name in available if name in requested.split(',')] if requested else list(available)
+        if omitted:
+            names = [name for name in names if name not in omitted.split(',')]
+        return names
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Only the serializer rendering the response (or its list) is trimmed, never nested ones
+        if self.parent is None or (self.parent.parent is None and isinstance(self.parent, serializers.ListSerializer)):
+            names = self.get_sparse_field_names(self.context.get('request'), fields)
+            if names is not None:
+                fields = {name: fields[name] for name in names}
+        return fields
+
+    @classmethod
+    def sparse_queryset(cls, queryset, request, always=()):
+        """
+        Restrict a queryset to the columns the rendered fields need:
+        only() on the model's own columns, select_related limited to the
+        relations still read, and prefetches dropped for omitted
+        many-to-many fields.
+
+        Args:
+            always: Extra model fields to load (e.g. pagination keys)
+        """
+        serializer = cls()
+        names = cls.get_sparse_field_names(request, serializer.fields) or list(serializer.fields)
+        field_sources = getattr(cls.Meta, 'field_sources', {})
+        model = queryset.model
+
+        columns = set(always)
+        for name in names:
+            if name in field_sources:
+                columns.update(field_sources[name])
+            elif serializer.fields[name].source == '*':
+                return queryset
+            else:
+                columns.add(serializer.fields[name].source.replace('.', LOOKUP_SEP))
+
+        own, relations, many = set(), set(), set()
+        for column in columns:
+            root = column.split(LOOKUP_SEP)[0]
+            field = model._meta.get_field(root)
+            if field.many_to_many or field.one_to_many:
+                many.add(root)
+            else:
+                own.add(column)
+                if LOOKUP_SEP in column:
+                    relations.add(root)
+
+        prefetches = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if getattr(lookup, 'prefetch_through', lookup).split(LOOKUP_SEP)[0] in many
+        ]
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset.only(*own)
+
 # Doctor related serializers
 class SpecialtySerializer(serializers.ModelSerializer):
     class Meta:
@@ -74,14 +160,55 @@ class LanguageSerializer(serializers.ModelSerializer):
         model = Language
         fields = '__all__'
 
-class DoctorSerializer(serializers.ModelSerializer):
-    specialties = SpecialtySerializer(many=True, read_only=True)
-    languages = LanguageSerializer(many=True, read_only=True)
+class CachedCatalogField(serializers.Field):
+    """
+    Read-only many-to-many field rendered from an in-process catalog cache.
+    Only the related ids come from the database (or the prefetch cache);
+    the {'id', 'name'} payloads come from memory.
+    """
+
+    def __init__(self, catalog_key, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.catalog = CATALOGS[catalog_key]
+
+    def to_representation(self, manager):
+        prefetched = getattr(manager.instance, '_prefetched_objects_cache', {})
+        if manager.prefetch_cache_name in prefetched:
+            ids = [item.pk for item in manager.all()]
+        else:
+            ids = list(manager.values_list('id', flat=True))
+        return self.catalog.resolve(ids)
+
+class DoctorSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    specialties = CachedCatalogField('specialties')
+    languages = CachedCatalogField('languages')
 
     class Meta:
         model = Doctor
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Prefetch only the related specialty/language ids; CachedCatalogField
+        fills in the names from memory, so a page costs three queries.
+        """
+        return queryset.prefetch_related(
+            Prefetch('specialties', queryset=Specialty.objects.only('id')),
+            Prefetch('languages', queryset=Language.objects.only('id')),
+        )
+
+class DoctorListSerializer(DoctorSerializer):
+    """Directory rows without the bio and account link (?compact=true)"""
+
+    class Meta:
+        model = Doctor
+        fields = [
+            'id', 'first_name', 'last_name', 'degree', 'years_of_experience',
+            'specialties', 'languages', 'profile_picture', 'next_available_at', 'free_slots_7d'
+        ]
+
 class TimeSlotSerializer(serializers.ModelSerializer):
     formatted_time = serializers.SerializerMethodField()
 
@@ -100,7 +227,14 @@ class DoctorScheduleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = DoctorSchedule
-        fields = '__all__'
+        exclude = ['booked_slots']
+
+    def get_extra_kwargs(self):
+        extra_kwargs = super().get_extra_kwargs()
+        if self.instance is not None:
+            # Switching modes would strand booked_slots or the stored TimeSlot rows
+            extra_kwargs['virtual_slots'] = {**extra_kwargs.get('virtual_slots', {}), 'read_only': True}
+        return extra_kwargs
 
     def validate_date(self, value):
         if value < timezone.now().date():
@@ -128,17 +262,53 @@ class DoctorScheduleSerializer(serializers.ModelSerializer):
 
         return data
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Load doctors, unbooked time slots and live slot holds for a schedule
+        queryset in a constant number of queries, however many schedules it has.
+        """
+        return queryset.select_related('doctor').prefetch_related(
+            Prefetch(
+                'time_slots',
+                queryset=TimeSlot.objects.filter(is_booked=False).order_by('start_time'),
+                to_attr='unbooked_time_slots'
+            ),
+            Prefetch(
+                'holds',
+                queryset=SlotHold.objects.active().filter(slot_index__isnull=False),
+                to_attr='active_holds'
+            ),
+        )
+
     def get_doctor_name(self, obj):
         return str(obj.doctor)
 
+    @staticmethod
+    def get_slot_buffer_time(schedule_date):
+        """Slots must start after this time on the current day; None on other days"""
+        if schedule_date == timezone.now().date():
+            return (timezone.now() + timedelta(minutes=30)).time()
+        return None
+
     def get_available_time_slots(self, obj):
+        buffer_time = self.get_slot_buffer_time(obj.date)
+        if obj.time_range == 'slot-based' and hasattr(obj, 'unbooked_time_slots') and not obj.virtual_slots:
+            # Prefetched by setup_eager_loading: apply the same buffer rule in memory
+            available_slots = obj.unbooked_time_slots
+            if buffer_time:
+                available_slots = [slot for slot in available_slots if slot.start_time > buffer_time]
+            return TimeSlotSerializer(self.exclude_held_slots(obj, available_slots), many=True).data
         if obj.time_range == 'slot-based':
+            if obj.virtual_slots:
+                available_slots = obj.get_virtual_time_slots()
+                if buffer_time:
+                    available_slots = [slot for slot in available_slots if slot.start_time > buffer_time]
+                return TimeSlotSerializer(self.exclude_held_slots(obj, available_slots), many=True).data
             available_slots = obj.time_slots.filter(is_booked=False)
-            if obj.date == timezone.now().date():
-                current_time = timezone.now().time()
-                buffer_time = (timezone.now() + timedelta(minutes=30)).time()
+            if buffer_time:
                 available_slots = available_slots.filter(start_time__gt=buffer_time)
-            return TimeSlotSerializer(available_slots, many=True).data
+            return TimeSlotSerializer(self.exclude_held_slots(obj, available_slots), many=True).data
         else:
             return {
                 'type': 'range-based',
@@ -147,28 +317,48 @@ class DoctorScheduleSerializer(serializers.ModelSerializer):
                 'message': 'Flexible appointment timing within the given range'
             }
 
+    def exclude_held_slots(self, obj, slots):
+        if hasattr(obj, 'active_holds'):
+            held = {hold.slot_index for hold in obj.active_holds}
+        else:
+            held = set(
+                SlotHold.objects.active()
+                .filter(schedule=obj, slot_index__isnull=False)
+                .values_list('slot_index', flat=True)
+            )
+        if not held:
+            return slots
+        return [slot for slot in slots if obj.get_slot_index(slot.start_time) not in held]
+
 # Patient related serializers
 class PatientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Patient
         fields = '__all__'
 
-class MedicalHistorySerializer(serializers.ModelSerializer):
+class MedicalHistorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = MedicalHistory
         fields = '__all__'
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     patient_name = serializers.SerializerMethodField()
     doctor_name = serializers.SerializerMethodField()
     appointment_time_formatted = serializers.SerializerMethodField()
     schedule_type = serializers.CharField(source='schedule.time_range', read_only=True)
-    appointment_date = serializers.CharField(source='schedule.date', read_only=True)
-    schedule_date = serializers.CharField(source='schedule.date', read_only=True)
+    appointment_date = serializers.SerializerMethodField()
+    schedule_date = serializers.SerializerMethodField()
 
     class Meta:
         model = Appointment
         fields = '__all__'
+        field_sources = {
+            'patient_name': ['patient__first_name', 'patient__last_name'],
+            'doctor_name': ['doctor__first_name', 'doctor__last_name'],
+            'appointment_time_formatted': ['appointment_start_time', 'appointment_end_time'],
+            'appointment_date': ['start_datetime'],
+            'schedule_date': ['start_datetime'],
+        }
 
     def get_patient_name(self, obj):
         return str(obj.patient)
@@ -176,6 +366,38 @@ class AppointmentSerializer(serializers.ModelSerializer):
     def get_doctor_name(self, obj):
         return str(obj.doctor)
 
+    def get_appointment_date(self, obj):
+        return str(timezone.localtime(obj.start_datetime).date())
+
+    def get_schedule_date(self, obj):
+        return self.get_appointment_date(obj)
+
+    def get_appointment_time_formatted(self, obj):
+        return f"{obj.appointment_start_time.strftime('%I:%M %p')} - {obj.appointment_end_time.strftime('%I:%M %p')}"
+
+class AppointmentListSerializer(AppointmentSerializer):
+    """What an appointment list screen shows (?compact=true)"""
+
+    class Meta(AppointmentSerializer.Meta):
+        fields = ['id', 'doctor', 'doctor_name', 'appointment_date', 'appointment_time_formatted', 'status']
+
+class ArchivedAppointmentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """A past visit from the archive, with the live serializer's display fields"""
+    appointment_date = serializers.SerializerMethodField()
+    appointment_time_formatted = serializers.SerializerMethodField()
+    schedule_type = serializers.CharField(source='time_range', read_only=True)
+
+    class Meta:
+        model = ArchivedAppointment
+        fields = [
+            'id', 'doctor', 'doctor_name', 'appointment_date', 'appointment_time_formatted',
+            'schedule_type', 'appointment_start_time', 'appointment_end_time',
+            'start_datetime', 'end_datetime', 'status', 'notes', 'created_at', 'archived_at'
+        ]
+
+    def get_appointment_date(self, obj):
+        return str(timezone.localtime(obj.start_datetime).date())
+
     def get_appointment_time_formatted(self, obj):
         return f"{obj.appointment_start_time.strftime('%I:%M %p')} - {obj.appointment_end_time.strftime('%I:%M %p')}"
 
@@ -188,11 +410,19 @@ class BookAppointmentSerializer(serializers.Serializer):
     date_of_birth = serializers.DateField(required=False)
     phone_number = serializers.CharField(required=False)
     address = serializers.CharField(required=False, allow_blank=True)
+    hold_token = serializers.UUIDField(required=False, help_text="Token of the patient's slot hold, if any")
 
     def validate(self, data):
-        schedule_id = data.get('schedule_id')
+        request = self.context.get('request')
+        booking_context = BookingContext.load(
+            data.get('schedule_id'),
+            time_slot_id=data.get('time_slot_id'),
+            user=request.user if request else None
+        )
         try:
-            schedule = DoctorSchedule.objects.get(id=schedule_id)
+            schedule = booking_context.schedule
+            if schedule is None:
+                raise DoctorSchedule.DoesNotExist
             now = timezone.now()
             if schedule.date < now.date():
                 raise serializers.ValidationError("Cannot book appointments for past dates")
@@ -202,14 +432,12 @@ class BookAppointmentSerializer(serializers.Serializer):
                     raise serializers.ValidationError("Cannot book appointments less than 30 minutes in advance")
 
             if schedule.time_range == 'slot-based':
-                if not data.get('time_slot_id'):
+                if data.get('time_slot_id') is None:
                     raise serializers.ValidationError("time_slot_id is required for slot-based appointments")
                 try:
-                    time_slot = TimeSlot.objects.get(
-                        id=data.get('time_slot_id'),
-                        schedule=schedule,
-                        is_booked=False
-                    )
+                    time_slot = booking_context.time_slot
+                    if time_slot is None:
+                        raise TimeSlot.DoesNotExist
                     if schedule.date == now.date():
                         buffer_time = (now + timedelta(minutes=15)).time()
                         if time_slot.start_time <= buffer_time:
@@ -226,4 +454,93 @@ class BookAppointmentSerializer(serializers.Serializer):
                         raise serializers.ValidationError("Appointment time must be at least 15 minutes in the future")
         except DoctorSchedule.DoesNotExist:
             raise serializers.ValidationError("Schedule not found")
-        return data
\ No newline at end of file
+        data['booking_context'] = booking_context
+        return data
+
+class SlotHoldSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SlotHold
+        fields = ['token', 'schedule', 'slot_index', 'start_time', 'end_time', 'expires_at']
+
+class HoldSlotSerializer(serializers.Serializer):
+    schedule_id = serializers.IntegerField()
+    time_slot_id = serializers.IntegerField(required=False, help_text="Required for slot-based schedules")
+    start_time = serializers.TimeField(required=False, help_text="Required for range-based schedules")
+    end_time = serializers.TimeField(required=False, help_text="Required for range-based schedules")
+    minutes = serializers.IntegerField(required=False, min_value=1, help_text="How long to hold the slot")
+
+class SoonestAvailableQuerySerializer(serializers.Serializer):
+    specialty = serializers.IntegerField(required=False)
+    language = serializers.IntegerField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    part_of_day = serializers.ChoiceField(choices=ScheduleAvailability.PART_OF_DAY_CHOICES, required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100, default=20)
+
+    def validate(self, data):
+        if data.get('date_from') and data.get('date_to') and data['date_to'] < data['date_from']:
+            raise serializers.ValidationError("date_to must not be before date_from")
+        return data
+
+class FreeWindowQuerySerializer(serializers.Serializer):
+    duration = serializers.IntegerField(required=False, min_value=5, max_value=480, help_text="Minutes (default: the schedule's slot duration)")
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=50, default=5)
+
+class AvailabilityHeatmapQuerySerializer(serializers.Serializer):
+    doctors = serializers.CharField(required=False, help_text="Comma-separated doctor ids")
+    specialty = serializers.IntegerField(required=False)
+    date_from = serializers.DateField(required=False)
+    days = serializers.IntegerField(required=False, min_value=1)
+    by_hour = serializers.BooleanField(required=False, default=False)
+
+    def validate_doctors(self, value):
+        ids = [int(part) for part in value.split(',') if part.strip().isdigit()]
+        if not ids:
+            raise serializers.ValidationError("Expected comma-separated doctor ids")
+        return ids
+
+    def validate_days(self, value):
+        max_days = getattr(settings, 'AVAILABILITY_HEATMAP_MAX_DAYS', 90)
+        if value > max_days:
+            raise serializers.ValidationError(f"At most {max_days} days")
+        return value
+
+    def validate_date_from(self, value):
+        if value < timezone.localdate():
+            raise serializers.ValidationError("date_from cannot be in the past")
+        return value
+
+    def validate(self, data):
+        if not data.get('doctors') and not data.get('specialty'):
+            raise serializers.ValidationError("Give doctors or specialty")
+        return data
+
+class JobRunQuerySerializer(serializers.Serializer):
+    days = serializers.IntegerField(required=False, min_value=1, default=7)
+
+    def validate_days(self, value):
+        retention = getattr(settings, 'JOB_RUN_RETENTION_DAYS', 90)
+        if value > retention:
+            raise serializers.ValidationError(f"History is kept for {retention} days")
+        return value
+
+class SoonestAvailableSerializer(serializers.ModelSerializer):
+    doctor = DoctorSerializer(read_only=True)
+    next_slot = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ScheduleAvailability
+        fields = ['doctor', 'next_slot']
+
+    def get_next_slot(self, obj):
+        start = timezone.localtime(obj.start_datetime)
+        end = timezone.localtime(obj.end_datetime)
+        return {
+            'schedule_id': obj.schedule_id,
+            'time_range': obj.schedule.time_range,
+            'date': start.date(),
+            'start_time': start.strftime('%H:%M'),
+            'end_time': end.strftime('%H:%M'),
+            'time_slot_id': obj.time_slot_id,
+            'part_of_day': obj.part_of_day,
+        }
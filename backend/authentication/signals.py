@@ -0,0 +1,75 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .catalog_cache import specialty_catalog, language_catalog, invalidate_catalog, bump_version
+from .models import Specialty, Language, Doctor, DoctorSchedule, AvailabilityChange, Appointment
+from .search import index_doctors, remove_doctors
+from .status_transitions import status_engine
+
+
+@receiver([post_save, post_delete], sender=Specialty)
+def specialty_changed(sender, **kwargs):
+    invalidate_catalog(specialty_catalog)
+
+
+@receiver([post_save, post_delete], sender=Language)
+def language_changed(sender, **kwargs):
+    invalidate_catalog(language_catalog)
+
+
+@receiver([post_save, post_delete], sender=Doctor)
+def doctor_changed(sender, instance, **kwargs):
+    # Change marker behind the doctor directory's ETag/Last-Modified
+    bump_version('doctors')
+    AvailabilityChange.record([(None, instance.pk)])
+    if kwargs['signal'] is post_delete:
+        remove_doctors([instance.pk])
+    else:
+        index_doctors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Doctor.specialties.through)
+@receiver(m2m_changed, sender=Doctor.languages.through)
+def doctor_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Cleared from the specialty/language side: pk_set is not sent
+        instance._search_doctor_ids = list(instance.doctors.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version('doctors')
+        if not reverse:
+            index_doctors([instance.pk])
+        else:
+            index_doctors(pk_set or getattr(instance, '_search_doctor_ids', []))
+
+
+@receiver(post_save, sender=Specialty)
+@receiver(post_save, sender=Language)
+def catalog_entry_renamed(sender, instance, created, **kwargs):
+    if not created:
+        index_doctors(instance.doctors.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Specialty)
+@receiver(pre_delete, sender=Language)
+def catalog_entry_deleting(sender, instance, **kwargs):
+    # The through rows are gone by post_delete, so remember who to reindex
+    instance._search_doctor_ids = list(instance.doctors.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Specialty)
+@receiver(post_delete, sender=Language)
+def catalog_entry_deleted(sender, instance, **kwargs):
+    index_doctors(getattr(instance, '_search_doctor_ids', []))
+
+
+@receiver(post_delete, sender=DoctorSchedule)
+def schedule_deleted(sender, instance, **kwargs):
+    # Saves already log through ScheduleAvailability.rebuild_for
+    AvailabilityChange.record([(instance.pk, instance.doctor_id)])
+
+
+@receiver(post_save, sender=Appointment)
+def appointment_saved(sender, instance, **kwargs):
+    # Wakes this process's status engine if the new end time comes first
+    if instance.status == 'scheduled':
+        status_engine.notify(instance.end_datetime, instance.pk)
@@ -0,0 +1,141 @@
+import heapq
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .job_runs import record_job_run
+
+logger = logging.getLogger(__name__)
+
+
+class StatusTransitionEngine:
+    """
+    Moves appointments from 'scheduled' to 'completed' when they end,
+    instead of polling on a fixed interval.
+
+    A min-heap holds the end times of the next APPOINTMENT_STATUS_BATCH
+    scheduled appointments, read from the partial appointment_due_idx
+    index. The engine sleeps until the earliest one, then completes every
+    due row with a single UPDATE. Nothing is kept on disk: after a restart
+    the first UPDATE catches up on whatever ended in the meantime (again
+    through the index) and the heap is refilled with the next batch.
+
+    Bookings made in this process are pushed onto the heap by a post_save
+    signal; those made elsewhere are picked up by the periodic refill,
+    at least every APPOINTMENT_STATUS_RESYNC_SECONDS.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._horizon = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.transitions = 0
+        self.wakeups = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def refill(self, now=None):
+        """Reload the heap with the next batch of end times from the index"""
+        from .models import Appointment
+        batch = getattr(settings, 'APPOINTMENT_STATUS_BATCH', 500)
+        rows = list(
+            Appointment.objects.filter(status='scheduled', end_datetime__gt=now or timezone.now())
+            .order_by('end_datetime').values_list('end_datetime', 'id')[:batch]
+        )
+        heapq.heapify(rows)
+        with self._condition:
+            self._heap = rows
+            # Appointments ending after the horizon were not loaded
+            self._horizon = max(rows)[0] if len(rows) == batch else None
+
+    def complete_due(self, now=None):
+        """Complete every scheduled appointment that has ended, in one UPDATE"""
+        from .models import Appointment
+        now = now or timezone.now()
+        updated = Appointment.objects.filter(
+            status='scheduled',
+            end_datetime__lte=now
+        ).update(status='completed')
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+        self.transitions += updated
+        if updated:
+            logger.info(f"🎯 {updated} appointments completed")
+        return updated
+
+    def notify(self, end_datetime, appointment_id):
+        """A scheduled appointment was booked or moved in this process"""
+        if not self.running:
+            return
+        with self._condition:
+            if self._horizon is None or end_datetime <= self._horizon:
+                heapq.heappush(self._heap, (end_datetime, appointment_id))
+                self._condition.notify()
+
+    def seconds_until_next(self, now=None):
+        resync = getattr(settings, 'APPOINTMENT_STATUS_RESYNC_SECONDS', 60)
+        with self._condition:
+            if not self._heap:
+                return resync
+            delay = (self._heap[0][0] - (now or timezone.now())).total_seconds()
+        return min(max(delay, 0), resync)
+
+    def run(self):
+        resync = getattr(settings, 'APPOINTMENT_STATUS_RESYNC_SECONDS', 60)
+        refilled_at = None
+        while not self._stopping:
+            try:
+                close_old_connections()
+                now = timezone.now()
+                with record_job_run('update_appointment_statuses', skip_empty=True) as run:
+                    run.rows_affected = self.complete_due(now)
+                if refilled_at is None or not self._heap or (now - refilled_at).total_seconds() >= resync:
+                    self.refill(now)
+                    refilled_at = now
+            except Exception as e:
+                logger.error(f"❌ Error updating appointment statuses: {e}")
+            with self._condition:
+                if self._stopping:
+                    break
+                self._condition.wait(timeout=self.seconds_until_next())
+            self.wakeups += 1
+        close_old_connections()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self.run, name='appointment-status-transitions', daemon=True)
+        self._thread.start()
+        logger.info("⏱️ Appointment status transitions running")
+
+    def stop(self, timeout=5):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def status(self):
+        with self._condition:
+            next_due = self._heap[0][0] if self._heap else None
+            queued = len(self._heap)
+        return {
+            'running': self.running,
+            'queued': queued,
+            'next_due': next_due,
+            'transitions': self.transitions,
+            'wakeups': self.wakeups,
+        }
+
+
+status_engine = StatusTransitionEngine()
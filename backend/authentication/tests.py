@@ -1,3 +1,851 @@
-from django.test import TestCase
+from datetime import date, time, timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .availability_engine import availability_engine
+from .booking import book_appointment, cancel_appointment, create_slot_hold
+from .availability import refresh_changed_doctor_availability
+from .catalog_cache import bump_version, get_version, specialty_catalog
+from .job_runs import job_run_summary, record_job_run
+from .leader import LeaderLease
+from .management.commands import check_query_plans
+from .models import (
+    Appointment, ArchivedAppointment, AvailabilityChange, Doctor, DoctorSchedule, JobRun, Language, Patient,
+    PurgeCheckpoint, ScheduleAvailability, SlotHold, Specialty, TimeSlot
+)
+from .search import search_doctors
+from .status_transitions import StatusTransitionEngine
+
+
+class ScheduleListingQueryCountTests(TestCase):
+    """Schedule listings must not issue per-schedule queries"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.doctor = Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist')
+        self.next_date = timezone.now().date() + timedelta(days=1)
+
+    def create_schedules(self, count, time_range='slot-based'):
+        for _ in range(count):
+            DoctorSchedule.objects.create(
+                doctor=self.doctor,
+                date=self.next_date,
+                time_range=time_range,
+                start_time=time(9, 0),
+                end_time=time(11, 0),
+                slot_duration=30,
+                available_slots=3,
+            )
+            self.next_date += timedelta(days=1)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_available_slots_query_count_is_constant(self):
+        url = f'/api/doctors/{self.doctor.id}/available-slots/'
+        self.create_schedules(2)
+        small, _ = self.count_queries(url)
+
+        self.create_schedules(10)
+        large, response = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(len(response.data[0]['available_time_slots']), 4)
+
+    def test_schedule_list_query_count_is_constant(self):
+        self.create_schedules(2)
+        self.create_schedules(2, time_range='range-based')
+        small, _ = self.count_queries('/api/schedules/')
+
+        DoctorSchedule.objects.all().delete()
+        self.create_schedules(8)
+        self.create_schedules(8, time_range='range-based')
+        large, _ = self.count_queries('/api/schedules/')
+
+        self.assertEqual(small, large)
+
+
+class VirtualSlotTests(TestCase):
+    """Virtual slot schedules must answer exactly like stored-slot ones"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('ravi', password='x')
+        Patient.objects.create(
+            user=self.user, first_name='Ravi', last_name='Kumar', date_of_birth=date(1990, 1, 1), address='Chennai'
+        )
+        self.client.force_authenticate(self.user)
+        self.doctor = Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist')
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.stored, self.virtual = (
+            DoctorSchedule.objects.create(
+                doctor=self.doctor, date=tomorrow + timedelta(days=offset), time_range='slot-based',
+                start_time=time(9, 0), end_time=time(10, 0), slot_duration=30, available_slots=2,
+                virtual_slots=virtual,
+            )
+            for offset, virtual in ((0, False), (1, True))
+        )
+
+    def book(self, schedule, time_slot_id):
+        return self.client.post(
+            f'/api/appointment/book/{self.doctor.id}/', {'schedule_id': schedule.id, 'time_slot_id': time_slot_id}
+        )
+
+    def test_responses_have_the_same_shape(self):
+        stored, virtual = self.client.get(f'/api/doctors/{self.doctor.id}/available-slots/').data
+        self.assertEqual(stored.keys(), virtual.keys())
+        self.assertEqual(stored['available_time_slots'][0].keys(), virtual['available_time_slots'][0].keys())
+        self.assertEqual([slot['id'] for slot in virtual['available_time_slots']], [-1, -2])
+
+        self.assertEqual(
+            self.client.get(f'/api/schedules/{self.stored.id}/').data.keys(),
+            self.client.get(f'/api/schedules/{self.virtual.id}/').data.keys()
+        )
+
+        booked = [
+            self.book(self.stored, self.stored.time_slots.order_by('start_time').first().id),
+            self.book(self.virtual, -1),
+        ]
+        self.assertEqual([response.status_code for response in booked], [201, 201])
+        self.assertEqual(booked[0].data.keys(), booked[1].data.keys())
+        self.assertEqual(booked[0].data['appointment'].keys(), booked[1].data['appointment'].keys())
+        self.virtual.refresh_from_db()
+        self.assertTrue(self.virtual.is_slot_booked(0))
+        self.assertEqual(self.virtual.available_slots, 1)
+
+        canceled = [
+            self.client.post(f"/api/appointment/cancel/{response.data['appointment']['id']}/")
+            for response in booked
+        ]
+        self.assertEqual([response.status_code for response in canceled], [200, 200])
+        self.assertEqual(canceled[0].data.keys(), canceled[1].data.keys())
+        self.virtual.refresh_from_db()
+        self.assertFalse(self.virtual.is_slot_booked(0))
+        self.assertEqual(self.virtual.available_slots, 2)
+
+    def test_slot_ids_do_not_collide_across_modes(self):
+        # A stored slot's primary key means nothing on a virtual schedule, and the other way round
+        stored_slot = self.stored.time_slots.order_by('start_time').first()
+        self.assertEqual(self.book(self.virtual, stored_slot.id).status_code, 400)
+        self.assertEqual(self.book(self.stored, -1).status_code, 400)
+        self.assertIsNone(self.virtual.get_free_time_slot(0))
+        self.assertEqual(self.virtual.get_free_time_slot(-2).start_time, time(9, 30))
+
+    def test_slot_inside_the_model_buffer_is_bookable(self):
+        # Booking allows 15 minutes of lead time; TimeSlot.full_clean would demand 30
+        start = timezone.localtime() + timedelta(minutes=20)
+        start = (start + timedelta(minutes=-start.minute % 5)).replace(second=0, microsecond=0)
+        if start.date() != timezone.localdate() or start.hour >= 23:
+            self.skipTest('too close to midnight')
+        DoctorSchedule.objects.filter(pk=self.virtual.pk).update(
+            date=start.date(), start_time=start.time(), end_time=(start + timedelta(minutes=60)).time()
+        )
+        self.virtual.refresh_from_db()
+        slot = self.virtual.get_free_time_slot(-1)
+        patient = Patient.objects.get(user=self.user)
+        self.assertTrue(book_appointment(patient, self.virtual, slot, slot.start_time, slot.end_time)['success'])
+
+    def test_mode_cannot_change_after_create(self):
+        response = self.client.patch(f'/api/schedules/{self.virtual.id}/', {'virtual_slots': False})
+        self.assertEqual(response.status_code, 200)
+        self.virtual.refresh_from_db()
+        self.assertTrue(self.virtual.virtual_slots)
+
+
+class ConditionalBookingTests(TestCase):
+    """The conditional UPDATEs must refuse a lost race without touching the counters"""
+
+    def setUp(self):
+        self.schedule = DoctorSchedule.objects.create(
+            doctor=Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist'),
+            date=timezone.localdate() + timedelta(days=1), time_range='slot-based',
+            start_time=time(9, 0), end_time=time(10, 0), slot_duration=30, available_slots=2,
+        )
+        self.first, self.second = (
+            Patient.objects.create(first_name=name, last_name='Kumar', date_of_birth=date(1990, 1, 1), address='Chennai')
+            for name in ('Ravi', 'Meena')
+        )
+        self.slots = list(self.schedule.time_slots.order_by('start_time'))
+
+    def book(self, patient, slot):
+        return book_appointment(patient, self.schedule, slot, slot.start_time, slot.end_time)
+
+    def test_claimed_slot_is_not_booked_twice(self):
+        # Both requests loaded the slot while it was still free
+        stale = TimeSlot.objects.get(pk=self.slots[0].pk)
+        self.assertTrue(self.book(self.first, self.slots[0])['success'])
+
+        result = self.book(self.second, stale)
+        self.assertEqual(result['error_code'], 'SLOT_TAKEN')
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.available_slots, 1)
+        self.assertEqual(Appointment.objects.filter(schedule=self.schedule).count(), 1)
+
+    def test_exhausted_schedule_refuses_booking(self):
+        DoctorSchedule.objects.filter(pk=self.schedule.pk).update(available_slots=0)
+
+        result = self.book(self.second, self.slots[1])
+        self.assertEqual(result['error_code'], 'NO_SLOTS_AVAILABLE')
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.available_slots, 0)
+        # The slot claimed before the counter check was rolled back
+        self.assertFalse(TimeSlot.objects.get(pk=self.slots[1].pk).is_booked)
+        self.assertFalse(Appointment.objects.filter(schedule=self.schedule).exists())
+
+
+class BookingQueryCountTests(TestCase):
+    """Booking and cancelling through the API take a fixed number of queries"""
+
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create_user('ravi', password='x')
+        Patient.objects.create(user=user, first_name='Ravi', last_name='Kumar', date_of_birth=date(1990, 1, 1), address='Chennai')
+        self.client.force_authenticate(user)
+        self.doctor = Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist')
+        self.schedule = DoctorSchedule.objects.create(
+            doctor=self.doctor, date=timezone.localdate() + timedelta(days=1), time_range='slot-based',
+            start_time=time(9, 0), end_time=time(10, 0), slot_duration=30, available_slots=2,
+        )
+
+    def test_book_and_cancel_query_counts(self):
+        slot = self.schedule.time_slots.order_by('start_time').first()
+        # Schedule, slot, patient and their day are read once; no FK re-validation on insert.
+        # The availability index is rebuilt after commit, outside the booking transaction.
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(12):
+            response = self.client.post(
+                f'/api/appointment/book/{self.doctor.id}/', {'schedule_id': self.schedule.id, 'time_slot_id': slot.id}
+            )
+        self.assertEqual(response.status_code, 201)
+        with self.assertNumQueries(11):
+            for callback in callbacks:
+                callback()
+
+        with self.captureOnCommitCallbacks(), self.assertNumQueries(6):
+            response = self.client.post(f"/api/appointment/cancel/{response.data['appointment']['id']}/")
+        self.assertEqual(response.status_code, 200)
+
+
+class QueryPlanCheckTests(TestCase):
+    """check_query_plans must pass on the shipped indexes and catch a full scan"""
+
+    def setUp(self):
+        doctor = Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist')
+        schedule = DoctorSchedule.objects.create(
+            doctor=doctor, date=timezone.localdate() + timedelta(days=1), time_range='slot-based',
+            start_time=time(9, 0), end_time=time(10, 0), slot_duration=30, available_slots=2,
+        )
+        patient = Patient.objects.create(first_name='Ravi', last_name='Kumar', date_of_birth=date(1990, 1, 1), address='Chennai')
+        slot = schedule.time_slots.first()
+        book_appointment(patient, schedule, slot, slot.start_time, slot.end_time)
+
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('All hot queries use an index', out.getvalue())
+
+    def test_full_scan_fails_the_check(self):
+        class Command(check_query_plans.Command):
+            def get_hot_queries(self):
+                return {**super().get_hot_queries(), 'doctors by bio': Doctor.objects.filter(bio='Cardiologist')}
+
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, 'doctors by bio'):
+            call_command(Command(), stdout=out)
+        self.assertIn('❌ doctors by bio', out.getvalue())
+
+
+@override_settings(CATALOG_CACHE_CHECK_SECONDS=0)
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        specialty_catalog.invalidate()
+        self.cardiology = Specialty.objects.create(name='Cardiology')
+
+    def test_list_is_served_from_memory(self):
+        self.client.get('/api/specialties/')
+        hits = specialty_catalog.hits
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/specialties/')
+        self.assertEqual(response.data, [{'id': self.cardiology.id, 'name': 'Cardiology'}])
+        self.assertEqual(specialty_catalog.hits, hits + 1)
+        # Only the version check touches the database
+        self.assertEqual(len(queries), 1)
+
+    def test_save_invalidates_other_workers(self):
+        self.client.get('/api/specialties/')
+        # Another worker renamed the specialty: only the shared version moved
+        Specialty.objects.filter(pk=self.cardiology.pk).update(name='Cardiac Surgery')
+        bump_version(specialty_catalog.key)
+        misses = specialty_catalog.misses
+
+        response = self.client.get('/api/specialties/')
+        self.assertEqual(response.data[0]['name'], 'Cardiac Surgery')
+        self.assertEqual(specialty_catalog.misses, misses + 1)
+
+
+class DoctorDirectoryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.cardiology = Specialty.objects.create(name='Cardiology')
+
+    def create_doctors(self, count):
+        for i in range(count):
+            doctor = Doctor.objects.create(first_name=f'Doctor{i}', last_name='Rao', bio='Cardiologist')
+            doctor.specialties.add(self.cardiology)
+
+    def test_list_query_count_is_constant(self):
+        self.create_doctors(2)
+        self.client.get('/api/doctors/')
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/doctors/')
+        self.create_doctors(8)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(f'/api/doctors/?specialties={self.cardiology.id}')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(len(small), len(large))
+
+    def test_filters_and_nulls_last_ordering(self):
+        dermatology = Specialty.objects.create(name='Dermatology')
+        tamil, english = Language.objects.create(name='Tamil'), Language.objects.create(name='English')
+        soon = timezone.now() + timedelta(days=1)
+        doctors = {}
+        for name, specialties, language, next_available_at, years in (
+            ('Anil', [self.cardiology], tamil, soon + timedelta(hours=2), 5),
+            ('Bina', [self.cardiology, dermatology], english, None, 10),
+            ('Chitra', [dermatology], tamil, soon, 1),
+        ):
+            doctor = Doctor.objects.create(first_name=name, last_name='Rao', bio='-', years_of_experience=years)
+            doctor.specialties.set(specialties)
+            doctor.languages.add(language)
+            Doctor.objects.filter(pk=doctor.pk).update(next_available_at=next_available_at)
+            doctors[name] = doctor
+
+        def names(**params):
+            response = self.client.get('/api/doctors/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            return [doctor['first_name'] for doctor in response.data['results']]
+
+        self.assertEqual(names(specialties=self.cardiology.id), ['Anil', 'Bina'])
+        # Several ids match any of them, without duplicating doctors in both
+        self.assertEqual(names(specialties=f'{self.cardiology.id},{dermatology.id}'), ['Anil', 'Bina', 'Chitra'])
+        self.assertEqual(names(languages=tamil.id), ['Anil', 'Chitra'])
+        self.assertEqual(names(available='true'), ['Anil', 'Chitra'])
+        self.assertEqual(names(available='false'), ['Bina'])
+        # Doctors without an opening stay last in both directions
+        self.assertEqual(names(ordering='next_available_at'), ['Chitra', 'Anil', 'Bina'])
+        self.assertEqual(names(ordering='-next_available_at'), ['Anil', 'Chitra', 'Bina'])
+        self.assertEqual(names(ordering='-years_of_experience'), ['Bina', 'Anil', 'Chitra'])
+        # Fields outside ordering_fields are ignored
+        self.assertEqual(names(ordering='bio'), ['Anil', 'Bina', 'Chitra'])
+
+    def test_numbered_pages_are_capped(self):
+        self.create_doctors(3)
+        with override_settings(DOCTOR_DIRECTORY_MAX_PAGE=2):
+            response = self.client.get('/api/doctors/', {'page': 2, 'page_size': 1})
+            self.assertEqual(response.data['count'], 3)
+            self.assertEqual(self.client.get('/api/doctors/', {'page': 3, 'page_size': 1}).status_code, 404)
+            self.assertEqual(
+                self.client.get(f'/api/doctors/by-specialty/{self.cardiology.id}/', {'page': 3}).status_code, 404
+            )
+
+    def test_conditional_get(self):
+        self.create_doctors(1)
+        response = self.client.get('/api/doctors/')
+        etag = response['ETag']
+
+        response = self.client.get('/api/doctors/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Doctor.objects.get().specialties.clear()
+        response = self.client.get('/api/doctors/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_search_uses_index_and_follows_renames(self):
+        self.create_doctors(2)
+        other = Doctor.objects.create(first_name='Meera', last_name='Iyer', bio='Skin and hair')
+
+        response = self.client.get('/api/doctors/', {'search': 'cardi'})
+        self.assertEqual(len(response.data['results']), 2)
+
+        self.cardiology.name = 'Dermatology'
+        self.cardiology.save()
+        other.specialties.add(self.cardiology)
+        response = self.client.get('/api/doctors/', {'search': 'dermat'})
+        self.assertEqual(len(response.data['results']), 3)
+
+        # Whole-word matches across name columns work too
+        response = self.client.get('/api/doctors/', {'search': 'meera'})
+        self.assertEqual([doctor['id'] for doctor in response.data['results']], [other.id])
+
+    def test_search_is_ranked_within_the_filtered_set(self):
+        self.create_doctors(1)
+        # Stronger name matches that the specialty filter must still exclude
+        for i in range(3):
+            Doctor.objects.create(first_name='Rao', last_name='Rao', bio='Rao family clinic')
+        cardiologist = Doctor.objects.get(specialties=self.cardiology)
+
+        response = self.client.get('/api/doctors/', {'search': 'rao', 'specialties': self.cardiology.id})
+        self.assertEqual([doctor['id'] for doctor in response.data['results']], [cardiologist.id])
+
+        seen = []
+        url = '/api/doctors/?search=rao&page_size=1'
+        while url:
+            response = self.client.get(url)
+            seen.extend(doctor['id'] for doctor in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 4)
+        # Best bm25 match first: the cardiologist only has 'Rao' once
+        self.assertEqual(seen[-1], cardiologist.id)
+
+    def test_search_joins_the_index_once(self):
+        self.create_doctors(3)
+        queryset = search_doctors(Doctor.objects.filter(specialties=self.cardiology), 'rao')[:11]
+        sql, params = queryset.query.sql_with_params()
+        self.assertEqual(sql.count(' MATCH '), 1)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        # The MATCH drives the join and doctors are fetched by primary key;
+        # no per-row subquery re-runs the MATCH for ranking
+        self.assertTrue(any('VIRTUAL TABLE INDEX' in line for line in plan), plan)
+        self.assertIn('SEARCH authentication_doctor USING INTEGER PRIMARY KEY (rowid=?)', plan)
+        self.assertFalse(any('SUBQUERY' in line for line in plan), plan)
+        self.assertEqual(len(list(queryset)), 3)
+
+    def test_sparse_fieldsets_defer_columns(self):
+        self.create_doctors(2)
+        self.client.get('/api/doctors/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/doctors/', {'fields': 'id,first_name'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'first_name'})
+        self.assertFalse(any('"bio"' in query['sql'] for query in queries.captured_queries))
+
+        response = self.client.get('/api/doctors/', {'compact': 'true', 'omit': 'languages'})
+        self.assertNotIn('bio', response.data['results'][0])
+        self.assertNotIn('languages', response.data['results'][0])
+        self.assertIn('specialties', response.data['results'][0])
+
+    def test_keyset_pages_follow_ordering(self):
+        self.create_doctors(5)
+        Doctor.objects.filter(first_name__in=['Doctor1', 'Doctor3']).update(next_available_at=timezone.now() + timedelta(days=2))
+
+        seen = []
+        url = '/api/doctors/?ordering=-next_available_at&page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(doctor['first_name'] for doctor in response.data['results'])
+            url = response.data['next']
+        # Nulls last, ids breaking ties
+        self.assertEqual(seen, ['Doctor1', 'Doctor3', 'Doctor0', 'Doctor2', 'Doctor4'])
+
+        # Existing numbered-page clients keep count/previous
+        response = self.client.get('/api/doctors/', {'page': 2, 'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual([doctor['first_name'] for doctor in response.data['results']], ['Doctor2', 'Doctor3'])
+        with override_settings(DOCTOR_DIRECTORY_MAX_PAGE=2):
+            self.assertEqual(self.client.get('/api/doctors/', {'page': 'last'}).status_code, 404)
+
+
+class ScheduleDateResyncTests(TestCase):
+    def test_moving_schedule_date_moves_appointment_datetimes(self):
+        doctor = Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist')
+        schedule = DoctorSchedule.objects.create(
+            doctor=doctor, date=timezone.localdate() + timedelta(days=1), time_range='slot-based',
+            start_time=time(9, 0), end_time=time(10, 0), slot_duration=30, available_slots=2,
+        )
+        patient = Patient.objects.create(
+            first_name='Ravi', last_name='Kumar', date_of_birth=date(1990, 1, 1), address='Chennai'
+        )
+        slot = schedule.time_slots.order_by('start_time').first()
+        appointment = book_appointment(patient, schedule, slot, slot.start_time, slot.end_time)['appointment']
+
+        schedule.date += timedelta(days=2)
+        schedule.save()
+
+        appointment.refresh_from_db()
+        tz = timezone.get_current_timezone()
+        self.assertEqual(appointment.start_datetime.astimezone(tz).date(), schedule.date)
+        self.assertEqual(appointment.start_datetime.astimezone(tz).time(), time(9, 0))
+        self.assertEqual(appointment.end_datetime.astimezone(tz).date(), schedule.date)
+        self.assertEqual(appointment.end_datetime.astimezone(tz).time(), time(9, 30))
+
+
+class SoonestAvailableTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.cardiology = Specialty.objects.create(name='Cardiology')
+        self.doctor = Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist')
+        self.doctor.specialties.add(self.cardiology)
+        self.schedule = DoctorSchedule.objects.create(
+            doctor=self.doctor,
+            date=timezone.localdate() + timedelta(days=1),
+            time_range='slot-based',
+            start_time=time(9, 0),
+            end_time=time(10, 0),
+            slot_duration=30,
+            available_slots=2,
+        )
+        self.patient = Patient.objects.create(
+            first_name='Ravi', last_name='Kumar', date_of_birth=date(1990, 1, 1), address='Chennai'
+        )
+
+    def next_slot(self, **params):
+        response = self.client.get('/api/doctors/soonest-available/', {'specialty': self.cardiology.id, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data[0]['next_slot'] if response.data else None
+
+    def test_booking_and_cancel_move_the_next_slot(self):
+        first = self.next_slot()
+        self.assertEqual(first['start_time'], '09:00')
+
+        slot = self.schedule.time_slots.get(pk=first['time_slot_id'])
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            result = book_appointment(self.patient, self.schedule, slot, slot.start_time, slot.end_time)
+        self.assertTrue(result['success'])
+        # The index follows the booking once it commits, not inside its transaction
+        self.assertTrue(callbacks)
+        self.assertEqual(self.next_slot()['start_time'], '09:30')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_appointment(result['appointment'])
+        self.assertEqual(self.next_slot()['start_time'], '09:00')
+
+    def test_part_of_day_filter(self):
+        self.assertEqual(self.next_slot(part_of_day='morning')['part_of_day'], 'morning')
+        self.assertIsNone(self.next_slot(part_of_day='evening'))
+
+    def test_doctor_summary_follows_bookings(self):
+        self.doctor.refresh_from_db()
+        self.assertEqual(timezone.localtime(self.doctor.next_available_at).time(), time(9, 0))
+        self.assertEqual(self.doctor.free_slots_7d, 2)
+
+        # Bookings leave the summary and the directory version to the job worker
+        version, _ = get_version('doctors')
+        slot = self.schedule.time_slots.order_by('start_time').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            book_appointment(self.patient, self.schedule, slot, slot.start_time, slot.end_time)
+        self.doctor.refresh_from_db()
+        self.assertEqual(timezone.localtime(self.doctor.next_available_at).time(), time(9, 0))
+        self.assertEqual(get_version('doctors')[0], version)
+
+        _, refreshed = refresh_changed_doctor_availability()
+        self.assertEqual(refreshed, 1)
+        self.assertEqual(get_version('doctors')[0], version + 1)
+        self.doctor.refresh_from_db()
+        self.assertEqual(timezone.localtime(self.doctor.next_available_at).time(), time(9, 30))
+        self.assertEqual(self.doctor.free_slots_7d, 1)
+
+        response = self.client.get('/api/doctors/', {'ordering': 'next_available_at', 'available': 'true'})
+        self.assertEqual([doctor['id'] for doctor in response.data['results']], [self.doctor.id])
+
+    def test_heatmap_counts_free_slots_per_day_and_hour(self):
+        params = {'specialty': self.cardiology.id, 'days': 3, 'by_hour': 'true'}
+        heatmap = self.client.get('/api/doctors/availability-heatmap/', params).data
+        self.assertEqual(heatmap['doctors'], [self.doctor.id])
+        self.assertEqual(heatmap['free'], [[0, 2, 0]])
+        self.assertEqual(heatmap['hourly'][1][9], 2)
+
+        slot = self.schedule.time_slots.order_by('start_time').first()
+        book_appointment(self.patient, self.schedule, slot, slot.start_time, slot.end_time)
+        heatmap = self.client.get('/api/doctors/availability-heatmap/', params).data
+        self.assertEqual(heatmap['total'], [0, 1, 0])
+        self.assertEqual(sum(heatmap['hourly'][1]), 1)
+
+
+@override_settings(AVAILABILITY_ENGINE_ENABLED=True, AVAILABILITY_ENGINE_POLL_SECONDS=0)
+class AvailabilityEngineTests(TestCase):
+    """The in-memory engine must answer exactly like the database path"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.doctor = Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist')
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.schedule = DoctorSchedule.objects.create(
+            doctor=self.doctor, date=tomorrow, time_range='slot-based',
+            start_time=time(9, 0), end_time=time(11, 0), slot_duration=30, available_slots=4,
+        )
+        DoctorSchedule.objects.create(
+            doctor=self.doctor, date=tomorrow, time_range='slot-based', virtual_slots=True,
+            start_time=time(14, 0), end_time=time(15, 0), slot_duration=15, available_slots=4,
+        )
+        DoctorSchedule.objects.create(
+            doctor=self.doctor, date=tomorrow + timedelta(days=1), time_range='range-based',
+            start_time=time(17, 0), end_time=time(19, 0), slot_duration=30, available_slots=4,
+        )
+        self.patient = Patient.objects.create(
+            first_name='Ravi', last_name='Kumar', date_of_birth=date(1990, 1, 1), address='Chennai'
+        )
+        # Ids are reused after each test's rollback, so start from a fresh load
+        availability_engine.full_load()
+
+    def assertMatchesDatabase(self):
+        url = f'/api/doctors/{self.doctor.id}/available-slots/'
+        from_engine = self.client.get(url).json()
+        with self.settings(AVAILABILITY_ENGINE_ENABLED=False):
+            from_database = self.client.get(url).json()
+        self.assertEqual(from_engine, from_database)
+        return from_engine
+
+    def test_engine_matches_database_and_follows_bookings(self):
+        schedules = self.assertMatchesDatabase()
+        self.assertEqual(len(schedules), 3)
+        self.assertEqual(len(schedules[0]['available_time_slots']), 4)
+
+        slot = self.schedule.time_slots.order_by('start_time').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            result = book_appointment(self.patient, self.schedule, slot, slot.start_time, slot.end_time)
+        self.assertTrue(result['success'])
+        schedules = self.assertMatchesDatabase()
+        self.assertEqual(len(schedules[0]['available_time_slots']), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_appointment(result['appointment'])
+        self.assertEqual(len(self.assertMatchesDatabase()[0]['available_time_slots']), 4)
+
+        response = self.client.get(f'/api/doctors/{self.doctor.id}/schedules/{self.schedule.id}/available-slots/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['available_slots']), 4)
+
+    def test_entries_committing_below_a_replayed_id_are_applied(self):
+        self.assertEqual(len(self.assertMatchesDatabase()), 3)
+        last_id = AvailabilityChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        AvailabilityChange.objects.create(id=last_id + 5, doctor_id=self.doctor.id)
+        availability_engine.sync(force=True)
+
+        # A concurrent writer drew a lower id but commits only now
+        DoctorSchedule.objects.filter(pk=self.schedule.pk).update(is_active=False)
+        AvailabilityChange.objects.create(id=last_id + 2, schedule_id=self.schedule.id, doctor_id=self.doctor.id)
+        self.assertEqual(len(self.assertMatchesDatabase()), 2)
+
+
+class RangeBookingConflictTests(TestCase):
+    def setUp(self):
+        self.doctor = Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist')
+        self.schedule = DoctorSchedule.objects.create(
+            doctor=self.doctor, date=timezone.localdate() + timedelta(days=1), time_range='range-based',
+            start_time=time(10, 0), end_time=time(12, 0), slot_duration=30, available_slots=4,
+        )
+        self.first, self.second = (
+            Patient.objects.create(first_name=name, last_name='Kumar', date_of_birth=date(1990, 1, 1), address='Chennai')
+            for name in ('Ravi', 'Meena')
+        )
+
+    def book(self, patient, start, end):
+        # The index rows are rebuilt once the booking commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return book_appointment(patient, self.schedule, None, start, end)
+
+    def test_overlapping_range_bookings_are_rejected(self):
+        self.assertTrue(self.book(self.first, time(10, 0), time(10, 30))['success'])
+
+        result = self.book(self.second, time(10, 15), time(10, 45))
+        self.assertEqual(result['error_code'], 'TIME_CONFLICT')
+        # Back-to-back windows do not overlap
+        self.assertTrue(self.book(self.second, time(10, 30), time(11, 0))['success'])
+
+        other_schedule = DoctorSchedule.objects.create(
+            doctor=Doctor.objects.create(first_name='Vikram', last_name='Iyer', bio='Dermatologist'),
+            date=self.schedule.date, time_range='range-based',
+            start_time=time(10, 0), end_time=time(12, 0), slot_duration=30, available_slots=4,
+        )
+        result = book_appointment(self.first, other_schedule, None, time(10, 20), time(10, 40))
+        self.assertEqual(result['error_code'], 'OVERLAPPING_APPOINTMENT')
+
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.available_slots, 2)
+
+    def test_free_windows_skip_booked_intervals(self):
+        url = f'/api/doctors/{self.doctor.id}/schedules/{self.schedule.id}/free-windows/'
+        self.book(self.first, time(10, 0), time(10, 30))
+        self.book(self.second, time(10, 45), time(11, 15))
+
+        response = APIClient().get(url, {'duration': 30})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(window['start_time'], window['end_time']) for window in response.data['windows']],
+            [('11:15', '11:45')]
+        )
+        response = APIClient().get(url, {'duration': 15, 'limit': 2})
+        self.assertEqual([window['start_time'] for window in response.data['windows']], ['10:30', '11:15'])
+
+    def test_own_hold_does_not_block_booking_without_token(self):
+        self.first.user = User.objects.create_user('ravi', password='x')
+        self.first.save()
+        DoctorSchedule.objects.filter(pk=self.schedule.pk).update(available_slots=1)
+        self.schedule.refresh_from_db()
+        self.assertTrue(create_slot_hold(self.first.user, self.schedule, start_time=time(10, 0), end_time=time(10, 30))['success'])
+
+        other = User.objects.create_user('meena', password='x')
+        result = create_slot_hold(other, self.schedule, start_time=time(11, 0), end_time=time(11, 30))
+        self.assertEqual(result['error_code'], 'SLOT_HELD')
+
+        self.assertTrue(self.book(self.first, time(10, 0), time(10, 30))['success'])
+        self.assertFalse(SlotHold.objects.filter(schedule=self.schedule).exists())
+
+    def test_next_available_index_skips_booked_minutes(self):
+        self.book(self.first, time(10, 0), time(10, 30))
+        opening = ScheduleAvailability.objects.get(schedule=self.schedule)
+        self.assertEqual(timezone.localtime(opening.start_datetime).time(), time(10, 30))
+
+        # The advertised opening is bookable, and the next one moves past it
+        self.assertTrue(self.book(self.second, time(10, 30), time(12, 0))['success'])
+        self.assertFalse(ScheduleAvailability.objects.filter(schedule=self.schedule).exists())
+
+
+class StatusTransitionTests(TestCase):
+    def test_due_appointments_complete_and_next_end_is_queued(self):
+        doctor = Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist')
+        schedule = DoctorSchedule.objects.create(
+            doctor=doctor, date=timezone.localdate() + timedelta(days=1), time_range='slot-based',
+            start_time=time(9, 0), end_time=time(10, 0), slot_duration=30, available_slots=2,
+        )
+        patient = Patient.objects.create(
+            first_name='Ravi', last_name='Kumar', date_of_birth=date(1990, 1, 1), address='Chennai'
+        )
+        ended, upcoming = (
+            book_appointment(patient, schedule, slot, slot.start_time, slot.end_time)['appointment']
+            for slot in schedule.time_slots.order_by('start_time')
+        )
+        now = timezone.now()
+        Appointment.objects.filter(pk=ended.pk).update(end_datetime=now - timedelta(minutes=1))
+
+        engine = StatusTransitionEngine()
+        self.assertEqual(engine.complete_due(now), 1)
+        engine.refill(now)
+        self.assertEqual(engine.status()['next_due'], upcoming.end_datetime)
+        self.assertAlmostEqual(
+            engine.seconds_until_next(now),
+            min((upcoming.end_datetime - now).total_seconds(), 60),
+            places=3
+        )
+        self.assertEqual(
+            list(Appointment.objects.order_by('start_datetime').values_list('status', flat=True)),
+            ['completed', 'scheduled']
+        )
+
+
+class LeaderLeaseTests(TestCase):
+    def test_one_holder_and_takeover_after_silence(self):
+        first, second = LeaderLease('jobs', 'node-a'), LeaderLease('jobs', 'node-b')
+        self.assertTrue(first.try_acquire())
+        self.assertFalse(second.try_acquire())
+        self.assertTrue(first.renew())
+
+        with override_settings(JOB_LEADER_TIMEOUT_SECONDS=0):
+            # First sighting of the current beat only starts the standby's clock
+            self.assertFalse(second.try_acquire())
+            self.assertTrue(second.try_acquire())
+        self.assertFalse(first.renew())
+
+        self.assertTrue(second.release())
+        self.assertTrue(first.try_acquire())
+
+
+class JobRunHistoryTests(TestCase):
+    def test_runs_are_recorded_and_summarised_for_staff(self):
+        for duration_ms in (10, 20, 30, 40, 1000):
+            JobRun.objects.create(job='cleanup_past_appointments', duration_ms=duration_ms, rows_affected=5)
+        with self.assertRaises(RuntimeError):
+            with record_job_run('cleanup_past_appointments'):
+                raise RuntimeError('disk full')
+        with record_job_run('update_appointment_statuses', skip_empty=True):
+            pass
+
+        cleanup = job_run_summary()['cleanup_past_appointments']
+        self.assertEqual((cleanup['runs'], cleanup['failures'], cleanup['rows_affected']), (6, 1, 25))
+        self.assertEqual(cleanup['duration_ms']['p50'], 20)
+        self.assertEqual(cleanup['duration_ms']['max'], 1000)
+        self.assertEqual(cleanup['last_run']['outcome'], 'failed')
+        self.assertNotIn('update_appointment_statuses', job_run_summary())
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('viewer', password='x'))
+        self.assertEqual(client.get('/api/jobs/runs/').status_code, 403)
+        client.force_authenticate(User.objects.create_user('ops', password='x', is_staff=True))
+        response = client.get('/api/jobs/runs/?days=1')
+        self.assertEqual(response.data['jobs']['cleanup_past_appointments']['runs'], 6)
+
+
+class PastSchedulePurgeTests(TestCase):
+    def test_purge_resumes_from_checkpoint_in_chunks(self):
+        doctor = Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist')
+        patient = Patient.objects.create(
+            first_name='Ravi', last_name='Kumar', date_of_birth=date(1990, 1, 1), address='Chennai'
+        )
+        schedules = []
+        for start in (9, 11, 14):
+            schedule = DoctorSchedule.objects.create(
+                doctor=doctor, date=timezone.localdate() + timedelta(days=1), time_range='slot-based',
+                start_time=time(start, 0), end_time=time(start + 1, 0), slot_duration=30, available_slots=2,
+            )
+            slot = schedule.time_slots.order_by('start_time').first()
+            book_appointment(patient, schedule, slot, slot.start_time, slot.end_time)
+            schedules.append(schedule)
+        past = timezone.localdate() - timedelta(days=5)
+        DoctorSchedule.objects.update(date=past)
+        cutoff = (timezone.now() - timedelta(days=1)).date()
+        # An earlier run was interrupted after the first schedule
+        PurgeCheckpoint.objects.create(job='cleanup_past_appointments', cutoff=cutoff, last_id=schedules[0].pk)
+
+        call_command('cleanup_past_appointments', chunk_size=1, throttle=0, stdout=StringIO())
+        self.assertEqual(list(DoctorSchedule.objects.values_list('pk', flat=True)), [schedules[0].pk])
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertEqual(TimeSlot.objects.count(), 2)
+        self.assertFalse(PurgeCheckpoint.objects.exists())
+        self.assertTrue(AvailabilityChange.objects.filter(schedule_id=schedules[2].pk).exists())
+        # Per schedule: the schedule, its two slots, one appointment and one availability row
+        # deleted, and the appointment marked completed and archived
+        self.assertEqual(JobRun.objects.get(job='cleanup_past_appointments').rows_affected, 2 * 7)
+        self.assertEqual(ArchivedAppointment.objects.count(), 2)
+
+        call_command('cleanup_past_appointments', stdout=StringIO())
+        self.assertFalse(DoctorSchedule.objects.exists() or Appointment.objects.exists() or TimeSlot.objects.exists())
+
+    def test_appointments_are_archived_before_purge(self):
+        user = User.objects.create_user('ravi', password='x')
+        doctor = Doctor.objects.create(first_name='Asha', last_name='Rao', bio='Cardiologist')
+        patient = Patient.objects.create(
+            user=user, first_name='Ravi', last_name='Kumar', date_of_birth=date(1990, 1, 1), address='Chennai'
+        )
+        schedule = DoctorSchedule.objects.create(
+            doctor=doctor, date=timezone.localdate() + timedelta(days=1), time_range='slot-based',
+            start_time=time(9, 0), end_time=time(10, 0), slot_duration=30, available_slots=2,
+        )
+        visit, missed = (
+            book_appointment(patient, schedule, slot, slot.start_time, slot.end_time)['appointment']
+            for slot in schedule.time_slots.order_by('start_time')
+        )
+        Appointment.objects.filter(pk=visit.pk).update(status='completed')
+        DoctorSchedule.objects.update(date=timezone.localdate() - timedelta(days=5))
+
+        call_command('cleanup_past_appointments', throttle=0, stdout=StringIO())
+        self.assertFalse(Appointment.objects.exists())
+        # The one left 'scheduled' (the status sweep never ran) is completed, not lost
+        self.assertEqual(
+            sorted(ArchivedAppointment.objects.values_list('id', 'status')),
+            [(visit.pk, 'completed'), (missed.pk, 'completed')]
+        )
+
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/appointment/my-appointments/archived/')
+        self.assertEqual(response.status_code, 200)
+        # Newest first
+        self.assertEqual([archived['id'] for archived in response.data['results']], [missed.pk, visit.pk])
+        archived = response.data['results'][1]
+        self.assertEqual(archived['doctor_name'], 'Dr. Asha Rao')
+        self.assertEqual(archived['appointment_time_formatted'], '09:00 AM - 09:30 AM')
+        self.assertEqual(response.data['results'][0]['status'], 'completed')
@@ -34,16 +34,28 @@ urlpatterns = [
     path('verify-otp-login/', views.VerifyWhatsAppOTPView.as_view(), name='verify-otp-login'),
     # -------------------------------------------------------------------
     
+    # Staff-only diagnostics
+    path('catalog/cache-stats/', views.CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
+    path('availability/engine-stats/', views.AvailabilityEngineStatsView.as_view(), name='availability-engine-stats'),
+    path('jobs/runs/', views.JobRunStatsView.as_view(), name='job-run-stats'),
+    
     # Doctor specific URLs
+    path('doctors/soonest-available/', views.SoonestAvailableView.as_view(), name='doctors-soonest-available'),
+    path('doctors/availability-heatmap/', views.AvailabilityHeatmapView.as_view(), name='doctors-availability-heatmap'),
     path('doctors/by-specialty/<int:specialty_id>/', views.DoctorsBySpecialtyView.as_view(), name='doctors-by-specialty'),
     path('doctors/<int:doctor_id>/available-slots/', views.AvailableSlotsView.as_view(), name='available-slots'),
     path('doctors/<int:doctor_id>/schedules/<int:schedule_id>/available-slots/', 
          views.AvailableTimeSlotsView.as_view(), 
          name='available-time-slots'),
+    path('doctors/<int:doctor_id>/schedules/<int:schedule_id>/free-windows/', 
+         views.FreeWindowsView.as_view(), 
+         name='free-windows'),
     
     # Appointment specific URLs
     path('appointment/book/<int:doctor_id>/', views.BookAppointmentView.as_view(), name='book-appointment'),
     path('appointment/cancel/<int:appointment_id>/', views.CancelAppointmentView.as_view(), name='cancel-appointment'),
+    path('appointment/hold/<int:doctor_id>/', views.HoldSlotView.as_view(), name='hold-slot'),
+    path('appointment/hold/release/<uuid:hold_token>/', views.ReleaseSlotHoldView.as_view(), name='release-slot-hold'),
     
     # Include router URLs
     path('', include(router.urls)),
@@ -1,5 +1,7 @@
-from rest_framework import generics, status, viewsets
+from rest_framework import generics, status, viewsets, filters
 from rest_framework.views import APIView
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -11,6 +13,7 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 from datetime import datetime, timedelta
 from django.db import transaction
+from django.db.models import F
 import re
 import random
 from django.conf import settings
@@ -18,12 +21,16 @@ import requests # 🔧 NEW: Import requests library
 
 from .models import (
     Doctor, DoctorSchedule, Specialty, Language, TimeSlot,
-    Patient, MedicalHistory, Appointment
+    Patient, MedicalHistory, Appointment, SlotHold, ArchivedAppointment
 )
 from .serializers import (
     UserSerializer, DoctorSerializer, DoctorScheduleSerializer, LoginSerializer,
     SpecialtySerializer, LanguageSerializer, PatientSerializer,
-    MedicalHistorySerializer, AppointmentSerializer, BookAppointmentSerializer
+    MedicalHistorySerializer, AppointmentSerializer, BookAppointmentSerializer,
+    HoldSlotSerializer, SlotHoldSerializer, SoonestAvailableQuerySerializer,
+    SoonestAvailableSerializer, AvailabilityHeatmapQuerySerializer, FreeWindowQuerySerializer,
+    DoctorListSerializer, AppointmentListSerializer, JobRunQuerySerializer,
+    ArchivedAppointmentSerializer
 )
 from .enhanced_validation import (
     get_current_ist_time,
@@ -32,6 +39,14 @@ from .enhanced_validation import (
     log_security_attempt,
     get_client_ip
 )
+from .pagination import KeysetPagination
+from .conditional import ConditionalGetMixin
+from .search import DoctorSearchFilter
+from .availability import find_soonest_available, build_availability_heatmap
+from .catalog_cache import specialty_catalog, language_catalog, get_catalog_cache_stats
+from .booking import book_appointment, cancel_appointment, create_slot_hold, release_slot_hold, find_free_windows
+from .availability_engine import availability_engine, engine_enabled
+from .job_runs import job_run_summary
 import logging
 logger = logging.getLogger(__name__)
 
@@ -40,6 +55,45 @@ class CustomPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+def wants_compact(request):
+    """?compact=true asks list endpoints for their lightweight serializer"""
+    return request.query_params.get('compact', '').lower() in ('true', '1')
+
+class SparseFieldsetQuerysetMixin:
+    """
+    Defers the columns a read request did not ask for (?fields=/?omit= or a
+    compact serializer); sparse_always lists fields every query must load.
+    """
+    sparse_always = ()
+
+    def sparse_queryset(self, queryset):
+        if self.request.method not in ('GET', 'HEAD'):
+            return queryset
+        return self.get_serializer_class().sparse_queryset(queryset, self.request, always=self.sparse_always)
+
+class DirectoryPagination(KeysetPagination):
+    """
+    Keyset pages for the doctor directory. Requests that still send ?page=
+    (the numbered pager of older clients) get CustomPagination instead, up
+    to DOCTOR_DIRECTORY_MAX_PAGE: deeper OFFSETs scan every skipped row.
+    """
+    page_size = 10
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.numbered = CustomPagination() if CustomPagination.page_query_param in request.query_params else None
+        if self.numbered:
+            page = request.query_params[CustomPagination.page_query_param]
+            max_page = getattr(settings, 'DOCTOR_DIRECTORY_MAX_PAGE', 20)
+            if page in CustomPagination.last_page_strings or (page.isdigit() and int(page) > max_page):
+                raise NotFound(f'Numbered pages stop at {max_page}; follow the `next` link instead')
+            return self.numbered.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.numbered:
+            return self.numbered.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -175,6 +229,10 @@ class SpecialtyViewSet(viewsets.ModelViewSet):
         else:
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
+    
+    def list(self, request, *args, **kwargs):
+        # Served from the in-process catalog cache
+        return Response(specialty_catalog.all())
 
 class LanguageViewSet(viewsets.ModelViewSet):
     queryset = Language.objects.all()
@@ -186,15 +244,62 @@ class LanguageViewSet(viewsets.ModelViewSet):
         else:
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
+    
+    def list(self, request, *args, **kwargs):
+        # Served from the in-process catalog cache
+        return Response(language_catalog.all())
+
+class NullsLastOrderingFilter(filters.OrderingFilter):
+    """?ordering= that keeps empty values (e.g. no availability) at the end"""
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        return queryset.order_by(*[
+            F(field[1:]).desc(nulls_last=True) if field.startswith('-') else F(field).asc(nulls_last=True)
+            for field in ordering
+        ])
+
+class DoctorDirectoryMixin(ConditionalGetMixin):
+    """
+    Shared by the public doctor directory endpoints: related ids are
+    prefetched, and responses carry an ETag/Last-Modified derived from the
+    doctor and catalog change counters so repeated polls get a 304.
+    """
+    condition_keys = ('doctors', 'specialties', 'languages')
 
-class DoctorViewSet(viewsets.ModelViewSet):
+    def filter_by_related_ids(self, queryset, param, lookup):
+        values = self.request.query_params.getlist(param)
+        ids = [int(value) for raw in values for value in raw.split(',') if value.strip().isdigit()]
+        if not ids:
+            return queryset
+        if len(ids) == 1:
+            return queryset.filter(**{lookup: ids[0]})
+        return queryset.filter(**{f'{lookup}__in': ids}).distinct()
+
+    def filter_by_availability(self, queryset):
+        available = self.request.query_params.get('available', '').lower()
+        if available in ('true', '1'):
+            return queryset.filter(next_available_at__isnull=False)
+        if available in ('false', '0'):
+            return queryset.filter(next_available_at__isnull=True)
+        return queryset
+
+class DoctorViewSet(DoctorDirectoryMixin, SparseFieldsetQuerysetMixin, viewsets.ModelViewSet):
     queryset = Doctor.objects.all()
     serializer_class = DoctorSerializer
+    # django-filter is not a dependency: ?specialties= and ?languages= are
+    # handled in get_queryset, ?ordering= by DRF and ?search= by the
+    # full-text index (search_fields is kept for the schema only)
+    filter_backends = [NullsLastOrderingFilter, DoctorSearchFilter]
     filterset_fields = ['specialties', 'languages']
     search_fields = ['first_name', 'last_name', 'bio']
-    pagination_class = CustomPagination
-    ordering_fields = ['first_name', 'years_of_experience']
+    pagination_class = DirectoryPagination
+    ordering_fields = ['first_name', 'years_of_experience', 'next_available_at', 'free_slots_7d']
     ordering = ['first_name']
+    # Keyset cursors read the ordering values of the last row
+    sparse_always = ordering_fields
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -203,18 +308,189 @@ class DoctorViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
-class DoctorsBySpecialtyView(generics.ListAPIView):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            for field in self.filterset_fields:
+                queryset = self.filter_by_related_ids(queryset, field, f'{field}__id')
+            queryset = self.filter_by_availability(queryset)
+        return self.sparse_queryset(DoctorSerializer.setup_eager_loading(queryset))
+
+    def get_serializer_class(self):
+        if self.action == 'list' and wants_compact(self.request):
+            return DoctorListSerializer
+        return super().get_serializer_class()
+
+    def get_keyset_ordering(self, request, queryset):
+        """The ?ordering= fields (else relevance for searches, else name) with id as tie-breaker"""
+        ordering = self.filter_backends[0]().get_ordering(request, queryset, self)
+        if not request.query_params.get(self.filter_backends[0].ordering_param) and 'search_rank' in queryset.query.annotations:
+            ordering = ['search_rank']
+        return [*ordering, 'id']
+
+class CatalogCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response({'catalogs': get_catalog_cache_stats()})
+
+class AvailabilityEngineStatsView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(availability_engine.stats())
+
+class JobRunStatsView(APIView):
+    """Run counts, failures and duration percentiles of the background jobs"""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        params = JobRunQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        days = params.validated_data['days']
+        return Response({'days': days, 'jobs': job_run_summary(days)})
+
+class DoctorsBySpecialtyView(DoctorDirectoryMixin, SparseFieldsetQuerysetMixin, generics.ListAPIView):
     serializer_class = DoctorSerializer
     permission_classes = [AllowAny]
-    pagination_class = CustomPagination
+    pagination_class = DirectoryPagination
+    keyset_ordering = ('first_name', 'id')
+    sparse_always = ('first_name',)
+    
+    def get_serializer_class(self):
+        return DoctorListSerializer if wants_compact(self.request) else DoctorSerializer
     
     def get_queryset(self):
         specialty_id = self.kwargs['specialty_id']
-        return Doctor.objects.filter(specialties__id=specialty_id)
+        queryset = Doctor.objects.filter(specialties__id=specialty_id).order_by('first_name', 'id')
+        queryset = self.filter_by_related_ids(queryset, 'languages', 'languages__id')
+        queryset = self.filter_by_availability(queryset)
+        return self.sparse_queryset(DoctorSerializer.setup_eager_loading(queryset))
+
+class SoonestAvailableView(APIView):
+    """
+    Doctors ranked by their next free opening, answered from the
+    next-available index in one query instead of one availability call
+    per doctor.
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        params = SoonestAvailableQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        rows = find_soonest_available(
+            specialty_id=query.get('specialty'),
+            language_id=query.get('language'),
+            date_from=query.get('date_from'),
+            date_to=query.get('date_to'),
+            part_of_day=query.get('part_of_day'),
+            limit=query['limit']
+        )
+        return Response(SoonestAvailableSerializer(rows, many=True).data)
+
+class AvailabilityHeatmapView(APIView):
+    """
+    Free slots per day (and optionally per hour) for one or more doctors or
+    a whole specialty, as compact arrays for a month calendar.
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        params = AvailabilityHeatmapQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        
+        doctors = Doctor.objects.all()
+        if query.get('doctors'):
+            doctors = doctors.filter(pk__in=query['doctors'])
+        if query.get('specialty'):
+            doctors = doctors.filter(specialties__id=query['specialty'])
+        max_doctors = getattr(settings, 'AVAILABILITY_HEATMAP_MAX_DOCTORS', 500)
+        doctor_ids = list(doctors.order_by('id').values_list('id', flat=True)[:max_doctors + 1])
+        if len(doctor_ids) > max_doctors:
+            return Response({
+                'error': 'Too many doctors',
+                'message': f'A heatmap covers at most {max_doctors} doctors; narrow the filters'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(build_availability_heatmap(
+            doctor_ids,
+            query.get('date_from') or timezone.localdate(),
+            query.get('days') or getattr(settings, 'AVAILABILITY_HEATMAP_DEFAULT_DAYS', 60),
+            by_hour=query['by_hour']
+        ))
 
 class DoctorScheduleViewSet(viewsets.ModelViewSet):
+    """
+    Schedule listing is keyset-paginated on (date, start_time, id) and, unless
+    date_from/date_to are given, limited to the upcoming
+    SCHEDULE_LIST_DEFAULT_DAYS. Filters: doctor, date_from, date_to,
+    time_range, is_active.
+    """
     queryset = DoctorSchedule.objects.all()
     serializer_class = DoctorScheduleSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('date', 'start_time', 'id')
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = self.filter_schedule_list(queryset)
+        return DoctorScheduleSerializer.setup_eager_loading(queryset)
+    
+    def filter_schedule_list(self, queryset):
+        from rest_framework import serializers as drf_serializers
+        params = self.request.query_params
+        errors = {}
+        
+        def parse_date_param(name):
+            value = params.get(name)
+            if not value:
+                return None
+            try:
+                return datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                errors[name] = 'Use the YYYY-MM-DD format.'
+        
+        date_from = parse_date_param('date_from')
+        date_to = parse_date_param('date_to')
+        
+        doctor = params.get('doctor')
+        if doctor:
+            if doctor.isdigit():
+                queryset = queryset.filter(doctor_id=int(doctor))
+            else:
+                errors['doctor'] = 'Must be a doctor id.'
+        
+        time_range = params.get('time_range')
+        if time_range:
+            if time_range in dict(DoctorSchedule.TIME_RANGE_CHOICES):
+                queryset = queryset.filter(time_range=time_range)
+            else:
+                errors['time_range'] = f"Must be one of {', '.join(dict(DoctorSchedule.TIME_RANGE_CHOICES))}."
+        
+        is_active = params.get('is_active')
+        if is_active:
+            if is_active.lower() in ('true', '1'):
+                queryset = queryset.filter(is_active=True)
+            elif is_active.lower() in ('false', '0'):
+                queryset = queryset.filter(is_active=False)
+            else:
+                errors['is_active'] = 'Must be true or false.'
+        
+        if errors:
+            raise drf_serializers.ValidationError(errors)
+        
+        # Default window: today onwards for the next SCHEDULE_LIST_DEFAULT_DAYS
+        if date_from is None and date_to is None:
+            date_from = get_current_ist_time().date()
+            date_to = date_from + timedelta(days=getattr(settings, 'SCHEDULE_LIST_DEFAULT_DAYS', 30))
+        if date_from:
+            queryset = queryset.filter(date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(date__lte=date_to)
+        return queryset
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -249,29 +525,57 @@ class DoctorScheduleViewSet(viewsets.ModelViewSet):
         except ValidationError as e:
             from rest_framework import serializers as drf_serializers
             raise drf_serializers.ValidationError(e.message_dict)
+    
+    def perform_update(self, serializer):
+        previous_doctor_id = serializer.instance.doctor_id
+        try:
+            schedule = serializer.save()
+        except ValidationError as e:
+            from rest_framework import serializers as drf_serializers
+            raise drf_serializers.ValidationError(e.message_dict)
+        if schedule.doctor_id != previous_doctor_id:
+            # save() refreshed the new doctor; the old one lost this schedule
+            Doctor.refresh_availability([previous_doctor_id])
+    
+    def perform_destroy(self, instance):
+        doctor_id = instance.doctor_id
+        with transaction.atomic():
+            instance.delete()
+            Doctor.refresh_availability([doctor_id])
 
 class AvailableSlotsView(APIView):
     permission_classes = [AllowAny]
     
     def get(self, request, doctor_id):
-        try:
-            doctor = Doctor.objects.get(id=doctor_id)
-        except Doctor.DoesNotExist:
-            return Response({'error': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
-        
         now_ist = get_current_ist_time()
         today = now_ist.date()
         current_time = now_ist.time()
         
         end_date = today + timedelta(days=30)
         
-        available_slots = DoctorSchedule.objects.filter(
-            doctor=doctor,
-            date__gte=today,
-            date__lte=end_date,
-            is_active=True,
-            available_slots__gt=0
-        ).order_by('date', 'start_time')
+        if engine_enabled() and availability_engine.covers(end_date):
+            # Served from the in-process engine, no queries beyond the change-log poll
+            if not availability_engine.has_doctor(doctor_id):
+                return Response({'error': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(availability_engine.get_doctor_schedules(
+                doctor_id, today, end_date,
+                min_start_today=(now_ist + timedelta(minutes=30)).time()
+            ))
+        
+        try:
+            doctor = Doctor.objects.get(id=doctor_id)
+        except Doctor.DoesNotExist:
+            return Response({'error': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        available_slots = DoctorScheduleSerializer.setup_eager_loading(
+            DoctorSchedule.objects.filter(
+                doctor=doctor,
+                date__gte=today,
+                date__lte=end_date,
+                is_active=True,
+                available_slots__gt=0
+            ).order_by('date', 'start_time')
+        )
         
         filtered_slots = []
         
@@ -290,8 +594,26 @@ class AvailableTimeSlotsView(APIView):
     permission_classes = [AllowAny]
     
     def get(self, request, doctor_id, schedule_id):
+        if engine_enabled():
+            data = availability_engine.get_schedule(doctor_id, schedule_id)
+            if data is not None:
+                validation_result = validate_not_in_past(
+                    datetime.strptime(data['date'], '%Y-%m-%d').date(),
+                    datetime.strptime(data['start_time'], '%H:%M:%S').time()
+                )
+                if not validation_result['valid']:
+                    return Response({
+                        'error': 'This schedule is no longer available',
+                        'message': validation_result['message']
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                return Response({
+                    'schedule': data,
+                    'available_slots': data['available_time_slots']
+                })
+            # Outside the in-memory window (or unknown): let the database decide
+        
         try:
-            schedule = DoctorSchedule.objects.get(
+            schedule = DoctorScheduleSerializer.setup_eager_loading(DoctorSchedule.objects).get(
                 id=schedule_id, 
                 doctor_id=doctor_id, 
                 is_active=True
@@ -316,6 +638,37 @@ class AvailableTimeSlotsView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+class FreeWindowsView(APIView):
+    """
+    Next free windows of a given duration on a range-based schedule, so
+    clients can offer bookable times instead of guessing.
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request, doctor_id, schedule_id):
+        params = FreeWindowQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        
+        try:
+            schedule = DoctorSchedule.objects.get(id=schedule_id, doctor_id=doctor_id, is_active=True)
+        except DoctorSchedule.DoesNotExist:
+            return Response({'error': 'Schedule not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if schedule.time_range != 'range-based':
+            return Response({
+                'error': 'Free windows are only computed for range-based schedules; use available-slots instead',
+                'error_code': 'NOT_RANGE_BASED'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        duration = query.get('duration') or schedule.slot_duration
+        return Response({
+            'schedule_id': schedule.id,
+            'date': schedule.date,
+            'duration': duration,
+            'windows': find_free_windows(schedule, duration, limit=query['limit'])
+        })
+
 class PatientViewSet(viewsets.ModelViewSet):
     serializer_class = PatientSerializer
     permission_classes = [IsAuthenticated]
@@ -326,28 +679,41 @@ class PatientViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class MedicalHistoryViewSet(viewsets.ModelViewSet):
+class MedicalHistoryViewSet(SparseFieldsetQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = MedicalHistorySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-diagnosis_date', '-id')
+    sparse_always = ('diagnosis_date',)
     
     def get_queryset(self):
-        return MedicalHistory.objects.filter(patient__user=self.request.user)
+        return self.sparse_queryset(MedicalHistory.objects.filter(patient__user=self.request.user))
     
     def perform_create(self, serializer):
         patient = get_object_or_404(Patient, user=self.request.user)
         serializer.save(patient=patient)
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(SparseFieldsetQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('start_datetime', 'id')
+    sparse_always = ('start_datetime',)
     
     def get_queryset(self):
         try:
             patient = Patient.objects.get(user=self.request.user)
-            return Appointment.objects.filter(patient=patient)
+            return self.sparse_queryset(
+                Appointment.objects.filter(patient=patient).select_related('patient', 'doctor', 'schedule')
+            )
         except Patient.DoesNotExist:
             return Appointment.objects.none()
     
+    def get_serializer_class(self):
+        if self.action == 'list' and wants_compact(self.request):
+            return AppointmentListSerializer
+        return super().get_serializer_class()
+    
     def perform_create(self, serializer):
         patient, created = Patient.objects.get_or_create(
             user=self.request.user,
@@ -360,6 +726,17 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             }
         )
         serializer.save(patient=patient)
+    
+    @action(
+        detail=False,
+        serializer_class=ArchivedAppointmentSerializer,
+        keyset_ordering=('-start_datetime', '-id')
+    )
+    def archived(self, request):
+        """Past visits moved to the archive by the nightly cleanup, newest first"""
+        queryset = ArchivedAppointment.objects.filter(patient__user=request.user).order_by('-start_datetime', '-id')
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
 
 class BookAppointmentView(APIView):
     permission_classes = [IsAuthenticated]
@@ -368,7 +745,7 @@ class BookAppointmentView(APIView):
         client_ip = get_client_ip(request)
         logger.info(f"📅 Appointment booking attempt by {request.user.username} for doctor {doctor_id}")
         
-        serializer = BookAppointmentSerializer(data=request.data)
+        serializer = BookAppointmentSerializer(data=request.data, context={'request': request})
         if not serializer.is_valid():
             log_security_attempt(
                 user=request.user,
@@ -380,10 +757,10 @@ class BookAppointmentView(APIView):
         
         data = serializer.validated_data
         schedule_id = data['schedule_id']
+        booking_context = data['booking_context']
+        schedule = booking_context.schedule
         
-        try:
-            schedule = DoctorSchedule.objects.get(id=schedule_id, doctor_id=doctor_id)
-        except DoctorSchedule.DoesNotExist:
+        if schedule.doctor_id != doctor_id:
             return Response({
                 'error': 'Schedule not found',
                 'error_code': 'SCHEDULE_NOT_FOUND'
@@ -392,11 +769,9 @@ class BookAppointmentView(APIView):
         if schedule.time_range == 'slot-based':
             time_slot_id = data.get('time_slot_id')
             try:
-                time_slot = TimeSlot.objects.get(
-                    id=time_slot_id,
-                    schedule=schedule,
-                    is_booked=False
-                )
+                time_slot = booking_context.time_slot
+                if time_slot is None:
+                    raise TimeSlot.DoesNotExist
                 appointment_start_time = time_slot.start_time
                 appointment_end_time = time_slot.end_time
             except TimeSlot.DoesNotExist:
@@ -421,7 +796,8 @@ class BookAppointmentView(APIView):
             date=schedule.date,
             start_time=appointment_start_time,
             end_time=appointment_end_time,
-            user=request.user
+            user=request.user,
+            context=booking_context
         )
         
         if not validation_result['valid']:
@@ -439,70 +815,85 @@ class BookAppointmentView(APIView):
                 'current_ist': validation_result['current_ist'].strftime('%Y-%m-%d %H:%M:%S IST')
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        patient, created = Patient.objects.get_or_create(
-            user=request.user,
-            defaults={
-                'first_name': request.user.first_name or 'Unknown',
-                'last_name': request.user.last_name or 'User',
-                'date_of_birth': data.get('date_of_birth', '2000-01-01'),
-                'phone_number': data.get('phone_number', ''),
-                'address': data.get('address', '')
-            }
-        )
+        hold = None
+        if data.get('hold_token'):
+            hold = SlotHold.objects.active().filter(
+                token=data['hold_token'],
+                user=request.user,
+                schedule=schedule
+            ).first()
+            if hold is None:
+                return Response({
+                    'error': 'Your hold on this slot has expired',
+                    'error_code': 'HOLD_EXPIRED'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if time_slot:
+                hold_matches = hold.slot_index == schedule.get_slot_index(time_slot.start_time)
+            else:
+                hold_matches = hold.start_time <= appointment_start_time and appointment_end_time <= hold.end_time
+            if not hold_matches:
+                return Response({
+                    'error': 'The hold does not cover the requested time',
+                    'error_code': 'HOLD_MISMATCH'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        patient = booking_context.patient
+        if patient is None:
+            patient, created = Patient.objects.get_or_create(
+                user=request.user,
+                defaults={
+                    'first_name': request.user.first_name or 'Unknown',
+                    'last_name': request.user.last_name or 'User',
+                    'date_of_birth': data.get('date_of_birth', '2000-01-01'),
+                    'phone_number': data.get('phone_number', ''),
+                    'address': data.get('address', '')
+                }
+            )
         
         try:
-            if time_slot:
-                time_slot.is_booked = True
-                time_slot.save()
-            
-            appointment = Appointment.objects.create(
+            result = book_appointment(
                 patient=patient,
-                doctor_id=doctor_id,
                 schedule=schedule,
                 time_slot=time_slot,
-                appointment_start_time=appointment_start_time,
-                appointment_end_time=appointment_end_time,
-                notes=data.get('notes', '')
+                start_time=appointment_start_time,
+                end_time=appointment_end_time,
+                notes=data.get('notes', ''),
+                hold=hold
             )
-            
-            schedule.available_slots -= 1
-            schedule.save()
-            
-            logger.info(f"✅ Appointment booked successfully: {appointment.id} by {request.user.username}")
-            
-            return Response({
-                'message': 'Appointment booked successfully',
-                'appointment': AppointmentSerializer(appointment).data,
-                'booking_time_ist': get_current_ist_time().strftime('%Y-%m-%d %H:%M:%S IST')
-            }, status=status.HTTP_201_CREATED)
-            
         except ValidationError as e:
-            if time_slot:
-                time_slot.is_booked = False
-                time_slot.save()
-            
             return Response({
                 'error': str(e),
                 'error_code': 'VALIDATION_ERROR'
             }, status=status.HTTP_400_BAD_REQUEST)
         
         except Exception as e:
-            if time_slot:
-                time_slot.is_booked = False
-                time_slot.save()
-            
             logger.error(f"❌ Error creating appointment: {str(e)}", exc_info=True)
             return Response({
                 'error': 'Failed to create appointment',
                 'error_code': 'CREATION_ERROR'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        if not result['success']:
+            return Response({
+                'error': result['message'],
+                'error_code': result['error_code']
+            }, status=status.HTTP_409_CONFLICT)
+        
+        appointment = result['appointment']
+        logger.info(f"✅ Appointment booked successfully: {appointment.id} by {request.user.username}")
+        
+        return Response({
+            'message': 'Appointment booked successfully',
+            'appointment': AppointmentSerializer(appointment).data,
+            'booking_time_ist': get_current_ist_time().strftime('%Y-%m-%d %H:%M:%S IST')
+        }, status=status.HTTP_201_CREATED)
 
 class CancelAppointmentView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, appointment_id):
         try:
-            appointment = Appointment.objects.get(
+            appointment = Appointment.objects.select_related('schedule').get(
                 id=appointment_id,
                 patient__user=request.user
             )
@@ -533,16 +924,11 @@ class CancelAppointmentView(APIView):
                     'error_code': 'TOO_LATE_TO_CANCEL'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
-        appointment.status = 'canceled'
-        appointment.save()
-        
-        if appointment.time_slot:
-            appointment.time_slot.is_booked = False
-            appointment.time_slot.save()
-        
-        schedule = appointment.schedule
-        schedule.available_slots += 1
-        schedule.save()
+        if not cancel_appointment(appointment):
+            return Response({
+                'error': 'This appointment cannot be canceled',
+                'error_code': 'CANNOT_CANCEL'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         logger.info(f"❌ Appointment {appointment_id} canceled by {request.user.username}")
         
@@ -551,6 +937,86 @@ class CancelAppointmentView(APIView):
             'canceled_at_ist': now_ist.strftime('%Y-%m-%d %H:%M:%S IST')
         }, status=status.HTTP_200_OK)
 
+class HoldSlotView(APIView):
+    """
+    Holds a slot (or a range-based window) for a few minutes while the
+    patient fills in the booking form. Pass the returned hold_token to the
+    booking endpoint to convert the hold into an appointment.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, doctor_id):
+        serializer = HoldSlotSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        try:
+            schedule = DoctorSchedule.objects.get(
+                id=data['schedule_id'],
+                doctor_id=doctor_id,
+                is_active=True
+            )
+        except DoctorSchedule.DoesNotExist:
+            return Response({
+                'error': 'Schedule not found',
+                'error_code': 'SCHEDULE_NOT_FOUND'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        time_slot = None
+        start_time = data.get('start_time')
+        end_time = data.get('end_time')
+        if schedule.time_range == 'slot-based':
+            time_slot = schedule.get_free_time_slot(data.get('time_slot_id'))
+            if time_slot is None:
+                return Response({
+                    'error': 'Time slot not available',
+                    'error_code': 'TIME_SLOT_NOT_AVAILABLE'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            start_time = time_slot.start_time
+        elif not start_time or not end_time or not (schedule.start_time <= start_time < end_time <= schedule.end_time):
+            return Response({
+                'error': 'start_time and end_time must lie within the schedule',
+                'error_code': 'TIME_OUT_OF_BOUNDS'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        validation_result = validate_not_in_past(schedule.date, start_time, buffer_minutes=15)
+        if not validation_result['valid']:
+            return Response({
+                'error': validation_result['message'],
+                'error_code': 'PAST_TIME'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = create_slot_hold(
+            user=request.user,
+            schedule=schedule,
+            time_slot=time_slot,
+            start_time=start_time,
+            end_time=end_time,
+            minutes=data.get('minutes')
+        )
+        if not result['success']:
+            return Response({
+                'error': result['message'],
+                'error_code': result['error_code']
+            }, status=status.HTTP_409_CONFLICT)
+        
+        return Response({
+            'message': 'Slot held successfully',
+            'hold': SlotHoldSerializer(result['hold']).data
+        }, status=status.HTTP_201_CREATED)
+
+class ReleaseSlotHoldView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, hold_token):
+        if not release_slot_hold(request.user, hold_token):
+            return Response({
+                'error': 'Hold not found',
+                'error_code': 'HOLD_NOT_FOUND'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response({'message': 'Hold released'}, status=status.HTTP_200_OK)
+
 # -------------------------------------------------------------------
 # REPLACED: The old SendOTPView and VerifyOTPLoginView are replaced with these new versions.
 # -------------------------------------------------------------------
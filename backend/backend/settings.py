@@ -152,6 +152,67 @@ REST_FRAMEWORK = {
     # ],
 }
 
+# Default window (in days from today) for the schedule listing endpoint
+SCHEDULE_LIST_DEFAULT_DAYS = 30
+
+# Default window (in days, including today) for the soonest-available doctor search
+SOONEST_AVAILABLE_DEFAULT_DAYS = 7
+# How often (seconds) the job worker folds recent bookings into the doctors'
+# next_available_at / free_slots_7d (and bumps the directory ETag once)
+DOCTOR_SUMMARY_REFRESH_SECONDS = 15
+# Deepest ?page= the doctor directory still serves (numbered pages cost OFFSET + COUNT;
+# the frontend follows keyset `next` links instead)
+DOCTOR_DIRECTORY_MAX_PAGE = 20
+
+# How often (seconds) each worker checks whether the cached specialty/language catalogs changed
+CATALOG_CACHE_CHECK_SECONDS = 5
+
+# Booking engine: retries when a concurrent booking changes the same schedule row
+BOOKING_MAX_RETRIES = 3
+BOOKING_RETRY_BACKOFF_SECONDS = 0.05
+
+# Slot holds: how long a patient may keep a slot while filling in the booking form
+SLOT_HOLD_MINUTES = 5
+SLOT_HOLD_MAX_MINUTES = 15
+
+# Appointment status transitions: end times queued per refill from the
+# due index, and the longest wait before rereading it (picks up bookings
+# made by other processes)
+APPOINTMENT_STATUS_BATCH = 500
+APPOINTMENT_STATUS_RESYNC_SECONDS = 60
+
+# Background job leader election (manage.py run_jobs): how often the leader
+# heartbeats, and how long a standby waits without one before taking over
+JOB_LEADER_HEARTBEAT_SECONDS = 2
+JOB_LEADER_TIMEOUT_SECONDS = 10
+# Job-run history (timings shown by `cleanup_scheduler status`) kept this many days
+JOB_RUN_RETENTION_DAYS = 90
+
+# cleanup_past_appointments purge: schedules (with their slots and appointments)
+# deleted per transaction, and the pause between chunks that lets bookings write
+CLEANUP_PURGE_CHUNK_SIZE = 200
+CLEANUP_PURGE_THROTTLE_SECONDS = 0.05
+
+# Availability heatmap: default and maximum number of days, and doctors per request
+AVAILABILITY_HEATMAP_DEFAULT_DAYS = 60
+AVAILABILITY_HEATMAP_MAX_DAYS = 90
+AVAILABILITY_HEATMAP_MAX_DOCTORS = 500
+
+# In-process availability engine: serves the available-slots endpoints from
+# per-worker typed arrays kept in sync through the AvailabilityChange log
+AVAILABILITY_ENGINE_ENABLED = False
+# Days (including today) held in memory; requests beyond fall back to the database
+AVAILABILITY_ENGINE_DAYS = 31
+# How often (seconds) each worker replays new change-log entries
+AVAILABILITY_ENGINE_POLL_SECONDS = 1
+# Above this many pending changes a worker reloads everything instead of replaying
+AVAILABILITY_ENGINE_MAX_CHANGES = 5000
+# Change-log ids re-read below the highest one replayed, so entries that commit
+# after a later id (concurrent writers) are still picked up
+AVAILABILITY_CHANGE_REPLAY_OVERLAP = 200
+# Change-log entries older than this are pruned by cleanup_past_appointments
+AVAILABILITY_CHANGE_RETENTION_DAYS = 2
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
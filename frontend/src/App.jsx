@@ -1,4 +1,4 @@
-import React, { useState, useMemo, useEffect, useCallback } from 'react';
+import React, { useState, useMemo, useEffect, useCallback, useRef } from 'react';
 import 'bootstrap/dist/css/bootstrap.min.css';
 import './App.css';
 import { authAPI, doctorsAPI, specialtiesAPI, appointmentsAPI } from './api';
@@ -154,7 +154,10 @@ const MyAppointmentsModal = React.memo(({
   appointments, 
   loading, 
   onCancelAppointment,
-  onRefresh 
+  onRefresh,
+  hasMore,
+  loadingMore,
+  onLoadMore
 }) => {
   const [canceling, setCanceling] = useState(null);
 
@@ -335,7 +338,6 @@ const MyAppointmentsModal = React.memo(({
                     <div className="row g-3">
                       {pastAppointments
                         .sort((a, b) => new Date(b.schedule?.date || b.appointment_date) - new Date(a.schedule?.date || a.appointment_date))
-                        .slice(0, 10) // Show last 10 past appointments
                         .map((appointment) => (
                         <div key={appointment.id} className="col-12">
                           <div className="card border-start border-secondary border-2 bg-light">
@@ -374,13 +376,27 @@ const MyAppointmentsModal = React.memo(({
                         </div>
                       ))}
                     </div>
-                    {pastAppointments.length > 10 && (
-                      <div className="text-center mt-3">
-                        <small className="text-muted">
-                          Showing last 10 appointments. Total: {pastAppointments.length}
-                        </small>
-                      </div>
-                    )}
+                  </div>
+                )}
+
+                {/* Further pages are fetched only when asked for */}
+                {hasMore && (
+                  <div className="text-center mt-4">
+                    <button
+                      type="button"
+                      className="btn btn-outline-secondary"
+                      onClick={onLoadMore}
+                      disabled={loadingMore}
+                    >
+                      {loadingMore ? (
+                        <>
+                          <span className="spinner-border spinner-border-sm me-2" role="status"></span>
+                          Loading...
+                        </>
+                      ) : (
+                        'Load more appointments'
+                      )}
+                    </button>
                   </div>
                 )}
               </>
@@ -419,14 +435,17 @@ const MyAppointmentsModal = React.memo(({
 });
 
 // Pagination Controls Component (Fixed - No Page Size Selector)
+// Pages are keyset cursors, so only the pages already reached and the next one can be numbered
 const PaginationControls = React.memo(({ 
   currentPage, 
-  totalPages, 
-  totalCount, 
+  knownPages, 
+  hasNext, 
+  itemCount, 
   pageSize, 
   onPageChange,
   loading = false 
 }) => {
+  const totalPages = knownPages;  // pages whose cursor is known
   if (totalPages <= 1) return null;
 
   const getPageNumbers = () => {
@@ -470,13 +489,13 @@ const PaginationControls = React.memo(({
   };
 
   const startItem = (currentPage - 1) * pageSize + 1;
-  const endItem = Math.min(currentPage * pageSize, totalCount);
+  const endItem = startItem + itemCount - 1;
 
   return (
     <div className="d-flex flex-column flex-md-row justify-content-between align-items-center gap-3 mt-4 p-3 bg-white rounded-3 shadow-sm">
       {/* Results Info */}
       <div className="text-muted small">
-        Showing <strong>{startItem}</strong> to <strong>{endItem}</strong> of <strong>{totalCount}</strong> doctors
+        Showing <strong>{startItem}</strong> to <strong>{endItem}</strong> doctors
       </div>
 
       {/* Pagination Controls */}
@@ -512,11 +531,11 @@ const PaginationControls = React.memo(({
           ))}
 
           {/* Next Button */}
-          <li className={`page-item ${currentPage === totalPages || loading ? 'disabled' : ''}`}>
+          <li className={`page-item ${!hasNext || loading ? 'disabled' : ''}`}>
             <button 
               className="page-link"
-              onClick={() => !loading && currentPage < totalPages && onPageChange(currentPage + 1)}
-              disabled={currentPage === totalPages || loading}
+              onClick={() => !loading && hasNext && onPageChange(currentPage + 1)}
+              disabled={!hasNext || loading}
               aria-label="Next page"
             >
               <ChevronRightIcon />
@@ -890,10 +909,30 @@ const App = () => {
   // Pagination state (Fixed page size at 10)
   const [pagination, setPagination] = useState({
     currentPage: 1,
-    totalPages: 1,
-    totalCount: 0,
+    knownPages: 1,
+    hasNext: false,
     pageSize: 10  // Fixed at 10, no changing allowed
   });
+  // Keyset cursor of each page reached so far (page 1 has none)
+  const pageCursors = useRef([null]);
+
+  // Remember the cursor of the page after `page` and whether there is one
+  const applyPageCursor = useCallback((page, result) => {
+    const nextCursor = result.pagination?.next_cursor || null;
+    if (pageCursors.current[page] !== nextCursor) {
+      // Later pages were reached from a different cursor: forget them
+      pageCursors.current = pageCursors.current.slice(0, page);
+      if (nextCursor) {
+        pageCursors.current.push(nextCursor);
+      }
+    }
+    setPagination(prev => ({
+      ...prev,
+      currentPage: page,
+      knownPages: pageCursors.current.length,
+      hasNext: Boolean(nextCursor)
+    }));
+  }, []);
 
   // UI state
   const [selectedDoctor, setSelectedDoctor] = useState(null);
@@ -908,6 +947,8 @@ const App = () => {
   // Duplicate booking prevention state
   const [userAppointments, setUserAppointments] = useState([]);
   const [loadingAppointments, setLoadingAppointments] = useState(false);
+  const [appointmentsNext, setAppointmentsNext] = useState(null);
+  const [loadingMoreAppointments, setLoadingMoreAppointments] = useState(false);
   
   // NEW: My Appointments modal state
   const [showMyAppointments, setShowMyAppointments] = useState(false);
@@ -991,78 +1032,47 @@ const App = () => {
       }
 
       // Load first page of doctors directly (always 10 per page)
-      const doctorsResult = await doctorsAPI.getAll(1, 10);
+      const doctorsResult = await doctorsAPI.getAll(null, 10);
       if (doctorsResult.success) {
         setDoctors(doctorsResult.data);
-        
-        // Set initial pagination state
-        if (doctorsResult.pagination) {
-          setPagination({
-            currentPage: doctorsResult.pagination.current_page,
-            totalPages: doctorsResult.pagination.total_pages,
-            totalCount: doctorsResult.pagination.count,
-            pageSize: 10
-          });
-        } else {
-          setPagination({
-            currentPage: 1,
-            totalPages: 1,
-            totalCount: doctorsResult.data.length,
-            pageSize: 10
-          });
-        }
+        applyPageCursor(1, doctorsResult);
       }
     } catch (error) {
       console.error('Error loading initial data:', error);
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [applyPageCursor]);
 
   // Enhanced loadDoctors function
   const loadDoctors = useCallback(async (page = 1, pageSize = 10) => {
     setDoctorsLoading(true);
     try {
       let doctorsResult;
+      // Pages are only reachable one after another, from the cursor the previous page returned
+      const cursor = pageCursors.current[page - 1] || null;
       
       if (selectedSpecialty === 'all') {
-        doctorsResult = await doctorsAPI.getAll(page, pageSize);
+        doctorsResult = await doctorsAPI.getAll(cursor, pageSize);
       } else {
         const specialty = specialties.find(s => s.name === selectedSpecialty);
         if (specialty) {
-          doctorsResult = await doctorsAPI.getBySpecialty(specialty.id, page, pageSize);
+          doctorsResult = await doctorsAPI.getBySpecialty(specialty.id, cursor, pageSize);
         } else {
-          doctorsResult = await doctorsAPI.getAll(page, pageSize);
+          doctorsResult = await doctorsAPI.getAll(cursor, pageSize);
         }
       }
 
       if (doctorsResult.success) {
         setDoctors(doctorsResult.data);
-        
-        // Update pagination state - ensure pageSize is always 10
-        if (doctorsResult.pagination) {
-          setPagination({
-            currentPage: doctorsResult.pagination.current_page,
-            totalPages: doctorsResult.pagination.total_pages,
-            totalCount: doctorsResult.pagination.count,
-            pageSize: 10  // Always keep it at 10, regardless of backend response
-          });
-        } else {
-          // Fallback for non-paginated responses
-          setPagination({
-            currentPage: 1,
-            totalPages: 1,
-            totalCount: doctorsResult.data.length,
-            pageSize: 10
-          });
-        }
+        applyPageCursor(page, doctorsResult);
       }
     } catch (error) {
       console.error('Error loading doctors:', error);
     } finally {
       setDoctorsLoading(false);
     }
-  }, [selectedSpecialty, specialties]);
+  }, [selectedSpecialty, specialties, applyPageCursor]);
 
   // Load initial data
   useEffect(() => {
@@ -1082,6 +1092,7 @@ const App = () => {
       loadUserAppointments();
     } else {
       setUserAppointments([]);
+      setAppointmentsNext(null);
     }
   }, [isLoggedIn]);
 
@@ -1115,7 +1126,7 @@ const App = () => {
     }
   }, []);
 
-  // Function to load user's appointments
+  // Function to load the first page of user's appointments
   const loadUserAppointments = useCallback(async () => {
     if (!isLoggedIn) return;
     
@@ -1125,6 +1136,7 @@ const App = () => {
       if (result.success) {
         // Keep all appointments (scheduled, completed, canceled)
         setUserAppointments(result.data);
+        setAppointmentsNext(result.next);
       }
     } catch (error) {
       console.error('Error loading user appointments:', error);
@@ -1133,6 +1145,24 @@ const App = () => {
     }
   }, [isLoggedIn]);
 
+  // Append the next page of user's appointments (from the "Load more" button)
+  const loadMoreUserAppointments = useCallback(async () => {
+    if (!isLoggedIn || !appointmentsNext) return;
+    
+    setLoadingMoreAppointments(true);
+    try {
+      const result = await appointmentsAPI.getMyAppointments(appointmentsNext);
+      if (result.success) {
+        setUserAppointments(previous => [...previous, ...result.data]);
+        setAppointmentsNext(result.next);
+      }
+    } catch (error) {
+      console.error('Error loading more user appointments:', error);
+    } finally {
+      setLoadingMoreAppointments(false);
+    }
+  }, [isLoggedIn, appointmentsNext]);
+
   // Check if user has existing appointment for the selected doctor/date
   const checkExistingAppointment = useCallback((doctorId, selectedDate) => {
     if (!isLoggedIn || !selectedDate) return null;
@@ -1218,6 +1248,7 @@ const App = () => {
     setSelectedTimeSlot(null);
     setUserName('');
     setUserAppointments([]);
+    setAppointmentsNext(null);
     setUserFormData({
       mobileNumber: '',
       otp: '',
@@ -1289,10 +1320,11 @@ const App = () => {
     setCurrentDateIndex(0);
     
     // Reset pagination to first page and ensure page size is 10
+    pageCursors.current = [null];
     setPagination({
       currentPage: 1,
-      totalPages: 1,
-      totalCount: 0,
+      knownPages: 1,
+      hasNext: false,
       pageSize: 10
     });
   }, []);
@@ -1968,7 +2000,7 @@ const handleResendOTP = useCallback(async () => {
             <p className="lead text-muted">
               {selectedSpecialty === 'all'
                 ? 'Choose from our panel of experienced doctors across various specialties'
-                : `Showing ${pagination.totalCount} ${selectedSpecialty.toLowerCase()}${pagination.totalCount !== 1 ? 's' : ''}`}
+                : `Choose from our experienced ${selectedSpecialty.toLowerCase()}s`}
             </p>
           </div>
 
@@ -2016,8 +2048,9 @@ const handleResendOTP = useCallback(async () => {
                   {/* Pagination Controls */}
                   <PaginationControls
                     currentPage={pagination.currentPage}
-                    totalPages={pagination.totalPages}
-                    totalCount={pagination.totalCount}
+                    knownPages={pagination.knownPages}
+                    hasNext={pagination.hasNext}
+                    itemCount={doctors.length}
                     pageSize={pagination.pageSize}
                     onPageChange={handlePageChange}
                     loading={doctorsLoading}
@@ -2112,6 +2145,9 @@ const handleResendOTP = useCallback(async () => {
         appointments={userAppointments}
         loading={loadingAppointments}
         onRefresh={loadUserAppointments}
+        hasMore={Boolean(appointmentsNext)}
+        loadingMore={loadingMoreAppointments}
+        onLoadMore={loadMoreUserAppointments}
       />
 
       {/* Auth Modal */}
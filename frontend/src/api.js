@@ -353,27 +353,26 @@ export const authAPI = {
   },
 };
 
+// Cursor token of a keyset `next` link (null on the last page)
+const getCursor = (link) => (link ? new URL(link).searchParams.get('cursor') : null);
+
 export const doctorsAPI = {
-  // Get all doctors with pagination
-  getAll: async (page = 1, pageSize = 10) => {
+  // Get all doctors, one keyset page at a time (pass the previous page's next_cursor)
+  getAll: async (cursor = null, pageSize = 10) => {
     try {
       const response = await api.get('/doctors/', {
         params: {
-          page,
-          page_size: pageSize
+          page_size: pageSize,
+          ...(cursor && { cursor })
         }
       });
       
-      // Return both results and pagination info
+      // Return both results and the cursor of the following page
       return { 
         success: true, 
         data: response.data.results,
         pagination: {
-          count: response.data.count,
-          next: response.data.next,
-          previous: response.data.previous,
-          total_pages: Math.ceil(response.data.count / pageSize),
-          current_page: page,
+          next_cursor: getCursor(response.data.next),
           page_size: pageSize
         }
       };
@@ -385,52 +384,28 @@ export const doctorsAPI = {
     }
   },
 
-  // UPDATED: Get doctors by specialty with proper pagination
-  getBySpecialty: async (specialtyId, page = 1, pageSize = 10) => {
+  // Get doctors by specialty, one keyset page at a time
+  getBySpecialty: async (specialtyId, cursor = null, pageSize = 10) => {
     try {
-      console.log(`🔍 Fetching doctors for specialty ${specialtyId}, page ${page}, pageSize ${pageSize}`);
+      console.log(`🔍 Fetching doctors for specialty ${specialtyId}, pageSize ${pageSize}`);
       
       const response = await api.get(`/doctors/by-specialty/${specialtyId}/`, {
         params: {
-          page,
-          page_size: pageSize
+          page_size: pageSize,
+          ...(cursor && { cursor })
         }
       });
       
       console.log('📋 Specialty API response:', response.data);
       
-      // Handle paginated response (this should be the standard now)
-      if (response.data.results !== undefined) {
-        // Paginated response
-        return { 
-          success: true, 
-          data: response.data.results,
-          pagination: {
-            count: response.data.count,
-            next: response.data.next,
-            previous: response.data.previous,
-            total_pages: Math.ceil(response.data.count / pageSize),
-            current_page: page,
-            page_size: pageSize
-          }
-        };
-      } else {
-        // Fallback for non-paginated response (shouldn't happen with new backend)
-        console.warn('⚠️ Received non-paginated response for specialty filter');
-        const results = Array.isArray(response.data) ? response.data : [response.data];
-        return { 
-          success: true, 
-          data: results,
-          pagination: {
-            count: results.length,
-            next: null,
-            previous: null,
-            total_pages: Math.ceil(results.length / pageSize),
-            current_page: 1,
-            page_size: pageSize
-          }
-        };
-      }
+      return { 
+        success: true, 
+        data: response.data.results,
+        pagination: {
+          next_cursor: getCursor(response.data.next),
+          page_size: pageSize
+        }
+      };
     } catch (error) {
       console.error('❌ Error fetching doctors by specialty:', error);
       return {
@@ -485,11 +460,13 @@ export const specialtiesAPI = {
 
 // Appointments API calls
 export const appointmentsAPI = {
-  // Get user's appointments
-  getMyAppointments: async () => {
+  // Get one page of the user's appointments; pass the `next` link of the previous page to continue
+  getMyAppointments: async (next = null) => {
     try {
-      const response = await api.get('/appointment/my-appointments/');
-      return { success: true, data: response.data };
+      const response = next
+        ? await api.get(next)
+        : await api.get('/appointment/my-appointments/', { params: { page_size: 20 } });
+      return { success: true, data: response.data.results, next: response.data.next };
     } catch (error) {
       console.error('❌ Error loading appointments:', error);
       return {